@@ -0,0 +1,104 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import CharField, Q, Value
+
+from fabcal.models import EventSlot, OpeningSlot, TrainingSlot, MachineSlot
+
+# Kind of each agenda row, with the relations shown by the profile templates
+AGENDA_KINDS = {
+    'event': (EventSlot, ('event', 'opening_slot__opening')),
+    'machine': (MachineSlot, ('machine__category', 'opening_slot__opening')),
+    'opening': (OpeningSlot, ('opening',)),
+    'training': (TrainingSlot, ('training', 'opening_slot__opening')),
+}
+
+
+def make_agenda_cursor(row):
+    return '{}.{}.{}'.format(row['agenda_kind'], row['pk'], row['start'].isoformat())
+
+
+def read_agenda_cursor(cursor):
+    """
+    Returns:
+        tuple: The kind, pk and start of the last slot of the previous page, None if `cursor` is invalid.
+    """
+    try:
+        kind, pk, start = cursor.split('.', 2)
+        if kind not in AGENDA_KINDS:
+            return None
+        return kind, int(pk), datetime.datetime.fromisoformat(start)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_agenda_branches(user, since):
+    """
+    Return the querysets of the slots of `user` (owned, registered or booked) ending after `since`, by kind.
+    """
+    return [
+        ('event', EventSlot.objects.filter(user=user, end__gte=since)),
+        ('event', EventSlot.objects.filter(registrations__user=user, end__gte=since)),
+        ('machine', MachineSlot.objects.filter(user=user, end__gte=since)),
+        ('opening', OpeningSlot.objects.filter(user=user, end__gte=since)),
+        ('training', TrainingSlot.objects.filter(user=user, end__gte=since)),
+        ('training', TrainingSlot.objects.filter(registrations=user, end__gte=since)),
+    ]
+
+
+def after_cursor(kind, cursor):
+    """
+    Filter on the rows of `kind` that come after `cursor` in the (start, kind, pk) order.
+    """
+    cursor_kind, cursor_pk, cursor_start = cursor
+    if kind > cursor_kind:
+        return Q(start__gte=cursor_start)
+    if kind == cursor_kind:
+        return Q(start__gt=cursor_start) | Q(start=cursor_start, pk__gt=cursor_pk)
+    return Q(start__gt=cursor_start)
+
+
+def get_agenda_page(user, cursor=None, page_size=None, since=None):
+    """
+    Return a page of the future activities of `user`: the training, event,
+    opening and machine slots they own, registered to or booked, by start.
+
+    The rows of every kind are read in a single UNION query ordered by
+    (start, kind, pk) and paginated by keyset, then each kind is loaded with
+    its related objects, so the cost does not grow with the agenda.
+
+    Returns:
+        tuple: The slots of the page, and the cursor of the next page (None on the last page).
+    """
+    page_size = page_size or settings.ACCOUNTS_AGENDA_PAGE_SIZE
+    since = since or datetime.date.today()
+    cursor = read_agenda_cursor(cursor) if cursor else None
+
+    branches = []
+    for kind, queryset in get_agenda_branches(user, since):
+        if cursor is not None:
+            queryset = queryset.filter(after_cursor(kind, cursor))
+        branches.append(
+            queryset.annotate(agenda_kind=Value(kind, output_field=CharField())).values('pk', 'start', 'agenda_kind')
+        )
+
+    # UNION (not ALL) also drops a slot both owned and registered to
+    rows = list(branches[0].union(*branches[1:]).order_by('start', 'agenda_kind', 'pk')[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    slots_by_kind = {}
+    for kind in {row['agenda_kind'] for row in rows}:
+        model, related = AGENDA_KINDS[kind]
+        pks = [row['pk'] for row in rows if row['agenda_kind'] == kind]
+        slots_by_kind[kind] = model.objects.select_related(*related).in_bulk(pks)
+
+    slots = []
+    for row in rows:
+        # Skip a slot deleted in between
+        slot = slots_by_kind[row['agenda_kind']].get(row['pk'])
+        if slot is not None:
+            slot.agenda_kind = row['agenda_kind']
+            slots.append(slot)
+
+    return slots, make_agenda_cursor(rows[-1]) if has_next else None
@@ -8,7 +8,6 @@ from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.forms import UserChangeForm, AuthenticationForm
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 from django.db.models import Q 
 from django.forms import ModelForm
 from django.template.loader import render_to_string
@@ -23,6 +22,7 @@ from .models import SubscriptionCategory, Subscription, Profile, CustomUser
 from .validators import validate_special_characters, validate_domain
 
 from machines.models import Training, TrainingValidation
+from outbox.mail import send_mail
 
 class EditUserForm(UserChangeForm):
     def __init__(self, *args, **kwargs):
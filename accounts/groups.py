@@ -0,0 +1,27 @@
+def get_group_names(user):
+    """
+    Return the names of the groups of `user` as a frozenset.
+
+    The result is memoized on the user object, which lives as long as the
+    request. It is not kept across requests: a membership change must apply
+    at once in every worker process. The memo is cleared by the signals in
+    accounts.signals when the memberships of the user change.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    group_names = getattr(user, '_group_names', None)
+    if group_names is None:
+        group_names = frozenset(user.groups.values_list('name', flat=True))
+        user._group_names = group_names
+    return group_names
+
+
+def is_in_group(user, group_name):
+    """Return whether `user` belongs to the group named `group_name`."""
+    return group_name in get_group_names(user)
+
+
+def is_superuser(user):
+    """Return whether `user` belongs to the fablab 'superuser' group (not Django's is_superuser flag)."""
+    return is_in_group(user, 'superuser')
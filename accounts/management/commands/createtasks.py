@@ -7,4 +7,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         defaults = { 'schedule_type': Schedule.DAILY, 'next_run': timezone.now(), 'task': None }
         Schedule.objects.update_or_create(name='Accounts.Reminder', func='accounts.tasks.send_reminder_subscription_email', defaults=defaults)
-        Schedule.objects.update_or_create(name='Accounts.Expired', func='accounts.tasks.send_expire_subscription_email', defaults=defaults)
\ No newline at end of file
+        Schedule.objects.update_or_create(name='Accounts.Expired', func='accounts.tasks.send_expire_subscription_email', defaults=defaults)
+        Schedule.objects.update_or_create(name='Outbox.Send', func='outbox.tasks.send_queued_mail', defaults={ 'schedule_type': Schedule.MINUTES, 'minutes': 1, 'next_run': timezone.now(), 'task': None })
+        Schedule.objects.update_or_create(name='Api.PruneChanges', func='api.tasks.prune_changes', defaults=defaults)
+        Schedule.objects.update_or_create(name='Fabcal.CompactMachineSlots', func='fabcal.tasks.compact_machine_slots', defaults=defaults)
+        Schedule.objects.update_or_create(name='Fabcal.ArchiveSlots', func='fabcal.tasks.archive_old_slots', defaults=defaults)
+        Schedule.objects.update_or_create(name='Fabcal.RollupMachineUsage', func='fabcal.tasks.rollup_machine_usage_task', defaults=defaults)
+        Schedule.objects.update_or_create(name='Payments.BillMachineUsage', func='payments.tasks.bill_machine_usage', defaults={ 'schedule_type': Schedule.MONTHLY, 'next_run': timezone.now(), 'task': None })
\ No newline at end of file
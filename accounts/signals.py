@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
 from .models import CustomUser, Profile
 
@@ -9,4 +9,9 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=CustomUser)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    instance.profile.save()
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def invalidate_user_groups(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        instance.__dict__.pop('_group_names', None)
@@ -1,8 +1,9 @@
 from django.contrib.sites.models import Site
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.translation import gettext as _
 
+from outbox.mail import send_mail
+
 from .models import Profile
 from datetime import date, timedelta
 
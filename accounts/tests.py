@@ -1,10 +1,17 @@
 from interlab import test_utils
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.core import mail
 from django.test import TestCase
 from django_q.tasks import Schedule
+from django.contrib.auth.models import Group
 from django.core.management import call_command
+from fabcal.models import OpeningSlot, MachineSlot, TrainingSlot, EventSlot, RegistrationEventSlot
+from machines.models import Machine, MachineCategory, Training
+from openings.models import Opening, Event
+from outbox.tasks import send_queued_mail
+from .agenda import get_agenda_page
+from .groups import get_group_names, is_superuser
 from .models import CustomUser, Profile, Subscription
 from .tasks import *
 
@@ -16,6 +23,7 @@ class ExpiredAndReminderTestCase(TestCase):
     def assert_single_mail_and_result(self, email, result):
         self.assertNotEqual(result, None)
         self.assertEqual(len(result), 1, 'should return user list')
+        send_queued_mail()
         self.assertEqual(len(mail.outbox), 1, 'should have sent an email')
         self.assertTrue(email in mail.outbox[0].to)
 
@@ -41,4 +49,110 @@ class ExpiredAndReminderCommandsTestCase(TestCase):
         self.assertEqual(reminder.schedule_type, Schedule.DAILY, 'should be daily scheduled')
         expired = Schedule.objects.get(name='Accounts.Expired', func='accounts.tasks.send_expire_subscription_email')
         self.assertIsNotNone(expired, 'should have been created on startup')
-        self.assertEqual(expired.schedule_type, Schedule.DAILY, 'should be daily scheduled')
\ No newline at end of file
+        self.assertEqual(expired.schedule_type, Schedule.DAILY, 'should be daily scheduled')
+        outbox = Schedule.objects.get(name='Outbox.Send', func='outbox.tasks.send_queued_mail')
+        self.assertEqual(outbox.schedule_type, Schedule.MINUTES, 'should be scheduled every minute')
+
+class GroupNamesTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='member', email='member@mail.django')
+        self.group = Group.objects.create(name='superuser')
+
+    def test_group_names_are_memoized(self):
+        """
+        Test that the groups are read once per request, and again for the next requests.
+        """
+        self.user.groups.add(self.group)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(is_superuser(self.user))
+            self.assertEqual(get_group_names(self.user), {'superuser'})
+
+        with self.assertNumQueries(1):
+            self.assertTrue(is_superuser(CustomUser(pk=self.user.pk)))
+
+    def test_group_names_are_invalidated(self):
+        """
+        Test that changing the memberships, from either side, or renaming a group applies to the next requests.
+        """
+        self.assertFalse(is_superuser(self.user))
+
+        self.user.groups.add(self.group)
+        self.assertTrue(is_superuser(self.user))
+
+        self.group.user_set.remove(self.user)
+        self.assertFalse(is_superuser(CustomUser.objects.get(pk=self.user.pk)))
+
+        self.group.user_set.add(self.user)
+        self.group.name = 'admin'
+        self.group.save()
+        self.assertEqual(get_group_names(CustomUser.objects.get(pk=self.user.pk)), {'admin'})
+
+class AgendaTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='member', email='member@mail.django')
+        self.other_user = CustomUser.objects.create(username='other', email='other@mail.django')
+        tomorrow = datetime.combine(datetime.today() + timedelta(days=1), datetime.min.time())
+
+        opening = Opening.objects.create(
+            title='OpenLab',
+            is_open_to_reservation=True,
+            is_open_to_questions=True,
+            is_reservation_mandatory=False,
+            is_public=True
+        )
+        category = MachineCategory.objects.create(name='laser')
+        machine = Machine.objects.create(title='Trotec', category=category)
+        training = Training.objects.create(title='laser', machine_category=category, duration=timedelta(hours=1), full_price=40)
+        event = Event.objects.create(title='Workshop', is_active=True, is_on_site=True)
+
+        self.opening_slot = OpeningSlot.objects.create(opening=opening, user=self.user, start=tomorrow + timedelta(hours=8), end=tomorrow + timedelta(hours=18))
+        self.machine_slot = MachineSlot.objects.create(machine=machine, opening_slot=self.opening_slot, user=self.user, start=tomorrow + timedelta(hours=9), end=tomorrow + timedelta(hours=10))
+        self.training_slot = TrainingSlot.objects.create(training=training, opening_slot=self.opening_slot, user=self.other_user, start=tomorrow + timedelta(hours=10), end=tomorrow + timedelta(hours=12), registration_limit=5)
+        self.training_slot.registrations.add(self.user)
+        self.event_slot = EventSlot.objects.create(event=event, user=self.user, start=tomorrow + timedelta(hours=8), end=tomorrow + timedelta(hours=12), registration_required=False)
+        past_event_slot = EventSlot.objects.create(event=event, start=tomorrow - timedelta(days=3), end=tomorrow - timedelta(days=3, hours=-2), registration_required=True)
+        RegistrationEventSlot.objects.create(event_slot=past_event_slot, user=self.user)
+
+        # Not in the agenda of the user
+        MachineSlot.objects.create(machine=machine, opening_slot=self.opening_slot, start=tomorrow + timedelta(hours=10), end=tomorrow + timedelta(hours=18))
+
+    def test_agenda_page(self):
+        """
+        Test that the agenda lists every kind of slot of the user by start, with the related objects loaded.
+        """
+        with self.assertNumQueries(5):
+            slots, cursor = get_agenda_page(self.user)
+            titles = [slot.training.title if slot.agenda_kind == 'training' else slot.opening_slot.opening.title for slot in slots if slot.agenda_kind in ('training', 'machine')]
+
+        self.assertEqual(slots, [self.event_slot, self.opening_slot, self.machine_slot, self.training_slot])
+        self.assertEqual(titles, ['OpenLab', 'laser'])
+        self.assertIsNone(cursor)
+
+    def test_agenda_keyset_pagination(self):
+        """
+        Test that the pages follow each other without gaps or duplicates, even between slots starting together.
+        """
+        slots = []
+        cursor = None
+        while True:
+            page, cursor = get_agenda_page(self.user, cursor=cursor, page_size=1)
+            slots += page
+            if cursor is None:
+                break
+
+        self.assertEqual(slots, [self.event_slot, self.opening_slot, self.machine_slot, self.training_slot])
+
+        # An invalid cursor starts over
+        self.assertEqual(get_agenda_page(self.user, cursor='forged', page_size=1)[0], [self.event_slot])
+
+    def test_profile_view(self):
+        self.client.force_login(self.user)
+        with self.settings(ACCOUNTS_AGENDA_PAGE_SIZE=3):
+            response = self.client.get('/accounts/profile/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['slots']), 3)
+
+            response = self.client.get('/accounts/profile/', {'after': response.context['next_cursor']})
+            self.assertEqual(response.context['slots'], [self.training_slot])
+
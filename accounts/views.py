@@ -1,6 +1,4 @@
 import datetime
-from itertools import chain
-from operator import attrgetter
 import dateparser
 
 from django.contrib import messages
@@ -11,7 +9,7 @@ from django.contrib.auth.views import LoginView
 from django.contrib.sessions.models import Session
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied, ValidationError
 from django.core.paginator import Paginator
-from django.db.models import Q, OuterRef, Subquery, Exists, Value
+from django.db.models import Q, Subquery, Value
 from django.http import HttpResponse
 from django.http import HttpResponseRedirect
 from django.template import loader
@@ -22,9 +20,10 @@ from django.urls import reverse
 from django.views.generic.base import TemplateView
 
 
-from fabcal.models import EventSlot, OpeningSlot, TrainingSlot, MachineSlot, RegistrationEventSlot
 from machines.models import TrainingValidation
 
+from .agenda import get_agenda_page
+from .groups import is_superuser
 from .forms import EditUserForm, EditProfileForm, CustomOrganizationUserAddForm, CustomRegistrationForm, CustomAuthenticationForm, SuperuserProfileEditForm
 from .models import Profile, SubscriptionCategory
 
@@ -63,28 +62,14 @@ def AccountsView(request):
     user = request.user
     template = loader.get_template('accounts/profile.html')
 
-    today = datetime.date.today()
-
-    # Subquery to check if the user has registrations for the event slot
-    registration_event_slot = RegistrationEventSlot.objects.filter(
-        event_slot=OuterRef('pk'),
-        event_slot__end__gte=today,
-        user=request.user
-    )
+    slots, next_cursor = get_agenda_page(user, cursor=request.GET.get('after'))
 
     context = {
         'page_title': "My account",
         'user': user,
-        'slots': sorted(chain(
-            TrainingSlot.objects.filter(user=request.user, end__gte=datetime.date.today()),
-            TrainingSlot.objects.filter(registrations=request.user, end__gte=datetime.date.today()),
-            EventSlot.objects.filter(user=request.user, end__gte=datetime.date.today()),
-            EventSlot.objects.filter(Exists(registration_event_slot)),
-            OpeningSlot.objects.filter(user=request.user, end__gte=datetime.date.today()), 
-            MachineSlot.objects.filter(user=request.user, end__gte=datetime.date.today()),
-        ),
-        key=attrgetter('start')
-        )
+        'slots': slots,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
     }
 
     (profile, _) = Profile.objects.get_or_create(user=user)
@@ -178,7 +163,7 @@ class UserListView(LoginRequiredMixin, TemplateView):
     number_of_item = 10
 
     def get(self, *args, **kwargs):
-        if not self.request.user.groups.filter(name = 'superuser').exists():
+        if not is_superuser(self.request.user):
             raise PermissionDenied
         else:
             template = self.template_name
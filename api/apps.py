@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class APIConfig(AppConfig):
     name = 'api'
     verbose_name = 'API'
+
+    def ready(self):
+        import api.signals
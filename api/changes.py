@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+
+from accounts.models import CustomUser, Subscription, Profile
+from fabcal.models import OpeningSlot, MachineSlot, TrainingSlot
+from openings.models import Opening
+
+from .models import Change
+from .serializers import OpeningV2Serializer, OpeningSlotV2Serializer, MachineSlotV2Serializer, TrainingSlotV2Serializer
+from .serializers import CustomUserV2Serializer, SubscriptionV2Serializer, ProfileV2Serializer
+
+SYNC_TOKEN_SALT = 'api.changes'
+
+# Resources followed by the change log: name, model, queryset and serializer used to return the changed rows
+RESOURCES = {
+    'opening': (Opening, Opening.objects.all(), OpeningV2Serializer),
+    'opening_slot': (OpeningSlot, OpeningSlot.objects.all(), OpeningSlotV2Serializer),
+    'machine_slot': (MachineSlot, MachineSlot.objects.select_related('machine'), MachineSlotV2Serializer),
+    'training_slot': (TrainingSlot, TrainingSlot.objects.all(), TrainingSlotV2Serializer),
+    'custom_user': (CustomUser, CustomUser.objects.all(), CustomUserV2Serializer),
+    'subscription': (Subscription, Subscription.objects.all(), SubscriptionV2Serializer),
+    'profile': (Profile, Profile.objects.all(), ProfileV2Serializer),
+}
+
+RESOURCE_BY_MODEL = {model: name for name, (model, queryset, serializer) in RESOURCES.items()}
+
+
+def record_changes(model, object_ids, action):
+    """Append a change of `action` for each of `object_ids` of `model` to the change log."""
+    resource = RESOURCE_BY_MODEL[model]
+    Change.objects.bulk_create([
+        Change(resource=resource, object_id=object_id, action=action)
+        for object_id in object_ids
+    ])
+
+
+def make_sync_token(change_id):
+    """Return the opaque token standing for the position `change_id` in the change log."""
+    return signing.dumps(change_id, salt=SYNC_TOKEN_SALT)
+
+
+def read_sync_token(token):
+    """
+    Return the change log position of `token`.
+
+    Raises:
+        signing.SignatureExpired: If the token is older than the change log retention, changes may have been pruned.
+        signing.BadSignature: If the token was not issued by this site.
+    """
+    return signing.loads(token, salt=SYNC_TOKEN_SALT, max_age=timedelta(days=settings.API_CHANGES_RETENTION_DAYS))
+
+
+def get_changes(since, resources=None, limit=None, now=None):
+    """
+    Return the rows changed after the change log position `since`.
+
+    Several changes of the same row are collapsed into its last one. Created
+    and updated rows are returned with their current data, fetched with one
+    query per resource.
+
+    Changes younger than API_CHANGES_SAFETY_LAG seconds are held back. Change
+    pks are taken when the row is inserted, not when its transaction commits,
+    so a change with a lower pk can become visible after a higher one was
+    returned. Waiting longer than any transaction lasts keeps the position
+    from skipping it.
+
+    Returns:
+        tuple: The list of changes, the position of the last change read and whether more changes are pending.
+    """
+    limit = limit or settings.API_CHANGES_PAGE_SIZE
+    horizon = (now or datetime.now()) - timedelta(seconds=settings.API_CHANGES_SAFETY_LAG)
+    changes = Change.objects.filter(pk__gt=since).order_by('pk')
+    if resources:
+        changes = changes.filter(resource__in=resources)
+
+    rows = list(changes.values_list('pk', 'resource', 'object_id', 'action', 'changed_at')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Stop at the first recent change, the position never passes it
+    for index, row in enumerate(rows):
+        if row[4] > horizon:
+            rows = rows[:index]
+            more = False
+            break
+
+    last_actions = {}
+    for pk, resource, object_id, action, changed_at in rows:
+        last_actions.pop((resource, object_id), None)
+        last_actions[(resource, object_id)] = action
+
+    data = {}
+    for resource, (model, queryset, serializer_class) in RESOURCES.items():
+        object_ids = [object_id for (name, object_id), action in last_actions.items() if name == resource and action != Change.DELETED]
+        if object_ids:
+            instances = list(queryset.filter(pk__in=object_ids))
+            for instance, item in zip(instances, serializer_class(instances, many=True).data):
+                data[(resource, instance.pk)] = item
+
+    result = []
+    for (resource, object_id), action in last_actions.items():
+        item = data.get((resource, object_id))
+        if action != Change.DELETED and item is None:
+            # Deleted after this change, the tombstone follows in a later page
+            action = Change.DELETED
+        result.append({'resource': resource, 'id': object_id, 'action': action, 'data': item})
+
+    return result, rows[-1][0] if rows else since, more
+
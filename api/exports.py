@@ -0,0 +1,100 @@
+import csv
+import datetime
+import decimal
+import json
+
+from rest_framework import serializers
+
+from .filters import OpeningSlotFilter, MachineSlotFilter, TrainingSlotFilter
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FILTERS = {
+    'opening_slot': OpeningSlotFilter,
+    'machine_slot': MachineSlotFilter,
+    'training_slot': TrainingSlotFilter,
+}
+
+# Serializer method fields, computed from the exported row instead of the model instance
+COMPUTED_FIELDS = {
+    'duration': (('start', 'end'), lambda row: int((row['end'] - row['start']).seconds / 60)),
+}
+
+
+class Echo:
+    """A file-like object that returns what is written, to stream the csv writer output."""
+
+    def write(self, value):
+        return value
+
+
+def get_export_columns(serializer_class, fields=None):
+    """
+    Map the fields of `serializer_class` (or only the requested `fields`) to the lookups of a values() query.
+
+    Returns:
+        tuple: The column names and the values() lookup of each column, None for computed columns.
+    """
+    model = serializer_class.Meta.model
+    columns = []
+    lookups = []
+
+    for name, field in serializer_class().fields.items():
+        if fields and name not in fields:
+            continue
+
+        if name in COMPUTED_FIELDS:
+            lookup = None
+        elif isinstance(field, serializers.SerializerMethodField):
+            continue
+        elif isinstance(field, serializers.RelatedField):
+            lookup = model._meta.get_field(field.source).attname
+        else:
+            lookup = field.source.replace('.', '__')
+
+        columns.append(name)
+        lookups.append(lookup)
+
+    return columns, lookups
+
+
+def iter_export_rows(queryset, columns, lookups):
+    """
+    Yield the exported rows as dicts, reading the queryset by chunks so memory does not grow with the table.
+    """
+    values = {lookup for lookup in lookups if lookup}
+    for name, lookup in zip(columns, lookups):
+        if lookup is None:
+            values.update(COMPUTED_FIELDS[name][0])
+
+    for row in queryset.values(*values).order_by('pk').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            name: row[lookup] if lookup else COMPUTED_FIELDS[name][1](row)
+            for name, lookup in zip(columns, lookups)
+        }
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def encode_ndjson(rows, columns):
+    for row in rows:
+        yield json.dumps({name: encode_value(value) for name, value in row.items()}) + '\n'
+
+
+def encode_csv(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([encode_value(row[name]) for name in columns])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (encode_ndjson, 'application/x-ndjson'),
+    'csv': (encode_csv, 'text/csv'),
+}
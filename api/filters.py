@@ -0,0 +1,32 @@
+import django_filters
+
+from fabcal.models import OpeningSlot, MachineSlot, TrainingSlot
+
+
+class SlotFilter(django_filters.FilterSet):
+    """
+    Incremental and date range filters shared by the slot endpoints, backed by the updated_at and (start, end) indexes.
+    """
+
+    updated_since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+    start_after = django_filters.IsoDateTimeFilter(field_name='start', lookup_expr='gte')
+    start_before = django_filters.IsoDateTimeFilter(field_name='start', lookup_expr='lt')
+
+
+class OpeningSlotFilter(SlotFilter):
+    class Meta:
+        model = OpeningSlot
+        fields = ['opening', 'user']
+
+
+class MachineSlotFilter(SlotFilter):
+    class Meta:
+        model = MachineSlot
+        fields = ['machine', 'user']
+
+
+class TrainingSlotFilter(SlotFilter):
+    class Meta:
+        model = TrainingSlot
+        fields = ['training', 'user']
+
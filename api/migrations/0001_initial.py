@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=64, verbose_name='Resource')),
+                ('object_id', models.BigIntegerField(verbose_name='Object id')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=16, verbose_name='Action')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Change',
+                'verbose_name_plural': 'Changes',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class Change(models.Model):
+    """
+    A row created, updated or deleted in a resource exposed by the API, read by the delta sync endpoint.
+    """
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+
+    ACTION_CHOICES = [
+        (CREATED, _('Created')),
+        (UPDATED, _('Updated')),
+        (DELETED, _('Deleted')),
+    ]
+
+    resource = models.CharField(max_length=64, verbose_name=_('Resource'))
+    object_id = models.BigIntegerField(verbose_name=_('Object id'))
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES, verbose_name=_('Action'))
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("Change")
+        verbose_name_plural = _("Changes")
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} {self.action}"
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ApiCursorPagination(CursorPagination):
+    """
+    Cursor pagination on the primary key.
+
+    The cost of a page does not grow with its position, and rows inserted while
+    a client walks through the pages are neither skipped nor repeated.
+    """
+
+    ordering = 'pk'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
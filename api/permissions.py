@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from accounts.groups import is_in_group
+
 class IsInApiGroup(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='api').exists()
\ No newline at end of file
+        return is_in_group(request.user, 'api')
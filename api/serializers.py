@@ -55,4 +55,45 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta: 
         model = Profile
-        fields = ['user', 'subscription']
\ No newline at end of file
+        fields = ['user', 'subscription']
+
+class SparseFieldsetMixin:
+    """
+    Only serialize the fields listed in the `fields` query parameter (comma separated), all fields when it is missing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        fields = request.query_params.get('fields') if request else None
+        if fields:
+            requested = set(fields.split(','))
+            for field_name in set(self.fields) - requested:
+                self.fields.pop(field_name)
+
+class OpeningV2Serializer(SparseFieldsetMixin, OpeningSerializer):
+    pass
+
+class OpeningSlotV2Serializer(SparseFieldsetMixin, OpeningSlotSerializer):
+    class Meta(OpeningSlotSerializer.Meta):
+        fields = OpeningSlotSerializer.Meta.fields + ['updated_at']
+
+class MachineSlotV2Serializer(SparseFieldsetMixin, MachineSlotSerializer):
+    machine_title = serializers.CharField(source='machine.title', default=None, read_only=True)
+
+    class Meta(MachineSlotSerializer.Meta):
+        fields = MachineSlotSerializer.Meta.fields + ['machine_id', 'opening_slot_id']
+
+class TrainingSlotV2Serializer(SparseFieldsetMixin, TrainingSlotSerializer):
+    class Meta(TrainingSlotSerializer.Meta):
+        fields = TrainingSlotSerializer.Meta.fields + ['training_id']
+
+class CustomUserV2Serializer(SparseFieldsetMixin, CustomUserSerializer):
+    pass
+
+class SubscriptionV2Serializer(SparseFieldsetMixin, SubscriptionSerializer):
+    pass
+
+class ProfileV2Serializer(SparseFieldsetMixin, ProfileSerializer):
+    pass
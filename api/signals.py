@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+
+from fabcal.signals import machine_slots_saved, opening_slots_saved
+
+from .changes import RESOURCE_BY_MODEL, record_changes
+from .models import Change
+
+def log_save(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only touch last_login, which is not exposed by the API
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    record_changes(sender, [instance.pk], Change.CREATED if created else Change.UPDATED)
+
+def log_delete(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], Change.DELETED)
+
+def log_bulk_save(sender, instances, created, **kwargs):
+    record_changes(sender, [instance.pk for instance in instances], Change.CREATED if created else Change.UPDATED)
+
+for model in RESOURCE_BY_MODEL:
+    post_save.connect(log_save, sender=model, dispatch_uid=f'api-changes-save-{model.__name__}')
+    post_delete.connect(log_delete, sender=model, dispatch_uid=f'api-changes-delete-{model.__name__}')
+
+machine_slots_saved.connect(log_bulk_save, dispatch_uid='api-changes-bulk-save-MachineSlot')
+opening_slots_saved.connect(log_bulk_save, dispatch_uid='api-changes-bulk-save-OpeningSlot')
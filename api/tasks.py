@@ -0,0 +1,13 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from .models import Change
+
+def prune_changes():
+    """
+    Remove the changes older than API_CHANGES_RETENTION_DAYS, sync tokens older than that are refused anyway.
+    """
+    return Change.objects.filter(
+        changed_at__lt=datetime.now() - timedelta(days=settings.API_CHANGES_RETENTION_DAYS)
+    ).delete()
@@ -0,0 +1,227 @@
+import csv
+import datetime
+import json
+
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import CustomUser
+from fabcal.archive import archive_slots
+from fabcal.booking import book_machine_slot
+from fabcal.models import OpeningSlot, MachineSlot
+from fabcal.usage import rollup_machine_usage
+from machines.models import Machine
+from openings.models import Opening
+
+from .changes import read_sync_token
+from .models import Change
+from .serializers import MachineSlotV2Serializer
+
+
+@override_settings(API_CHANGES_SAFETY_LAG=0)
+class ApiV2TestCase(APITestCase):
+    def setUp(self):
+        user = CustomUser.objects.create(username='reporting', email='reporting@fake.django')
+        user.groups.add(Group.objects.create(name='api'))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+
+        opening = Opening.objects.create(
+            title='OpenLab',
+            is_open_to_reservation=True,
+            is_open_to_questions=True,
+            is_reservation_mandatory=False,
+            is_public=True
+        )
+        self.opening_slot = OpeningSlot.objects.create(
+            opening=opening,
+            start=datetime.datetime(2023, 5, 1, 10),
+            end=datetime.datetime(2023, 5, 1, 16)
+        )
+
+        for i in range(5):
+            machine = Machine.objects.create(title=f'Machine {i}')
+            MachineSlot.objects.create(
+                machine=machine,
+                opening_slot=self.opening_slot,
+                start=datetime.datetime(2023, 5, 1, 10 + i),
+                end=datetime.datetime(2023, 5, 1, 11 + i)
+            )
+
+    def test_permission(self):
+        self.client.credentials()
+        response = self.client.get('/api/v2/machine_slot/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_cursor_pagination(self):
+        """
+        Test that the pages are walked with the next cursor and a constant number of queries.
+        """
+        # Only the slot queries, the middlewares run their own
+        def get_page(*args):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(*args)
+            return response, len([query for query in queries if 'fabcal_machineslot' in query['sql']])
+
+        response, slot_queries = get_page('/api/v2/machine_slot/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+        titles = [slot['machine_title'] for slot in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response, next_slot_queries = get_page(next_url)
+            self.assertEqual(next_slot_queries, slot_queries)
+            titles += [slot['machine_title'] for slot in response.data['results']]
+            next_url = response.data['next']
+
+        self.assertEqual(titles, [f'Machine {i}' for i in range(5)])
+
+    def test_filters_and_sparse_fieldsets(self):
+        """
+        Test the updated_since and start range filters together with the fields parameter.
+        """
+        MachineSlot.objects.filter(start__hour__lt=12).update(updated_at=datetime.datetime(2023, 1, 1))
+
+        response = self.client.get('/api/v2/machine_slot/', {
+            'updated_since': '2023-06-01T00:00:00',
+            'start_before': '2023-05-01T14:00:00',
+            'fields': 'id,start'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['start'] for slot in response.data['results']], ['2023-05-01T12:00:00', '2023-05-01T13:00:00'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'start'})
+
+        response = self.client.get('/api/v2/opening_slot/', {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes(self):
+        """
+        Test that the changes since a sync token include updates, creations and deletions, collapsed per row.
+        """
+        response = self.client.get('/api/v2/changes/', {'resources': 'machine_slot'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['changes']), 5)
+        token = response.data['token']
+
+        first, second, third = MachineSlot.objects.order_by('pk')[:3]
+        first.comment = 'Maintenance'
+        first.save()
+        first.comment = None
+        first.save()
+        second_pk = second.pk
+        second.delete()
+        created = MachineSlot.objects.bulk_create([MachineSlot(machine=third.machine, start=third.start, end=third.end)])[0]
+        self.assertEqual(Change.objects.filter(object_id=created.pk).count(), 0)
+
+        response = self.client.get('/api/v2/changes/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(change['resource'], change['id'], change['action']) for change in response.data['changes']],
+            [('machine_slot', first.pk, 'updated'), ('machine_slot', second_pk, 'deleted')]
+        )
+        self.assertEqual(response.data['changes'][0]['data']['machine_title'], 'Machine 0')
+        self.assertIsNone(response.data['changes'][1]['data'])
+        self.assertFalse(response.data['more'])
+
+        # Nothing changed since the last token
+        response = self.client.get('/api/v2/changes/', {'token': response.data['token']})
+        self.assertEqual(response.data['changes'], [])
+
+    def test_changes_of_bookings(self):
+        """
+        Test that the slots split by the booking engine with bulk operations are logged.
+        """
+        machine_slot = MachineSlot.objects.first()
+        token = self.client.get('/api/v2/changes/').data['token']
+
+        book_machine_slot(machine_slot, CustomUser.objects.first(), machine_slot.start + datetime.timedelta(minutes=30), machine_slot.end)
+
+        response = self.client.get('/api/v2/changes/', {'token': token})
+        self.assertEqual(
+            sorted((change['id'], change['action']) for change in response.data['changes']),
+            [(machine_slot.pk, 'updated'), (MachineSlot.objects.last().pk, 'created')]
+        )
+
+    def test_changes_of_archive(self):
+        """
+        Test that the slots moved to the archive are not reported as deleted.
+        """
+        token = self.client.get('/api/v2/changes/').data['token']
+
+        archive_slots(now=datetime.datetime(2025, 1, 1))
+        self.assertFalse(MachineSlot.objects.exists())
+
+        response = self.client.get('/api/v2/changes/', {'token': token})
+        self.assertEqual(response.data['changes'], [])
+
+    @override_settings(API_CHANGES_SAFETY_LAG=60)
+    def test_changes_safety_lag(self):
+        """
+        Test that the recent changes are held back, so that a late commit with a lower pk is not skipped.
+        """
+        Change.objects.update(changed_at=datetime.datetime.now() - datetime.timedelta(minutes=5))
+        token = self.client.get('/api/v2/changes/').data['token']
+
+        MachineSlot.objects.first().save()
+        response = self.client.get('/api/v2/changes/', {'token': token})
+        self.assertEqual(response.data['changes'], [])
+        self.assertEqual(read_sync_token(response.data['token']), read_sync_token(token))
+
+        Change.objects.update(changed_at=datetime.datetime.now() - datetime.timedelta(minutes=5))
+        response = self.client.get('/api/v2/changes/', {'token': token})
+        self.assertEqual(len(response.data['changes']), 1)
+
+    def test_changes_invalid_token(self):
+        response = self.client.get('/api/v2/changes/', {'token': 'forged'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get('/api/v2/changes/', {'resources': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_ndjson(self):
+        """
+        Test the NDJSON export with the serializer columns, the filters and the fields parameter.
+        """
+        response = self.client.get('/api/v2/machine_slot/export.ndjson', {'start_after': '2023-05-01T13:00:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['start'], '2023-05-01T13:00:00')
+        self.assertEqual(rows[0]['machine_title'], 'Machine 3')
+        self.assertEqual(rows[0]['duration'], 60)
+        self.assertEqual(set(rows[0]), set(MachineSlotV2Serializer().fields))
+
+        response = self.client.get('/api/v2/profile/export.ndjson', {'fields': 'user'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [{'user': CustomUser.objects.get().pk}])
+
+    def test_export_csv(self):
+        response = self.client.get('/api/v2/machine_slot/export.csv', {'fields': 'id,machine_title,duration'})
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+        self.assertEqual(rows[0], ['id', 'duration', 'machine_title'])
+        self.assertEqual(rows[1], [str(MachineSlot.objects.first().pk), '60', 'Machine 0'])
+        self.assertEqual(len(rows), 6)
+
+    def test_machine_usage(self):
+        MachineSlot.objects.filter(machine__title='Machine 1').update(user=CustomUser.objects.get())
+        rollup_machine_usage(today=datetime.date(2023, 6, 1))
+
+        response = self.client.get('/api/v2/machine_usage/', {'period': 'month', 'start_date': '2023-05-01', 'end_date': '2023-05-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(response.data['results'][1]['machine_title'], 'Machine 1')
+        self.assertEqual(response.data['results'][1]['booked_minutes'], 60)
+        self.assertEqual(response.data['results'][1]['members'], 1)
+
+        response = self.client.get('/api/v2/machine_usage/', {'period': 'year'})
+        self.assertEqual(response.status_code, 400)
@@ -2,6 +2,7 @@ from django.urls import re_path
 from . import views
 
 urlpatterns = [
+    re_path(r'(?P<version>(v2))/(?P<resource>(opening|opening_slot|machine_slot|training_slot|custom_user|subscription|profile))/export\.(?P<export_format>(ndjson|csv))$', views.ExportSet.as_view()),
     re_path('(?P<version>(v1))/opening/', views.OpeningSet.as_view()),
     re_path('(?P<version>(v1))/opening_slot/', views.OpeningSlotSet.as_view()),
     re_path('(?P<version>(v1))/machine_slot/', views.MachineSlotSet.as_view()),
@@ -9,4 +10,13 @@ urlpatterns = [
     re_path('(?P<version>(v1))/custom_user/', views.CustomUserSet.as_view()),
     re_path('(?P<version>(v1))/subscription/', views.SubscriptionSet.as_view()),
     re_path('(?P<version>(v1))/profile/', views.ProfileSet.as_view()),
+    re_path('(?P<version>(v2))/opening/', views.OpeningV2Set.as_view()),
+    re_path('(?P<version>(v2))/opening_slot/', views.OpeningSlotV2Set.as_view()),
+    re_path('(?P<version>(v2))/machine_slot/', views.MachineSlotV2Set.as_view()),
+    re_path('(?P<version>(v2))/training_slot/', views.TrainingSlotV2Set.as_view()),
+    re_path('(?P<version>(v2))/custom_user/', views.CustomUserV2Set.as_view()),
+    re_path('(?P<version>(v2))/subscription/', views.SubscriptionV2Set.as_view()),
+    re_path('(?P<version>(v2))/profile/', views.ProfileV2Set.as_view()),
+    re_path('(?P<version>(v2))/changes/', views.ChangeSet.as_view()),
+    re_path('(?P<version>(v2))/machine_usage/', views.MachineUsageSet.as_view()),
 ]
\ No newline at end of file
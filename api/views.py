@@ -1,11 +1,21 @@
+from django.core import signing
+from django.http import StreamingHttpResponse
+
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.views import APIView
 
 from rest_framework.authentication import TokenAuthentication
+from django_filters.rest_framework import DjangoFilterBackend
 from .permissions import IsInApiGroup
+from .changes import RESOURCES, get_changes, make_sync_token, read_sync_token
+from .exports import EXPORT_FILTERS, EXPORT_FORMATS, get_export_columns, iter_export_rows
+from .filters import OpeningSlotFilter, MachineSlotFilter, TrainingSlotFilter
+from .pagination import ApiCursorPagination
 
 from accounts.models import CustomUser, Subscription, Profile
+from fabcal.forms import MachineUsageReportForm
 from fabcal.models import OpeningSlot, MachineSlot, TrainingSlot
 from openings.models import Opening
 
@@ -14,6 +24,8 @@ from .serializers import CustomUserSerializer
 from .serializers import OpeningSerializer
 from .serializers import SubscriptionSerializer
 from .serializers import ProfileSerializer
+from .serializers import OpeningV2Serializer, OpeningSlotV2Serializer, MachineSlotV2Serializer, TrainingSlotV2Serializer
+from .serializers import CustomUserV2Serializer, SubscriptionV2Serializer, ProfileV2Serializer
 
 class OpeningSet(generics.ListAPIView):
     authentication_classes = [TokenAuthentication]
@@ -30,7 +42,7 @@ class OpeningSlotSet(generics.ListAPIView):
 class MachineSlotSet(generics.ListAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsInApiGroup]
-    queryset = MachineSlot.objects.all()
+    queryset = MachineSlot.objects.select_related('machine')
     serializer_class = MachineSlotSerializer
 
 class TrainingSlotSet(generics.ListAPIView):
@@ -55,4 +67,132 @@ class ProfileSet(generics.ListAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsInApiGroup]
     queryset = Profile.objects.all()
-    serializer_class = ProfileSerializer
\ No newline at end of file
+    serializer_class = ProfileSerializer
+
+
+class ApiV2ListView(generics.ListAPIView):
+    """
+    Base of the v2 endpoints: cursor pagination, filters and sparse fieldsets (`?fields=id,start`).
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsInApiGroup]
+    pagination_class = ApiCursorPagination
+    filter_backends = [DjangoFilterBackend]
+
+class OpeningV2Set(ApiV2ListView):
+    queryset = Opening.objects.all()
+    serializer_class = OpeningV2Serializer
+
+class OpeningSlotV2Set(ApiV2ListView):
+    queryset = OpeningSlot.objects.all()
+    serializer_class = OpeningSlotV2Serializer
+    filterset_class = OpeningSlotFilter
+
+class MachineSlotV2Set(ApiV2ListView):
+    queryset = MachineSlot.objects.select_related('machine')
+    serializer_class = MachineSlotV2Serializer
+    filterset_class = MachineSlotFilter
+
+class TrainingSlotV2Set(ApiV2ListView):
+    queryset = TrainingSlot.objects.all()
+    serializer_class = TrainingSlotV2Serializer
+    filterset_class = TrainingSlotFilter
+
+class CustomUserV2Set(ApiV2ListView):
+    queryset = CustomUser.objects.all()
+    serializer_class = CustomUserV2Serializer
+
+class SubscriptionV2Set(ApiV2ListView):
+    queryset = Subscription.objects.all()
+    serializer_class = SubscriptionV2Serializer
+
+class ProfileV2Set(ApiV2ListView):
+    queryset = Profile.objects.all()
+    serializer_class = ProfileV2Serializer
+
+class ChangeSet(APIView):
+    """
+    Delta sync: the rows created, updated or deleted since the `token` returned by the previous call.
+
+    Without a token, every change still in the log is returned. The `resources`
+    parameter restricts the changes to some resources (comma separated). A 410
+    response means the token is too old, the client has to download the
+    resources again from the list endpoints.
+
+    Slots moved to the archive by fabcal.archive are not reported as deleted,
+    they only leave the list and export endpoints, which return current rows.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsInApiGroup]
+
+    def get(self, request, *args, **kwargs):
+        resources = request.query_params.get('resources')
+        resources = resources.split(',') if resources else None
+        if resources and not set(resources) <= set(RESOURCES):
+            return Response({'detail': 'Unknown resource.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = 0
+        token = request.query_params.get('token')
+        if token:
+            try:
+                since = read_sync_token(token)
+            except signing.SignatureExpired:
+                return Response({'detail': 'Sync token expired, please synchronize again.'}, status=status.HTTP_410_GONE)
+            except signing.BadSignature:
+                return Response({'detail': 'Invalid sync token.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes, position, more = get_changes(since, resources)
+
+        return Response({
+            'changes': changes,
+            'token': make_sync_token(position),
+            'more': more,
+        })
+
+class MachineUsageSet(APIView):
+    """
+    Usage of the machines per `period` (day, week or month) from `start_date` to `end_date`, optionally of one `machine`.
+
+    Answered from the daily rollups of fabcal.usage, which cover the days before today.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsInApiGroup]
+
+    def get(self, request, *args, **kwargs):
+        form = MachineUsageReportForm(request.query_params)
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': form.get_report()})
+
+class ExportSet(APIView):
+    """
+    Stream a whole resource as NDJSON or CSV, with the columns of its v2 serializer.
+
+    The rows are read with values() by chunks and encoded as they are sent, so
+    memory stays constant whatever the size of the table. The filters and the
+    `fields` parameter of the list endpoint apply.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsInApiGroup]
+
+    def get(self, request, resource, export_format, *args, **kwargs):
+        model, queryset, serializer_class = RESOURCES[resource]
+
+        filterset_class = EXPORT_FILTERS.get(resource)
+        if filterset_class:
+            filterset = filterset_class(request.query_params, queryset=queryset, request=request)
+            if not filterset.is_valid():
+                return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+            queryset = filterset.qs
+
+        fields = request.query_params.get('fields')
+        columns, lookups = get_export_columns(serializer_class, fields.split(',') if fields else None)
+
+        encode, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            encode(iter_export_rows(queryset, columns, lookups), columns),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{export_format}"'
+        return response
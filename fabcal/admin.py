@@ -10,6 +10,12 @@ class OpeningSlotAdmin(admin.ModelAdmin):
     search_fields = ["user__first_name"]
     ordering = ['-start']
 
+@admin.register(OpeningSeries)
+class OpeningSeriesAdmin(admin.ModelAdmin):
+    list_display = ['opening', 'weekday', 'start_time', 'end_time', 'start_date', 'until', 'user']
+    filter_horizontal = ['machines']
+    ordering = ['-start_date']
+
 @admin.register(EventSlot)
 class EventSlotAdmin(admin.ModelAdmin):
     list_display = ['event', 'start', 'end', 'user', 'is_active', 'registration_required']
@@ -5,3 +5,6 @@ from django.utils.translation import gettext_lazy as _
 class FabcalConfig(AppConfig):
     name = 'fabcal'
     verbose_name = _('Fabcal') 
+
+    def ready(self):
+        import fabcal.signals
@@ -0,0 +1,117 @@
+"""
+Archive of the opening and machine slots ended for FABCAL_ARCHIVE_AFTER_DAYS.
+
+Old slots are moved to ArchivedOpeningSlot and ArchivedMachineSlot, with
+their pk, so that the calendar, the booking engine and the validators only
+scan current rows. History pages and reports read both tables through the
+functions below.
+
+Opening slots with events or trainings stay in place: their events and
+trainings are still shown in the events archive and in the API.
+
+Archived rows are removed without post_delete signals: they are history,
+not deletions. The API change log records nothing for them, and the API
+list and export endpoints do not return archived history.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .feeds import bump_calendar_generation
+from .models import ArchivedMachineSlot, ArchivedOpeningSlot, EventSlot, MachineSlot, OpeningSlot, TrainingSlot
+
+SLOT_FIELDS = ('id', 'user_id', 'start', 'end', 'comment', 'created_at', 'updated_at')
+
+
+def get_archive_horizon(now=None):
+    """Return the datetime before which ended slots are archived."""
+    return (now or datetime.datetime.now()) - datetime.timedelta(days=settings.FABCAL_ARCHIVE_AFTER_DAYS)
+
+
+def archive_slots(now=None, batch_size=None):
+    """
+    Move a batch of the opening slots ended before the archive horizon, with their machine slots, to the archive.
+
+    Machine slots without opening slot are archived on their own end. Each
+    batch is copied and removed in a single transaction, so a slot is always
+    found in exactly one of the tables.
+
+    Returns:
+        dict: The number of opening and machine slots archived.
+    """
+    horizon = get_archive_horizon(now)
+    batch_size = batch_size or settings.FABCAL_ARCHIVE_BATCH_SIZE
+
+    with transaction.atomic():
+        opening_slots = list(
+            OpeningSlot.objects.select_for_update(skip_locked=True)
+            .filter(end__lt=horizon)
+            .exclude(pk__in=EventSlot.objects.filter(opening_slot__isnull=False).values('opening_slot'))
+            .exclude(pk__in=TrainingSlot.objects.filter(opening_slot__isnull=False).values('opening_slot'))
+            .order_by('end')[:batch_size]
+        )
+        # Every machine slot of the locked opening slots is copied, waiting for
+        # the ones held by a booking, as deleting the opening slot removes them all
+        machine_slots = list(
+            MachineSlot.objects.select_for_update()
+            .filter(opening_slot__in=[opening_slot.pk for opening_slot in opening_slots])
+        ) + list(
+            MachineSlot.objects.select_for_update(skip_locked=True)
+            .filter(opening_slot__isnull=True, end__lt=horizon)
+            .order_by('end')[:batch_size]
+        )
+
+        ArchivedOpeningSlot.objects.bulk_create([
+            ArchivedOpeningSlot(opening_id=opening_slot.opening_id, **{field: getattr(opening_slot, field) for field in SLOT_FIELDS})
+            for opening_slot in opening_slots
+        ])
+        ArchivedMachineSlot.objects.bulk_create([
+            ArchivedMachineSlot(
+                machine_id=machine_slot.machine_id,
+                opening_slot_id=machine_slot.opening_slot_id,
+                **{field: getattr(machine_slot, field) for field in SLOT_FIELDS}
+            )
+            for machine_slot in machine_slots
+        ])
+
+        # Raw deletes send no post_delete, see the module docstring. The machine
+        # slots go first, so no row is left pointing to a deleted opening slot.
+        MachineSlot.objects.filter(pk__in=[machine_slot.pk for machine_slot in machine_slots])._raw_delete(MachineSlot.objects.db)
+        OpeningSlot.objects.filter(pk__in=[opening_slot.pk for opening_slot in opening_slots])._raw_delete(OpeningSlot.objects.db)
+
+    if opening_slots or machine_slots:
+        bump_calendar_generation()
+
+    return {'opening_slots': len(opening_slots), 'machine_slots': len(machine_slots)}
+
+
+def archive_all_slots(now=None):
+    """Archive batches of slots until none is left before the horizon, see archive_slots."""
+    result = {'opening_slots': 0, 'machine_slots': 0}
+    while True:
+        archived = archive_slots(now)
+        for key, count in archived.items():
+            result[key] += count
+        if not any(archived.values()):
+            return result
+
+
+def get_machine_reservations(*conditions, include_archive=True, **filters):
+    """
+    Return the reservations of the machine slots matching `conditions` and `filters`, archived ones included unless `include_archive` is False.
+
+    Rows are dicts with the start, end, machine_title, user_first_name and
+    user_last_name of the reservation, read in one UNION query.
+    """
+    def reservations(model):
+        return model.objects.filter(*conditions, user__isnull=False, **filters).annotate(
+            machine_title=F('machine__title'),
+            user_first_name=F('user__first_name'),
+            user_last_name=F('user__last_name')
+        ).values('id', 'start', 'end', 'machine_title', 'user_first_name', 'user_last_name')
+
+    if not include_archive:
+        return reservations(MachineSlot)
+    return reservations(MachineSlot).union(reservations(ArchivedMachineSlot), all=True)
@@ -0,0 +1,107 @@
+"""
+Free machine slots that can still be booked.
+
+A free slot is a MachineSlot without user. It can be booked when it lasts at
+least FABCAL_MINIMUM_RESERVATION_TIME minutes and has not ended yet.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import DurationField, ExpressionWrapper, F
+
+from .models import MachineSlot
+
+# Longest period searched at once for free machine slots
+MACHINE_SEARCH_MAX_DAYS = 31
+
+
+def is_bookable(machine_slot):
+    return (
+        machine_slot.user_id is None
+        and machine_slot.end - machine_slot.start >= datetime.timedelta(minutes=settings.FABCAL_MINIMUM_RESERVATION_TIME)
+    )
+
+
+def get_machine_availability(machine, now=None):
+    """
+    Return the next opening slots of `machine` with their bookable free slots, in a single query.
+
+    Every opening slot where the machine is available is listed, even when it
+    is fully booked. Its bookable free slots are set on its
+    `free_machine_slots` attribute, by start.
+
+    Returns:
+        list: The opening slots, by start.
+    """
+    machine_slots = MachineSlot.objects.filter(
+        machine=machine,
+        end__gt=now or datetime.datetime.now(),
+        opening_slot__isnull=False
+    ).select_related('opening_slot__opening', 'opening_slot__user').order_by('start')
+
+    opening_slots = {}
+    for machine_slot in machine_slots:
+        opening_slot = opening_slots.get(machine_slot.opening_slot_id)
+        if opening_slot is None:
+            opening_slot = opening_slots[machine_slot.opening_slot_id] = machine_slot.opening_slot
+            opening_slot.free_machine_slots = []
+
+        if is_bookable(machine_slot):
+            opening_slot.free_machine_slots.append(machine_slot)
+
+    # Opening slots do not overlap, so they were met by start
+    return list(opening_slots.values())
+
+
+def _round_up(start, origin, increment):
+    """Return the first time from `origin` by steps of `increment` that is not before `start`."""
+    steps = -((origin - start) // increment)
+    return origin + max(steps, 0) * increment
+
+
+def search_free_machine_slots(machines, duration, start, end, now=None):
+    """
+    Return the free slots of `machines` where `duration` can be booked between `start` and `end`, in a single query.
+
+    Free slots are clipped to the searched period and to the current time, the
+    earliest start is rounded up to FABCAL_RESERVATION_INCREMENT_TIME from the
+    start of the slot. The bookable period is set on the `bookable_start` and
+    `bookable_end` attributes of each slot.
+
+    Args:
+        machines: Queryset of the machines to search, only reservable and available machines are kept.
+        duration: The timedelta to book, at least FABCAL_MINIMUM_RESERVATION_TIME.
+        start: The datetime from which to search.
+        end: The datetime until which to search.
+
+    Returns:
+        list: The free slots, the earliest first, then the shortest so that longer slots stay free for longer bookings.
+    """
+    duration = max(duration, datetime.timedelta(minutes=settings.FABCAL_MINIMUM_RESERVATION_TIME))
+    increment = datetime.timedelta(minutes=settings.FABCAL_RESERVATION_INCREMENT_TIME)
+    start = max(start, now or datetime.datetime.now())
+
+    machine_slots = MachineSlot.objects.annotate(
+        length=ExpressionWrapper(F('end') - F('start'), output_field=DurationField())
+    ).filter(
+        machine__in=machines.filter(reservable=True, status='available'),
+        user__isnull=True,
+        opening_slot__isnull=False,
+        start__lte=end - duration,
+        end__gte=start + duration,
+        length__gte=duration
+    ).select_related('machine', 'opening_slot__opening')
+
+    results = []
+    for machine_slot in machine_slots:
+        machine_slot.bookable_start = _round_up(start, machine_slot.start, increment)
+        machine_slot.bookable_end = min(machine_slot.end, end)
+        if machine_slot.bookable_end - machine_slot.bookable_start >= duration:
+            results.append(machine_slot)
+
+    results.sort(key=lambda machine_slot: (
+        machine_slot.bookable_start,
+        machine_slot.bookable_end - machine_slot.bookable_start,
+        machine_slot.machine.title
+    ))
+    return results
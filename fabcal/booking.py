@@ -0,0 +1,278 @@
+"""
+Booking engine for machine slots.
+
+Within an opening slot, the slots of a machine (free or booked) follow each
+other without gaps. Booking, moving or releasing a reservation rewrites that
+sequence: the machine row is locked first so that concurrent bookings of the
+same machine are serialised, then the affected slots are written back in a
+single transaction.
+"""
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from machines.models import Machine
+
+from .models import MachineSlot
+from .signals import machine_slots_saved
+
+
+class MachineSlotDiff:
+    """
+    Changes applied by the booking engine.
+
+    Attributes:
+        slot: The booked (or released) machine slot.
+        created: Free slots created to fill the remaining time.
+        updated: Neighbouring slots that were shrunk or extended.
+        deleted: Slots absorbed by the booking or merged into a neighbour.
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.created = []
+        self.updated = []
+        self.deleted = []
+
+    def create(self, template, start, end):
+        slot = MachineSlot(
+            machine_id=template.machine_id,
+            opening_slot_id=template.opening_slot_id,
+            start=start,
+            end=end
+        )
+        self.created.append(slot)
+        return slot
+
+    def update(self, slot):
+        if slot.pk is not None and not any(slot is updated for updated in self.updated):
+            self.updated.append(slot)
+
+    def delete(self, slot):
+        if slot.pk is None:
+            self.created.remove(slot)
+        else:
+            self.updated = [updated for updated in self.updated if updated is not slot]
+            self.deleted.append(slot)
+
+
+def lock_machine_slots(machine_slot):
+    """
+    Lock the machine of `machine_slot` and return its slots in the same opening slot, ordered by start.
+
+    Must be called inside a transaction. Locking the machine row, and not only
+    the slots, also serialises bookings against slots created by a concurrent
+    transaction after the slots were read.
+    """
+    list(Machine.objects.select_for_update().filter(pk=machine_slot.machine_id).values_list('pk', flat=True))
+
+    return list(
+        MachineSlot.objects.select_for_update()
+        .filter(machine=machine_slot.machine_id, opening_slot=machine_slot.opening_slot_id)
+        .order_by('start')
+    )
+
+
+def _split_slots(machine_slot, slots):
+    for index, slot in enumerate(slots):
+        # The slot must still belong to whom the caller thinks, a free slot
+        # booked in the meantime by another member is not available anymore
+        if slot.pk == machine_slot.pk and slot.user_id == machine_slot.user_id:
+            return slot, slots[:index] + slots[index + 1:]
+
+    raise ValidationError(
+        _("This reservation is no longer available, please try again."),
+        code='machine_slot_not_available'
+    )
+
+
+def _check_availability(booking, slots, start, end):
+    opening_start = min([booking.start] + [slot.start for slot in slots])
+    opening_end = max([booking.end] + [slot.end for slot in slots])
+
+    if start < opening_start:
+        raise ValidationError(
+            _("You cannot start earlier than %(start_time)s"),
+            params={'start_time': opening_start.strftime('%H:%M')},
+            code='invalid_start_time'
+        )
+
+    if end > opening_end:
+        raise ValidationError(
+            _("You cannot end later than %(end_time)s"),
+            params={'end_time': opening_end.strftime('%H:%M')},
+            code='invalid_end_time'
+        )
+
+    conflicts = [
+        slot for slot in slots
+        if slot.start < end and slot.end > start and slot.user_id is not None and slot.user_id != booking.user_id
+    ]
+    conflicts_before = [slot for slot in conflicts if slot.start < booking.start]
+
+    if conflicts_before:
+        raise ValidationError(
+            _("The machine is already booked until %(time)s!"),
+            params={'time': max(slot.end for slot in conflicts_before).strftime('%H:%M')},
+            code='machine_slot_already_booked'
+        )
+
+    if conflicts:
+        raise ValidationError(
+            _("The machine is already booked from %(time)s!"),
+            params={'time': min(slot.start for slot in conflicts).strftime('%H:%M')},
+            code='machine_slot_already_booked'
+        )
+
+
+def check_machine_slot_availability(machine_slot, start, end):
+    """
+    Check that `machine_slot` can be booked from `start` to `end`, without locking.
+
+    Used to report errors early in forms, `book_machine_slot` checks again under lock.
+
+    Raises:
+        ValidationError: If the slot disappeared or the machine is booked by someone else during the period.
+    """
+    slots = MachineSlot.objects.filter(
+        machine=machine_slot.machine_id,
+        opening_slot=machine_slot.opening_slot_id
+    ).order_by('start')
+    booking, slots = _split_slots(machine_slot, list(slots))
+    _check_availability(booking, slots, start, end)
+
+
+def _free_time(diff, slots, template, start, end):
+    """Give [start, end[ back as free time, merging it with the free slots around it."""
+    live = [slot for slot in slots if not any(slot is deleted for deleted in diff.deleted)] + diff.created
+    previous_slot = next((slot for slot in live if slot.user_id is None and slot.end == start), None)
+    next_slot = next((slot for slot in live if slot.user_id is None and slot.start == end), None)
+
+    if previous_slot and next_slot:
+        previous_slot.end = next_slot.end
+        diff.update(previous_slot)
+        diff.delete(next_slot)
+    elif previous_slot:
+        previous_slot.end = end
+        diff.update(previous_slot)
+    elif next_slot:
+        next_slot.start = start
+        diff.update(next_slot)
+    else:
+        diff.create(template, start, end)
+
+
+def _apply(diff):
+    now = datetime.datetime.now()
+
+    diff.slot.save()
+
+    if diff.deleted:
+        MachineSlot.objects.filter(pk__in=[slot.pk for slot in diff.deleted]).delete()
+
+    if diff.updated:
+        for slot in diff.updated:
+            slot.updated_at = now
+        MachineSlot.objects.bulk_update(diff.updated, ['start', 'end', 'user', 'updated_at'])
+        machine_slots_saved.send(sender=MachineSlot, instances=diff.updated, created=False)
+
+    if diff.created:
+        diff.created = MachineSlot.objects.bulk_create(diff.created)
+        machine_slots_saved.send(sender=MachineSlot, instances=diff.created, created=True)
+
+
+def _sync(machine_slot, diff):
+    """Copy the saved state of the locked slot onto the caller's instance and make it the slot of the diff."""
+    for field in ('user_id', 'start', 'end', 'updated_at'):
+        setattr(machine_slot, field, getattr(diff.slot, field))
+    diff.slot = machine_slot
+    return diff
+
+
+def book_machine_slot(machine_slot, user, start, end):
+    """
+    Book `machine_slot` from `start` to `end`, or move an existing reservation to these times.
+
+    The time left free before and after a new reservation becomes free slots,
+    the free slots covered by the reservation are shrunk or deleted, and time
+    released by a shorter reservation is merged back into the free slots
+    around it. Availability is checked again once the machine is locked.
+
+    Args:
+        machine_slot: The free slot being booked, or the reservation being updated.
+        user: The member booking the slot, ignored when the slot is already booked.
+        start: The start datetime of the reservation.
+        end: The end datetime of the reservation.
+
+    Returns:
+        MachineSlotDiff: The booked slot and the slots created, updated and deleted around it.
+
+    Raises:
+        ValidationError: If the slot disappeared or the machine is booked by someone else during the period.
+    """
+    with transaction.atomic():
+        booking, slots = _split_slots(machine_slot, lock_machine_slots(machine_slot))
+        _check_availability(booking, slots, start, end)
+
+        diff = MachineSlotDiff(booking)
+
+        # Shrink or absorb the slots now covered by the reservation
+        for slot in slots:
+            if slot.start >= end or slot.end <= start:
+                continue
+
+            if slot.start < start and slot.end > end:
+                diff.create(slot, end, slot.end).user_id = slot.user_id
+                slot.end = start
+                diff.update(slot)
+            elif slot.start < start:
+                slot.end = start
+                diff.update(slot)
+            elif slot.end > end:
+                slot.start = end
+                diff.update(slot)
+            else:
+                diff.delete(slot)
+
+        # Give back the time the reservation does not cover anymore, the part
+        # before it first so that new free slots keep a chronological pk order
+        if booking.start < start:
+            _free_time(diff, slots, booking, booking.start, min(start, booking.end))
+        if booking.end > end:
+            _free_time(diff, slots, booking, max(end, booking.start), booking.end)
+
+        if booking.user_id is None:
+            booking.user = user
+        booking.start = start
+        booking.end = end
+
+        _apply(diff)
+
+    return _sync(machine_slot, diff)
+
+
+def release_machine_slot(machine_slot):
+    """
+    Cancel the reservation of `machine_slot`, merging it with the free slots just before and after.
+
+    Returns:
+        MachineSlotDiff: The released slot and the neighbouring free slots merged into it.
+    """
+    with transaction.atomic():
+        booking, slots = _split_slots(machine_slot, lock_machine_slots(machine_slot))
+
+        diff = MachineSlotDiff(booking)
+        for slot in slots:
+            if slot.user_id is None and slot.end == booking.start:
+                booking.start = slot.start
+                diff.delete(slot)
+            elif slot.user_id is None and slot.start == booking.end:
+                booking.end = slot.end
+                diff.delete(slot)
+
+        booking.user = None
+        _apply(diff)
+
+    return _sync(machine_slot, diff)
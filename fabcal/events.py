@@ -0,0 +1,75 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .feeds import get_calendar_generation
+from .models import EventSlot
+
+EVENTS_ARCHIVE_KEY = 'fabcal:events-archive:{generation}:{today}:{cursor}'
+EVENTS_ARCHIVE_TIMEOUT = 60 * 60 * 24
+
+
+def make_events_archive_cursor(pk, start):
+    return '{}.{}'.format(pk, start.isoformat())
+
+
+def read_events_archive_cursor(cursor):
+    """
+    Returns:
+        tuple: The pk and start of the last event slot of the previous page, None if `cursor` is invalid.
+    """
+    try:
+        pk, start = cursor.split('.', 1)
+        return int(pk), datetime.datetime.fromisoformat(start)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_past_event_slots(cursor=None, page_size=None, today=None):
+    """
+    Return a page of the past event slots, the most recent first, paginated by keyset on (start, pk).
+
+    Returns:
+        tuple: The event slots of the page, and the cursor of the next page (None on the last page).
+    """
+    page_size = page_size or settings.FABCAL_EVENTS_ARCHIVE_PAGE_SIZE
+    queryset = EventSlot.objects.filter(end__lt=today or datetime.date.today()).select_related('event')
+
+    cursor = read_events_archive_cursor(cursor) if cursor else None
+    if cursor is not None:
+        pk, start = cursor
+        queryset = queryset.filter(Q(start__lt=start) | Q(start=start, pk__lt=pk))
+
+    event_slots = list(queryset.order_by('-start', '-pk')[:page_size + 1])
+    if len(event_slots) > page_size:
+        return event_slots[:page_size], make_events_archive_cursor(event_slots[page_size - 1].pk, event_slots[page_size - 1].start)
+    return event_slots, None
+
+
+def render_events_archive_page(cursor=None):
+    """
+    Return the rendered cards of a page of past events and the cursor of the next page.
+
+    Pages are cached until an event or event slot changes (the calendar
+    generation is bumped by fabcal.signals) or the day changes, so the cost of
+    the events page does not grow with the archive.
+    """
+    today = datetime.date.today()
+
+    # Only valid cursors reach the cache key, an invalid one shows the first page
+    cursor = read_events_archive_cursor(cursor) if cursor else None
+    cursor = make_events_archive_cursor(*cursor) if cursor else None
+    key = EVENTS_ARCHIVE_KEY.format(generation=get_calendar_generation(), today=today, cursor=cursor or '')
+
+    page = cache.get(key)
+    if page is None:
+        event_slots, next_cursor = get_past_event_slots(cursor, today=today)
+        html = mark_safe(render_to_string('fabcal/events_archive.html', {'event_slots': event_slots}).strip())
+        page = (html, next_cursor)
+        cache.set(key, page, timeout=EVENTS_ARCHIVE_TIMEOUT)
+
+    return page
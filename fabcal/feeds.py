@@ -0,0 +1,263 @@
+import datetime
+import calendar
+
+from django.core.cache import cache
+from django.db.models import Value, CharField, F
+
+from .models import OpeningSlot, EventSlot, TrainingSlot, MachineSlot
+
+CALENDAR_GENERATION_KEY = 'fabcal:calendar-generation'
+CALENDAR_MODIFIED_KEY = 'fabcal:calendar-modified'
+CALENDAR_EVENTS_KEY = 'fabcal:calendar-events:{generation}:{start}:{end}'
+CALENDAR_EVENTS_TIMEOUT = 60 * 60 * 24
+WEEKLY_SCHEDULE_KEY = 'fabcal:weekly-schedule:{generation}:{today}:{visibility}'
+
+# Largest window served at once, a month view with its leading and trailing weeks fits in it
+CALENDAR_MAX_WINDOW_DAYS = 62
+
+
+def get_calendar_generation():
+    """
+    Return the current calendar generation counter.
+
+    The counter is bumped every time a slot shown on the calendar is saved or
+    deleted, so that any cached feed built on an older generation is ignored.
+    It lives in the cache shared by all the processes, see CACHES in the settings.
+    """
+    generation = cache.get(CALENDAR_GENERATION_KEY)
+    if generation is None:
+        cache.add(CALENDAR_GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(CALENDAR_GENERATION_KEY, 1)
+    return generation
+
+
+def get_calendar_last_modified():
+    """Return the datetime of the last calendar change, used for HTTP Last-Modified."""
+    modified = cache.get(CALENDAR_MODIFIED_KEY)
+    if modified is None:
+        modified = datetime.datetime.now().replace(microsecond=0)
+        cache.add(CALENDAR_MODIFIED_KEY, modified, timeout=None)
+        modified = cache.get(CALENDAR_MODIFIED_KEY, modified)
+    return modified
+
+
+def bump_calendar_generation():
+    """Invalidate every cached calendar feed by incrementing the generation counter."""
+    cache.set(CALENDAR_MODIFIED_KEY, datetime.datetime.now().replace(microsecond=0), timeout=None)
+    try:
+        return cache.incr(CALENDAR_GENERATION_KEY)
+    except ValueError:
+        # Counter not initialised yet (or evicted): start a new generation
+        cache.set(CALENDAR_GENERATION_KEY, 1, timeout=None)
+        return 1
+
+
+def get_initial_window(today=None):
+    """
+    Return the (start, end) dates shown when the calendar is opened.
+
+    It covers the month grid of the current month (weeks start on monday) and the
+    next four days, so both the desktop month view and the mobile 4 days view are
+    served without an extra request.
+    """
+    today = today or datetime.date.today()
+    first_day = today.replace(day=1)
+    last_day = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+    start = first_day - datetime.timedelta(days=first_day.weekday())
+    end = max(
+        last_day + datetime.timedelta(days=6 - last_day.weekday()),
+        today + datetime.timedelta(days=3)
+    )
+    return start, end
+
+
+def get_machines_by_opening_slot(opening_slot_ids):
+    """
+    Map each opening slot pk to the list of distinct machines available during it.
+
+    A single joined query replaces the ArrayAgg annotation and the follow-up
+    Machine lookup, and keeps machines unique even when their slots are split
+    by reservations.
+    """
+    machines = {pk: [] for pk in opening_slot_ids}
+    seen = set()
+
+    rows = MachineSlot.objects.filter(
+        opening_slot__in=opening_slot_ids,
+        machine__isnull=False
+    ).values_list(
+        'opening_slot_id', 'machine_id', 'machine__title', 'machine__category__name'
+    ).order_by('opening_slot_id', 'machine_id')
+
+    for opening_slot_id, machine_id, title, category in rows:
+        if (opening_slot_id, machine_id) in seen:
+            continue
+        seen.add((opening_slot_id, machine_id))
+        machines[opening_slot_id].append({'pk': machine_id, 'title': title, 'category': category})
+
+    return machines
+
+
+def build_calendar_events(start, end):
+    """
+    Build the public list of calendar events (openings, events and trainings) overlapping [start, end[.
+
+    The result does not depend on the current user and can be shared between requests.
+    """
+    window = {'end__gt': start, 'start__lt': end}
+
+    opening_slots = list(
+        OpeningSlot.objects.filter(**window)
+        .annotate(
+            type=Value('opening', output_field=CharField()),
+            user_firstname=F('user__first_name'),
+            username=F('user__username'),
+            title=F('opening__title'),
+            desc=F('opening__desc'),
+            background_color=F('opening__background_color'),
+            color=F('opening__color'),
+        )
+        .values(
+            'type',
+            'pk',
+            'username',
+            'user_firstname',
+            'start',
+            'end',
+            'comment',
+            'title',
+            'desc',
+            'background_color',
+            'color'
+        )
+    )
+
+    machines = get_machines_by_opening_slot([slot['pk'] for slot in opening_slots])
+    for slot in opening_slots:
+        slot['machines'] = machines[slot['pk']]
+
+    event_slots = list(
+        EventSlot.objects.filter(**window)
+        .annotate(
+            type=Value('event', output_field=CharField()),
+            user_firstname=F('user__first_name'),
+            username=F('user__username'),
+            title=F('event__title'),
+            desc=F('event__lead'),
+            background_color=F('event__background_color'),
+            color=F('event__color')
+        )
+        .values(
+            'type',
+            'pk',
+            'username',
+            'user_firstname',
+            'start',
+            'end',
+            'comment',
+            'title',
+            'desc',
+            'background_color',
+            'color'
+        )
+    )
+
+    training_slots = list(
+        TrainingSlot.objects.filter(**window)
+        .annotate(
+            type=Value('training', output_field=CharField()),
+            user_firstname=F('user__first_name'),
+            username=F('user__username'),
+            title=F('training__title'),
+            training_pk=F('training__pk'),
+            background_color=Value('#ddf9ff', output_field=CharField()),
+            color=Value('#0b1783', output_field=CharField())
+        )
+        .values(
+            'type',
+            'training_pk',
+            'username',
+            'user_firstname',
+            'start',
+            'end',
+            'comment',
+            'title',
+            'background_color',
+            'color'
+        )
+    )
+
+    return opening_slots + event_slots + training_slots
+
+
+def get_calendar_events(start, end):
+    """
+    Return the calendar events between the `start` and `end` dates (both included), cached per calendar generation.
+    """
+    key = CALENDAR_EVENTS_KEY.format(generation=get_calendar_generation(), start=start.isoformat(), end=end.isoformat())
+
+    events = cache.get(key)
+    if events is None:
+        events = build_calendar_events(
+            datetime.datetime.combine(start, datetime.time.min),
+            datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)
+        )
+        cache.set(key, events, timeout=CALENDAR_EVENTS_TIMEOUT)
+    return events
+
+
+def build_weekly_schedule(today, include_private=False):
+    """
+    Build the opening slots of the 7 days starting at `today`, grouped by day in a single pass.
+
+    Private openings are only included with `include_private`, for the superusers.
+
+    Returns:
+        list: A (date, opening slots) pair for each day.
+    """
+    days = [today + datetime.timedelta(days=x) for x in range(7)]
+
+    opening_slots = OpeningSlot.objects.filter(
+        end__gt=datetime.datetime.combine(days[0], datetime.time.min),
+        start__lt=datetime.datetime.combine(days[-1] + datetime.timedelta(days=1), datetime.time.min)
+    )
+    if not include_private:
+        opening_slots = opening_slots.filter(opening__is_public=True)
+
+    rows = opening_slots.annotate(
+        title=F('opening__title'),
+        desc=F('opening__desc'),
+        background_color=F('opening__background_color'),
+        color=F('opening__color'),
+    ).values('start', 'end', 'title', 'desc', 'background_color', 'color').order_by('start')
+
+    schedule = [(day, []) for day in days]
+    for row in rows:
+        # An opening still running from the day before is shown today
+        schedule[max((row['start'].date() - today).days, 0)][1].append(row)
+
+    return schedule
+
+
+def get_weekly_schedule(include_private=False, now=None):
+    """
+    Return the weekly schedule from build_weekly_schedule(), cached per day and calendar generation.
+
+    The public and the superuser schedules are cached separately, the openings
+    already over at `now` are left out.
+    """
+    now = now or datetime.datetime.now()
+    key = WEEKLY_SCHEDULE_KEY.format(
+        generation=get_calendar_generation(),
+        today=now.date().isoformat(),
+        visibility='all' if include_private else 'public'
+    )
+
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = build_weekly_schedule(now.date(), include_private)
+        cache.set(key, schedule, timeout=CALENDAR_EVENTS_TIMEOUT)
+
+    return [(day, [slot for slot in slots if slot['end'] > now]) for day, slots in schedule]
+
@@ -1,23 +1,29 @@
 import os
 import datetime
-from copy import deepcopy
 
 from django import forms
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 from django.forms import ModelForm
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.safestring import mark_safe 
 from django.utils.translation import gettext_lazy as _
 
-from machines.models import Training, TrainingNotification, Machine
+from machines.models import Training, TrainingNotification, Machine, MachineCategory, MachineGroup
 from openings.models import Opening, Event
+from outbox.mail import send_mail, send_personalized_mass_mail, placeholder
 
-from .models import OpeningSlot, EventSlot, TrainingSlot, MachineSlot, RegistrationEventSlot
+from .models import OpeningSeries, OpeningSlot, EventSlot, TrainingSlot, MachineSlot, RegistrationEventSlot
 from .custom_fields import CustomDateField
+from .availability import MACHINE_SEARCH_MAX_DAYS, search_free_machine_slots
+from .usage import get_machine_usage
+from .series import create_opening_series, update_opening_series
+from .series import validate_opening_series, validate_opening_series_update
+from .booking import book_machine_slot, check_machine_slot_availability
+from .registrations import register_event_slot, register_training_slot, unregister_training_slot, get_registration_status
 from .custom_widgets import NumberInputWithButtons
 from .validators import validate_delete_machine_slot
 from .validators import validate_attendees_within_available_slots
@@ -108,6 +114,103 @@ class OpeningSlotForm(SlotForm):
         self.instance.user = self.user
         return self.instance
 
+class OpeningSeriesForm(UserForm):
+    opening = forms.ModelChoiceField(
+        queryset=Opening.objects.all(),
+        label=_('Opening'),
+        empty_label=_('Select an opening'),
+        error_messages={'required': _('Please select an opening.')}
+        )
+
+    machines = forms.ModelMultipleChoiceField(
+        queryset = Machine.objects.filter(reservable=True),
+        widget=forms.CheckboxSelectMultiple(
+            attrs={'checked' : ''}
+        ),
+        label=_('Machines'),
+        required=False
+    )
+
+    start_time = forms.TimeField(label=_('Start'), widget=forms.TimeInput(attrs={'type': 'time'}, format='%H:%M'))
+    end_time = forms.TimeField(label=_('End'), widget=forms.TimeInput(attrs={'type': 'time'}, format='%H:%M'))
+    comment = forms.CharField(label=_('Comment'),  required=False)
+
+    def clean(self):
+        """
+        Update the instance with the times of the series before it is checked by the subclasses.
+
+        Returns:
+            cleaned_data (dict): The cleaned form data.
+        """
+        cleaned_data = super(OpeningSeriesForm, self).clean()
+        for field in ('start_time', 'end_time', 'comment'):
+            setattr(self.instance, field, cleaned_data.get(field))
+        return cleaned_data
+
+class OpeningSeriesCreateForm(OpeningSeriesForm):
+    start_date = forms.DateField(label=_('From'), widget=forms.DateInput(attrs={'type': 'date'}))
+    until = forms.DateField(label=_('Until'), widget=forms.DateInput(attrs={'type': 'date'}))
+
+    class Meta:
+        model = OpeningSeries
+        fields = ('opening', 'machines', 'weekday', 'start_time', 'end_time', 'start_date', 'until', 'comment')
+
+    def clean(self):
+        """
+        Check the whole series against the existing openings, see validate_opening_series.
+
+        Returns:
+            cleaned_data (dict): The cleaned form data.
+        """
+        cleaned_data = super().clean()
+        fields = ('weekday', 'start_time', 'end_time', 'start_date', 'until')
+        if all(cleaned_data.get(field) is not None for field in fields):
+            for field in fields:
+                setattr(self.instance, field, cleaned_data[field])
+            validate_opening_series(self.instance)
+        return cleaned_data
+
+    def save(self):
+        """
+        Create the series with all its opening slots and a MachineSlot for each machine in cleaned_data['machines'].
+
+        Returns:
+            instance (OpeningSeries): The saved instance of OpeningSeries.
+        """
+        self.instance.user = self.user
+        self.opening_slots = create_opening_series(self.instance, self.cleaned_data['machines'])
+        return self.instance
+
+class OpeningSeriesUpdateForm(OpeningSeriesForm):
+    # The opening of the series cannot be changed
+    opening = None
+
+    class Meta:
+        model = OpeningSeries
+        fields = ('machines', 'start_time', 'end_time', 'comment')
+
+    def clean(self):
+        """
+        Check that the future occurrences can be moved, see validate_opening_series_update.
+
+        Returns:
+            cleaned_data (dict): The cleaned form data.
+        """
+        cleaned_data = super().clean()
+        if cleaned_data.get('start_time') and cleaned_data.get('end_time') and 'machines' in cleaned_data:
+            validate_opening_series_update(self.instance, cleaned_data['machines'])
+        return cleaned_data
+
+    def save(self):
+        """
+        Move the future occurrences of the series to the new times and machines.
+
+        Returns:
+            instance (OpeningSeries): The saved instance of OpeningSeries.
+        """
+        self.opening_slots = update_opening_series(self.instance, self.cleaned_data['machines'])
+        return self.instance
+
 class SlotLinkedToOpeningForm(OpeningSlotForm):
     opening = forms.ModelChoiceField(
         queryset=Opening.objects.all(),
@@ -322,8 +425,6 @@ class OpeningSlotUpdateForm(OpeningSlotForm):
         return self.instance
 
 class MachineSlotUpdateForm(SlotForm):
-    end_date = forms.CharField(required=False)
-
     class Meta:
         model = MachineSlot
         fields = ('start_time', 'end_time')
@@ -401,44 +502,17 @@ class MachineSlotUpdateForm(SlotForm):
         A method to clean and validate the form data. 
         
         It checks the start and end time, calculates the duration, and validates the reservation time and duration increment.
-        It also checks for overlapping reservations in the case of a 3D print reservation. 
+        It also checks that the machine is not booked by someone else during the period.
         
         Returns the cleaned data.
         """
         cleaned_data = super().clean()
-        initial_machine_slot = MachineSlot.objects.get(pk=self.instance.pk)
         start_time = self.cleaned_data.get("start")
         end_time = self.cleaned_data.get("end")
 
-        # Check if end datetime is sooner than the initial end datetime
-        if self.cleaned_data['start'] < self.initial.get('start', self.cleaned_data['start']):
-            # check if previous slots are free until slef.cleaned_data['start_time']
-            until = self.cleaned_data['start']
-            machine_slots_to_check = initial_machine_slot.previous_slots(until)
-
-            for machine_slot in machine_slots_to_check:
-                if machine_slot.user and machine_slot.user != self.instance.user:
-                    raise ValidationError(
-                        _("The machine is already booked until %(time)s!"),
-                        params={'time': machine_slot.start.strftime('%H:%M')},
-                        code='machine_slot_already_booked'
-                    )
-
-        # Check if end datetime is later than the initial end datetime
-        if self.cleaned_data['end'] > self.initial.get('end', self.cleaned_data['end']):
-            # check if next slots are free until slef.cleaned_data['end_time']
-            until = self.cleaned_data['end']
-            machine_slots_to_check = initial_machine_slot.next_slots(until)
-
-            for machine_slot in machine_slots_to_check:
-                if machine_slot.user and machine_slot.user != self.instance.user:
-                    raise ValidationError(
-                        _("The machine is already booked from %(time)s!"),
-                        params={'time': machine_slot.start.strftime('%H:%M')},
-                        code='machine_slot_already_booked'
-                    )
+        if start_time and end_time:
+            check_machine_slot_availability(self.instance, start_time, end_time)
 
-        if start_time and end_time: 
             cleaned_data['duration'] = end_time - start_time
 
             if cleaned_data['duration'] < datetime.timedelta(minutes=settings.FABCAL_MINIMUM_RESERVATION_TIME):
@@ -495,94 +569,14 @@ class MachineSlotUpdateForm(SlotForm):
         """
         A method to save the changes made to the instance, including creating new slots, updating existing slots, and sending mail.
         """
-        initial_machine_slot = MachineSlot.objects.get(pk=self.instance.pk)
-        start = self.cleaned_data['start']
-        end = self.cleaned_data['end']
-
-        # check if a machine slot is created or updated
-        if initial_machine_slot.user is None:
-            # create case
-
-            # update slot for user
-            self.instance.user = self.user
-
-            if initial_machine_slot.start < start:
-                # create a new empty slot at the begining
-                new_slot = deepcopy(initial_machine_slot)
-                new_slot.id = None
-                new_slot.end = start
-                new_slot.save()
-            
-            if initial_machine_slot.end > end:
-                # create a new empty slot at the end
-                new_slot = deepcopy(initial_machine_slot)
-                new_slot.id = None
-                new_slot.start = end
-                new_slot.save()
-
-        else:
-            # update case
-
-            if initial_machine_slot.start > start:
-                previous_slot = initial_machine_slot.previous_slots(start).first()
-                if previous_slot.start == start:
-                    previous_slot.delete()
-                else:
-                    previous_slot.end = start
-                    previous_slot.save()
+        # Split and merge the slots of the machine in one locked transaction
+        self.instance = book_machine_slot(
+            self.instance,
+            self.user,
+            self.cleaned_data['start'],
+            self.cleaned_data['end']
+        ).slot
 
-            if initial_machine_slot.end < end:
-                next_slot = initial_machine_slot.next_slots(end).first()
-                if next_slot.end == end:
-                    next_slot.delete()
-                else:
-                    next_slot.start = end
-                    next_slot.save()
-
-            if initial_machine_slot.start < start:
-                previous_slot = initial_machine_slot.previous_slots(initial_machine_slot.start).first()
-                if previous_slot:
-                    previous_slot.end = start
-                    previous_slot.save()
-                else:
-                    new_slot = deepcopy(initial_machine_slot)
-                    new_slot.id = None
-                    new_slot.end = start
-                    new_slot.user= None
-                    new_slot.save()
-
-            if initial_machine_slot.end > end:
-                next_slot = initial_machine_slot.next_slots(initial_machine_slot.end).first()
-                if next_slot:
-                    next_slot.start = end
-                    next_slot.save()
-                else: 
-                    new_slot = deepcopy(initial_machine_slot)
-                    new_slot.id = None
-                    new_slot.start = end
-                    new_slot.user= None
-                    new_slot.save()
-
-        if self.instance.machine.category.name == '3D':
-            for slot in MachineSlot.objects.filter(
-                start__gt=self.cleaned_data['start'], 
-                end__gt=self.cleaned_data['end'],
-                machine=self.instance.machine).all():
-                    # create a new empty slot at the end
-                    slot.start = self.cleaned_data['end']
-                    slot.save()
-
-            for slot in MachineSlot.objects.filter(
-                start__gt=self.cleaned_data['start'],
-                end__lt=self.cleaned_data['end'],
-                machine=self.instance.machine).all():
-                # delete slot
-                slot.delete()
-
-        self.instance.start = start
-        self.instance.end = end
-        self.instance.save()
-        
         # send mail
         email_content = self.create_email_content()
         send_mail(**email_content)
@@ -602,12 +596,14 @@ class TrainingSlotForm(SlotLinkedToOpeningForm):
         fields = ('training', 'registration_limit', 'opening', 'machines', 'date', 'start_time', 'end_time', 'comment')
 
     def get_recipient_list(self): 
-        return [
-            training_notification.profile.user
-            for training_notification in TrainingNotification.objects.filter(
+        """
+        Return the (email, first name) of the members waiting for this training, in a single joined query.
+        """
+        return list(
+            TrainingNotification.objects.filter(
                 training=self.cleaned_data['training']
-            )
-        ]
+            ).order_by('pk').values_list('profile__user__email', 'profile__user__first_name')
+        )
     
     def get_email_context(self, recipient_first_name):
         
@@ -622,21 +618,39 @@ class TrainingSlotForm(SlotLinkedToOpeningForm):
             'training_absolute_url': training_absolute_url
         }
 
+    def create_email_content(self):
+        """
+        Create the announcement sent to every member waiting for this training.
 
-class TrainingSlotCreateForm(TrainingSlotForm):
-    def create_email_content(self, recipient_first_name):
-        email_content = {
-        'html_message': render_to_string('fabcal/email/training_create_alert.html', self.get_email_context(recipient_first_name)),
-        'from_email': None,
-        'subject': _('A new training was planned'),
-        'message': _("A new training was planned")
+        The template is rendered once, with a placeholder for the first name
+        substituted for each recipient when the messages are queued.
+        """
+        recipients = self.get_recipient_list()
+
+        return {
+            'html_message': render_to_string(self.email_template_name, self.get_email_context(placeholder('first_name'))),
+            'from_email': None,
+            'subject': self.email_subject,
+            'message': self.email_subject,
+            'recipient_list': [email for email, first_name in recipients],
+            'substitutions': [{'first_name': first_name} for email, first_name in recipients],
         }
 
-        return email_content
-    
+    def send_announcement(self):
+        email_content = self.create_email_content()
+        send_personalized_mass_mail(
+            name='{0} - {1} {2}'.format(email_content['subject'], self.instance.training.title, self.instance.start.strftime('%d.%m.%Y %H:%M')),
+            **email_content
+        )
+
+
+class TrainingSlotCreateForm(TrainingSlotForm):
+    email_template_name = 'fabcal/email/training_create_alert.html'
+    email_subject = _('A new training was planned')
+
     def save(self):
         """
-        Saves the instance of the form and sends an email with the created email content.
+        Saves the instance of the form and queues the announcement for the members waiting for this training.
 
         Returns:
             The saved instance of the form.
@@ -644,21 +658,13 @@ class TrainingSlotCreateForm(TrainingSlotForm):
         self.instance = super().save(OpeningSlotCreateForm)
         
         # send mail
-        for recipient in self.get_recipient_list():
-            email_content = self.create_email_content(recipient.first_name)
-            send_mail(recipient_list = [recipient.email], **email_content)
+        self.send_announcement()
 
         return self.instance
 
 class TrainingSlotUpdateForm(TrainingSlotForm):
-    def create_email_content(self, recipient_first_name):
-        email_content = {
-            'html_message': render_to_string('fabcal/email/training_update_alert.html', self.get_email_context(recipient_first_name)),
-            'from_email': None,
-            'subject': _('A training was updated'),
-            'message': _("A training was updated")
-        }
-        return email_content
+    email_template_name = 'fabcal/email/training_update_alert.html'
+    email_subject = _('A training was updated')
 
     def save(self):
         """
@@ -671,9 +677,7 @@ class TrainingSlotUpdateForm(TrainingSlotForm):
             self.instance = super().save(OpeningSlotCreateForm, initial=self.initial)
 
         # send mail
-        for recipient in self.get_recipient_list():
-            email_content = self.create_email_content(recipient.first_name)
-            send_mail(recipient_list = [recipient.email], **email_content)
+        self.send_announcement()
 
         return self.instance
 
@@ -715,7 +719,7 @@ class TrainingSlotRegistrationCreateForm(TrainingSlotRegistrationForm):
         return email_content
     
     def save(self):
-        self.instance.registrations.add(self.user)
+        register_training_slot(self.instance, self.user)
         return super(TrainingSlotRegistrationCreateForm, self).save()
 
 class TrainingSlotRegistrationDeleteForm(TrainingSlotRegistrationForm):
@@ -732,7 +736,7 @@ class TrainingSlotRegistrationDeleteForm(TrainingSlotRegistrationForm):
         Raises:
             forms.ValidationError: If the user is not registered for the training slot.
         """
-        if self.user not in self.instance.registrations.all():
+        if not get_registration_status(self.instance, self.user).is_registered:
             raise forms.ValidationError(_("You are not registered for this training slot."))
             return False
         return super().is_valid()
@@ -747,7 +751,7 @@ class TrainingSlotRegistrationDeleteForm(TrainingSlotRegistrationForm):
         return email_content
     
     def save(self):
-        self.instance.registrations.remove(self.user)
+        unregister_training_slot(self.instance, self.user)
         return super(TrainingSlotRegistrationDeleteForm, self).save()
 
 class EventSlotForm(SlotLinkedToOpeningForm):
@@ -869,9 +873,133 @@ class EventSlotRegistrationCreateForm(UserForm):
     def save(self):
         self.instance.user = self.user
         self.instance.event_slot = self.event_slot
-        self.instance.save()
+        register_event_slot(self.instance)
 
         email_content = self.create_email_content()
         send_mail(**email_content)
 
         return self.instance
+
+class MachineSlotSearchForm(forms.Form):
+    category = forms.ModelChoiceField(queryset=MachineCategory.objects.all(), label=_('Machine category'), required=False)
+    group = forms.ModelChoiceField(queryset=MachineGroup.objects.all(), label=_('Machine group'), required=False)
+    duration = forms.IntegerField(label=_('Duration (minutes)'))
+    start_date = forms.DateField(label=_('From'), widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(label=_('To'), widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def __init__(self, *args, **kwargs):
+        super(MachineSlotSearchForm, self).__init__(*args, **kwargs)
+        today = datetime.date.today()
+        self.fields['duration'].initial = settings.FABCAL_MINIMUM_RESERVATION_TIME
+        self.fields['duration'].widget.attrs.update({
+            'min': settings.FABCAL_MINIMUM_RESERVATION_TIME,
+            'step': settings.FABCAL_RESERVATION_INCREMENT_TIME
+        })
+        self.fields['start_date'].initial = today
+        self.fields['end_date'].initial = today + datetime.timedelta(days=6)
+
+    def clean_duration(self):
+        duration = self.cleaned_data['duration']
+
+        if duration < settings.FABCAL_MINIMUM_RESERVATION_TIME:
+            raise ValidationError(
+                _("Please reserve a minimum of %(time)s minutes!"),
+                params={'time': settings.FABCAL_MINIMUM_RESERVATION_TIME},
+                code='invalid_minimum_duration'
+            )
+
+        if duration % settings.FABCAL_RESERVATION_INCREMENT_TIME != 0:
+            raise ValidationError(
+                _("Please reserve in %(time)s minute increments!"),
+                params={'time': settings.FABCAL_RESERVATION_INCREMENT_TIME},
+                code='invalid_duration_increment'
+            )
+
+        return datetime.timedelta(minutes=duration)
+
+    def clean(self):
+        cleaned_data = super(MachineSlotSearchForm, self).clean()
+
+        if not cleaned_data.get('category') and not cleaned_data.get('group'):
+            raise ValidationError(_('Please select a machine category or a machine group.'), code='missing_machines')
+
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and not 0 <= (end_date - start_date).days < MACHINE_SEARCH_MAX_DAYS:
+            raise ValidationError(
+                _("Please search between 1 and %(days)s days."),
+                params={'days': MACHINE_SEARCH_MAX_DAYS},
+                code='invalid_search_period'
+            )
+
+        return cleaned_data
+
+    def search(self):
+        """Return the free machine slots matching the cleaned data, see search_free_machine_slots."""
+        machines = Machine.objects.all()
+        if self.cleaned_data.get('category'):
+            machines = machines.filter(category=self.cleaned_data['category'])
+        if self.cleaned_data.get('group'):
+            machines = machines.filter(group=self.cleaned_data['group'])
+
+        return search_free_machine_slots(
+            machines,
+            self.cleaned_data['duration'],
+            datetime.datetime.combine(self.cleaned_data['start_date'], datetime.time.min),
+            datetime.datetime.combine(self.cleaned_data['end_date'] + datetime.timedelta(days=1), datetime.time.min)
+        )
+
+class MachineReservationFilterForm(forms.Form):
+    # Also the machines no longer reservable, which have a history
+    machine = forms.ModelChoiceField(queryset=Machine.objects.all(), label=_('Machine'), required=False)
+    member = forms.ModelChoiceField(
+        queryset=get_user_model().objects.all(),
+        to_field_name='username',
+        widget=forms.TextInput(attrs={'placeholder': _('Username')}),
+        label=_('Member'),
+        required=False
+    )
+    start_date = forms.DateField(label=_('From'), widget=forms.DateInput(attrs={'type': 'date'}), required=False)
+    end_date = forms.DateField(label=_('To'), widget=forms.DateInput(attrs={'type': 'date'}), required=False)
+
+    def get_filters(self):
+        """Return the keyword arguments of fabcal.reservations.get_reservations_page for the cleaned data."""
+        return {
+            'machine': self.cleaned_data.get('machine'),
+            'user': self.cleaned_data.get('member'),
+            'start_date': self.cleaned_data.get('start_date'),
+            'end_date': self.cleaned_data.get('end_date')
+        }
+
+class MachineUsageReportForm(forms.Form):
+    PERIOD_CHOICES = [
+        ('day', _('Day')),
+        ('week', _('Week')),
+        ('month', _('Month')),
+    ]
+
+    period = forms.ChoiceField(choices=PERIOD_CHOICES, label=_('Period'), initial='month')
+    machine = forms.ModelChoiceField(queryset=Machine.objects.filter(reservable=True), label=_('Machine'), required=False)
+    start_date = forms.DateField(label=_('From'), widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(label=_('To'), widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def __init__(self, *args, **kwargs):
+        super(MachineUsageReportForm, self).__init__(*args, **kwargs)
+        today = datetime.date.today()
+        self.fields['start_date'].initial = today.replace(month=1, day=1)
+        self.fields['end_date'].initial = today
+
+    def clean(self):
+        cleaned_data = super(MachineUsageReportForm, self).clean()
+        if cleaned_data.get('start_date') and cleaned_data.get('end_date') and cleaned_data['end_date'] < cleaned_data['start_date']:
+            raise ValidationError(_('The end date must be after the start date.'), code='invalid_report_period')
+        return cleaned_data
+
+    def get_report(self):
+        """Return the usage rows of the cleaned data, see get_machine_usage."""
+        return get_machine_usage(
+            self.cleaned_data['period'],
+            self.cleaned_data['start_date'],
+            self.cleaned_data['end_date'],
+            machine=self.cleaned_data.get('machine')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from fabcal.tasks import compact_machine_slots
+
+class Command(BaseCommand):
+    help = 'Merge the contiguous free machine slots of the openings not ended yet'
+
+    def handle(self, *args, **options):
+        result = compact_machine_slots()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['reclaimed']} machine slots reclaimed, {result['merged']} machine slots extended"
+        ))
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabcal', '0006_rename_has_registration_eventslot_registration_required_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='openingslot',
+            index=models.Index(fields=['start', 'end'], name='fabcal_openingslot_interval'),
+        ),
+    ]
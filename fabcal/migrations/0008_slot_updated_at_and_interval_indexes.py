@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabcal', '0007_openingslot_interval_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventslot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='machineslot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='openingslot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='trainingslot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='machineslot',
+            index=models.Index(fields=['start', 'end'], name='fabcal_machineslot_interval'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingslot',
+            index=models.Index(fields=['start', 'end'], name='fabcal_trainingslot_interval'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def count_attendees(apps, schema_editor):
+    EventSlot = apps.get_model('fabcal', 'EventSlot')
+    TrainingSlot = apps.get_model('fabcal', 'TrainingSlot')
+    RegistrationEventSlot = apps.get_model('fabcal', 'RegistrationEventSlot')
+
+    event_attendees = (
+        RegistrationEventSlot.objects.filter(event_slot=OuterRef('pk'))
+        .values('event_slot').annotate(total=Sum('number_of_attendees')).values('total')
+    )
+    EventSlot.objects.update(attendee_count=Coalesce(Subquery(event_attendees), Value(0)))
+
+    training_attendees = (
+        TrainingSlot.registrations.through.objects.filter(trainingslot=OuterRef('pk'))
+        .values('trainingslot').annotate(total=Count('pk')).values('total')
+    )
+    TrainingSlot.objects.update(attendee_count=Coalesce(Subquery(training_attendees), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabcal', '0008_slot_updated_at_and_interval_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventslot',
+            name='attendee_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='trainingslot',
+            name='attendee_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_attendees, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('machines', '0011_alter_machine_material_alter_machine_workshop_and_more'),
+        ('openings', '0005_auto_20240420_1618'),
+        ('fabcal', '0009_attendee_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOpeningSlot',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('comment', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('opening', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='openings.opening')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived opening slot',
+                'verbose_name_plural': 'Archived opening slots',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMachineSlot',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('comment', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('machine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='machines.machine')),
+                ('opening_slot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='fabcal.archivedopeningslot')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived machine slot',
+                'verbose_name_plural': 'Archived machine slots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedopeningslot',
+            index=models.Index(fields=['start', 'end'], name='fabcal_archopenslot_interval'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmachineslot',
+            index=models.Index(fields=['start', 'end'], name='fabcal_archmachslot_interval'),
+        ),
+    ]
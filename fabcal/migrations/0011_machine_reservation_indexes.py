@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fabcal', '0010_archived_slots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='machineslot',
+            index=models.Index(fields=['machine', 'start'], name='fabcal_machineslot_machine'),
+        ),
+        migrations.AddIndex(
+            model_name='machineslot',
+            index=models.Index(fields=['user', 'start'], name='fabcal_machineslot_user'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmachineslot',
+            index=models.Index(fields=['machine', 'start'], name='fabcal_archmachslot_machine'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmachineslot',
+            index=models.Index(fields=['user', 'start'], name='fabcal_archmachslot_user'),
+        ),
+    ]
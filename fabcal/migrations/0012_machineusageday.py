@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0011_alter_machine_material_alter_machine_workshop_and_more'),
+        ('fabcal', '0011_machine_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineUsageDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked_minutes', models.PositiveIntegerField(default=0)),
+                ('free_minutes', models.PositiveIntegerField(default=0)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('members', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='machines.machine')),
+            ],
+            options={
+                'verbose_name': 'Machine usage day',
+                'verbose_name_plural': 'Machine usage days',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='machineusageday',
+            constraint=models.UniqueConstraint(fields=('machine', 'date'), name='fabcal_machineusageday_unique_day'),
+        ),
+        migrations.AddIndex(
+            model_name='machineusageday',
+            index=models.Index(fields=['date', 'machine'], name='fabcal_machineusageday_date'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('machines', '0011_alter_machine_material_alter_machine_workshop_and_more'),
+        ('openings', '0005_auto_20240420_1618'),
+        ('fabcal', '0012_machineusageday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('start_date', models.DateField()),
+                ('until', models.DateField()),
+                ('comment', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('machines', models.ManyToManyField(blank=True, to='machines.machine')),
+                ('opening', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='openings.opening')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Opening series',
+                'verbose_name_plural': 'Opening series',
+            },
+        ),
+        migrations.AddField(
+            model_name='openingslot',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='fabcal.openingseries'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 
+from accounts.groups import is_superuser
+
 class SuperuserRequiredMixin(UserPassesTestMixin):
     """
     Mixin to require a user to be logged in and a superuser in a group,
@@ -12,7 +14,7 @@ class SuperuserRequiredMixin(UserPassesTestMixin):
 
     def test_func(self):
         user = self.request.user
-        return user.is_authenticated and user.groups.filter(name='superuser').exists()
+        return user.is_authenticated and is_superuser(user)
 
     def handle_no_permission(self):
         if not self.request.user.is_authenticated:
@@ -16,6 +16,7 @@ from machines.models import Training, Machine
 
 from .validators import validate_conflicting_openings
 from .validators import validate_time_range
+from .validators import validate_opening_slot_duration
 from .validators import validate_update_opening_slot_on_machine_slot
 from .validators import validate_delete_opening_slot
 from .validators import url_or_email_validator
@@ -26,7 +27,7 @@ class AbstractSlot(models.Model):
     end = models.DateTimeField()
     comment = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, blank=True, null=True)
-    updated_at = models.DateTimeField(auto_now=True, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, blank=True, null=True, db_index=True)
     class Meta:
         abstract = True
 
@@ -66,21 +67,75 @@ class AbstractSlot(models.Model):
 
 class AbstractRegistration(models.Model):
     registration_limit = models.PositiveIntegerField(blank=True, null=True)
+    # Maintained by the signals in fabcal.signals, see fabcal.registrations
+    attendee_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         abstract = True
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # A full save would write back the count loaded with the slot and undo
+        # the registrations counted meanwhile, only the signals update it
+        if update_fields is None and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'attendee_count'
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     @property
     def available_registration(self):
         "Check if there is still place for the event/training"
         return self.registration_limit - self.get_number_of_attendees
 
-        
+    @property
+    def get_number_of_attendees(self):
+        return self.attendee_count
+
+
+class OpeningSeries(models.Model):
+    """
+    Weekly recurring opening, whose occurrences are created, edited and cancelled at once by fabcal.series.
+    """
+    WEEKDAY_CHOICES = [
+        (0, _('Monday')),
+        (1, _('Tuesday')),
+        (2, _('Wednesday')),
+        (3, _('Thursday')),
+        (4, _('Friday')),
+        (5, _('Saturday')),
+        (6, _('Sunday')),
+    ]
+
+    opening = models.ForeignKey(Opening, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True)
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    start_date = models.DateField()
+    until = models.DateField()
+    machines = models.ManyToManyField(Machine, blank=True)
+    comment = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Opening series")
+        verbose_name_plural = _("Opening series")
+
+    def __str__(self):
+        return f'{self.opening.title}: {self.get_weekday_display()} {self.start_time:%H:%M} - {self.end_time:%H:%M}'
+
 class OpeningSlot(AbstractSlot):
     opening = models.ForeignKey(Opening, on_delete=models.CASCADE)
+    # Occurrences of a series keep their own times, only future ones follow the edits of the series
+    series = models.ForeignKey(OpeningSeries, on_delete=models.SET_NULL, blank=True, null=True)
     class Meta:
         verbose_name = _("Opening Slot")
         verbose_name_plural = _("Opening Slots")
+        indexes = [
+            # Interval lookups for conflict detection, see validate_conflicting_openings
+            models.Index(fields=['start', 'end'], name='fabcal_openingslot_interval'),
+        ]
 
     def __str__(self):
         return str(self.pk) +' :' + self.opening.title
@@ -88,6 +143,7 @@ class OpeningSlot(AbstractSlot):
     def clean(self):
         validate_conflicting_openings(self.start, self.end, instance=self)
         validate_time_range(self.start, self.end)
+        validate_opening_slot_duration(self.start, self.end)
         validate_update_opening_slot_on_machine_slot(self)
 
     def delete(self):
@@ -169,7 +225,7 @@ class EventSlot(AbstractSlot, AbstractRegistration):
     @property
     def get_reservation_list(self):
         # Fetch all registrations for this event slot, including the related user data
-        registrations = RegistrationEventSlot.objects.filter(event_slot=self)
+        registrations = RegistrationEventSlot.objects.filter(event_slot=self).select_related('user')
         
         # Prepare the list of users with the number of attendees included
         user_list = []
@@ -180,8 +236,7 @@ class EventSlot(AbstractSlot, AbstractRegistration):
         
         return user_list
 
-    @property
-    def get_number_of_attendees(self):
+    def count_attendees(self):
         total_attendees = RegistrationEventSlot.objects.filter(event_slot=self).aggregate(total=Sum('number_of_attendees'))['total']
         return total_attendees if total_attendees is not None else 0
         
@@ -206,6 +261,9 @@ class TrainingSlot(AbstractSlot, AbstractRegistration):
     class Meta:
         verbose_name = _("Training Slot")
         verbose_name_plural = _("Training Slots")
+        indexes = [
+            models.Index(fields=['start', 'end'], name='fabcal_trainingslot_interval'),
+        ]
 
     def delete(self, *args, **kwargs):
         if self.registrations.all().exists():
@@ -216,8 +274,7 @@ class TrainingSlot(AbstractSlot, AbstractRegistration):
     def get_reservation_list(self):
         return self.registrations.all()
 
-    @property
-    def get_number_of_attendees(self):
+    def count_attendees(self):
         return self.registrations.all().count()
 
 class MachineSlot(AbstractSlot):
@@ -227,6 +284,12 @@ class MachineSlot(AbstractSlot):
     class Meta:
         verbose_name = _("Machine Slot")
         verbose_name_plural = _("Machine Slots")
+        indexes = [
+            models.Index(fields=['start', 'end'], name='fabcal_machineslot_interval'),
+            # Reservation history filtered by machine or member, see fabcal.reservations
+            models.Index(fields=['machine', 'start'], name='fabcal_machineslot_machine'),
+            models.Index(fields=['user', 'start'], name='fabcal_machineslot_user'),
+        ]
 
     def next_slots(self, until):
         """
@@ -254,5 +317,74 @@ class MachineSlot(AbstractSlot):
             Q(machine=self.machine)
         ).order_by('-start')
 
+class AbstractArchivedSlot(models.Model):
+    """
+    Slot moved out of the hot tables by fabcal.archive, with the pk and timestamps of the original row.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    comment = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+class ArchivedOpeningSlot(AbstractArchivedSlot):
+    opening = models.ForeignKey(Opening, on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = _("Archived opening slot")
+        verbose_name_plural = _("Archived opening slots")
+        indexes = [
+            models.Index(fields=['start', 'end'], name='fabcal_archopenslot_interval'),
+        ]
+
+class ArchivedMachineSlot(AbstractArchivedSlot):
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, blank=True, null=True)
+    opening_slot = models.ForeignKey(ArchivedOpeningSlot, on_delete=models.CASCADE, blank=True, null=True)
+
+    class Meta:
+        verbose_name = _("Archived machine slot")
+        verbose_name_plural = _("Archived machine slots")
+        indexes = [
+            models.Index(fields=['start', 'end'], name='fabcal_archmachslot_interval'),
+            models.Index(fields=['machine', 'start'], name='fabcal_archmachslot_machine'),
+            models.Index(fields=['user', 'start'], name='fabcal_archmachslot_user'),
+        ]
+
+class MachineUsageDay(models.Model):
+    """
+    Usage of a machine during a past day, rolled up from its machine slots by fabcal.usage.
+    """
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE)
+    date = models.DateField()
+    booked_minutes = models.PositiveIntegerField(default=0)
+    free_minutes = models.PositiveIntegerField(default=0)
+    reservations = models.PositiveIntegerField(default=0)
+    # Pks of the members who booked the machine, to count distinct members over weeks and months
+    members = models.JSONField(default=list)
+    # Start of the rollup run, slots updated after it are rolled up again by the next run.
+    # USAGE_STALE when a slot of the day was deleted, see fabcal.usage
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = _("Machine usage day")
+        verbose_name_plural = _("Machine usage days")
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'date'], name='fabcal_machineusageday_unique_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'machine'], name='fabcal_machineusageday_date'),
+        ]
+
+    @property
+    def occupancy(self):
+        opened = self.booked_minutes + self.free_minutes
+        return self.booked_minutes / opened if opened else 0
+
 class EventsListPluginModel(CMSPlugin):
     pass
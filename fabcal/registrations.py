@@ -0,0 +1,162 @@
+"""
+Registrations to event and training slots.
+
+The number of attendees of a slot is kept in its `attendee_count` column,
+incremented with F() expressions (or recounted when registrations are
+removed) by the signals in fabcal.signals, so reading it costs no query.
+Registering and unregistering lock the slot row first: concurrent
+registrations to the same slot are serialised and each one checks the
+capacity against the count left by the previous one.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from .models import EventSlot, TrainingSlot, RegistrationEventSlot
+from .validators import validate_attendees_within_available_slots
+
+
+def lock_registration_slot(slot):
+    """
+    Lock the row of an event or training slot until the end of the transaction.
+
+    Returns:
+        The slot as currently stored, with an up to date `attendee_count`.
+    """
+    return type(slot).objects.select_for_update().get(pk=slot.pk)
+
+
+def refresh_attendee_count(slot):
+    slot.refresh_from_db(fields=['attendee_count'])
+
+
+def register_event_slot(registration):
+    """
+    Save a new RegistrationEventSlot if the event still has room for its attendees.
+
+    Raises:
+        ValidationError: If the event is full (code 'attendees_not_within_available_slots').
+    """
+    with transaction.atomic():
+        event_slot = lock_registration_slot(registration.event_slot)
+        validate_attendees_within_available_slots(registration.number_of_attendees, event_slot)
+        registration.save()
+
+    refresh_attendee_count(registration.event_slot)
+    return registration
+
+
+def register_training_slot(training_slot, user):
+    """
+    Add `user` to the registrations of `training_slot` if there is a place left.
+
+    Raises:
+        ValidationError: If the training is full (code 'training_slot_full').
+    """
+    with transaction.atomic():
+        locked = lock_registration_slot(training_slot)
+        if locked.registrations.filter(pk=user.pk).exists():
+            return training_slot
+        if locked.registration_limit is not None and locked.available_registration <= 0:
+            raise ValidationError(_("This training is full."), code='training_slot_full')
+        training_slot.registrations.add(user)
+
+    refresh_attendee_count(training_slot)
+    return training_slot
+
+
+def unregister_training_slot(training_slot, user):
+    """Remove `user` from the registrations of `training_slot`."""
+    with transaction.atomic():
+        lock_registration_slot(training_slot)
+        training_slot.registrations.remove(user)
+
+    refresh_attendee_count(training_slot)
+    return training_slot
+
+
+class RegistrationStatus:
+    """
+    Registration of a user to an event or training slot.
+
+    Attributes:
+        slot: The event or training slot.
+        is_registered: Whether the user is registered to the slot.
+        registration_id: The pk of the RegistrationEventSlot, None for trainings.
+        number_of_attendees: The number of people registered by the user.
+    """
+
+    def __init__(self, slot, is_registered=False, registration_id=None, number_of_attendees=0):
+        self.slot = slot
+        self.is_registered = is_registered
+        self.registration_id = registration_id
+        self.number_of_attendees = number_of_attendees
+
+    @property
+    def attendee_count(self):
+        return self.slot.attendee_count
+
+    @property
+    def available_registration(self):
+        return self.slot.available_registration
+
+    @property
+    def can_unregister(self):
+        return self.is_registered and self.slot.is_editable
+
+
+def get_registration_statuses(slots, user):
+    """
+    Return the registration status of `user` for each of the event and training `slots`.
+
+    Runs at most one query per kind of slot, whatever the number of slots and
+    registrants. The statuses are also kept on the slots, where
+    get_registration_status() finds them.
+
+    Returns:
+        dict: The RegistrationStatus of each slot.
+    """
+    event_slots = [slot for slot in slots if isinstance(slot, EventSlot)]
+    training_slots = [slot for slot in slots if isinstance(slot, TrainingSlot)]
+    statuses = {slot: RegistrationStatus(slot) for slot in event_slots + training_slots}
+
+    if user is not None and user.is_authenticated:
+        if event_slots:
+            registrations = RegistrationEventSlot.objects.filter(
+                user=user,
+                event_slot__in=event_slots
+            ).values_list('event_slot_id', 'pk', 'number_of_attendees')
+            event_slots_by_pk = {slot.pk: slot for slot in event_slots}
+            for event_slot_id, registration_id, number_of_attendees in registrations:
+                status = statuses[event_slots_by_pk[event_slot_id]]
+                status.is_registered = True
+                status.registration_id = registration_id
+                status.number_of_attendees = number_of_attendees
+
+        if training_slots:
+            registered = set(
+                TrainingSlot.registrations.through.objects.filter(
+                    customuser=user,
+                    trainingslot__in=training_slots
+                ).values_list('trainingslot_id', flat=True)
+            )
+            for slot in training_slots:
+                if slot.pk in registered:
+                    statuses[slot].is_registered = True
+                    statuses[slot].number_of_attendees = 1
+
+    user_id = getattr(user, 'pk', None)
+    for slot, status in statuses.items():
+        slot._registration_status = (user_id, status)
+
+    return statuses
+
+
+def get_registration_status(slot, user):
+    """
+    Return the RegistrationStatus of `user` for `slot`, from get_registration_statuses() when it already ran.
+    """
+    user_id, status = getattr(slot, '_registration_status', (None, None))
+    if status is None or user_id != getattr(user, 'pk', None):
+        status = get_registration_statuses([slot], user)[slot]
+    return status
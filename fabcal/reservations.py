@@ -0,0 +1,93 @@
+"""
+Pages of the machine reservation history, for the reservation list views.
+
+Reservations are paginated by keyset on (start, id), so a deep page costs
+the same as the first one, and counted up to FABCAL_RESERVATIONS_COUNT_LIMIT
+only, instead of a full COUNT(*) of the history.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+from .archive import get_machine_reservations
+from .models import ArchivedMachineSlot, MachineSlot
+
+
+def make_reservations_cursor(row):
+    return '{}.{}'.format(row['id'], row['start'].isoformat())
+
+
+def read_reservations_cursor(cursor):
+    """
+    Returns:
+        tuple: The id and start of the last reservation of the previous page, None if `cursor` is invalid.
+    """
+    try:
+        pk, start = cursor.split('.', 1)
+        return int(pk), datetime.datetime.fromisoformat(start)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_reservation_filters(past, machine=None, user=None, start_date=None, end_date=None, today=None):
+    """Return the lookups of the past (or current and future) reservations of `machine`, `user` and the dates, all optional."""
+    today = today or datetime.date.today()
+    filters = {'end__lt': today} if past else {'end__gte': today}
+    if machine is not None:
+        filters['machine'] = machine
+    if user is not None:
+        filters['user'] = user
+    if start_date is not None:
+        filters['start__gte'] = start_date
+    if end_date is not None:
+        filters['start__lt'] = end_date + datetime.timedelta(days=1)
+    return filters
+
+
+def get_reservations_page(past, cursor=None, page_size=None, **kwargs):
+    """
+    Return a page of the machine reservations, the most recent first for `past` ones, by start otherwise.
+
+    Past reservations include the archived ones. The keyword arguments filter
+    the reservations, see get_reservation_filters.
+
+    Returns:
+        tuple: The reservations of the page, and the cursor of the next page (None on the last page).
+    """
+    page_size = page_size or settings.FABCAL_RESERVATIONS_PAGE_SIZE
+    filters = get_reservation_filters(past, **kwargs)
+
+    conditions = []
+    cursor = read_reservations_cursor(cursor) if cursor else None
+    if cursor is not None:
+        pk, start = cursor
+        if past:
+            conditions.append(Q(start__lt=start) | Q(start=start, id__lt=pk))
+        else:
+            conditions.append(Q(start__gt=start) | Q(start=start, id__gt=pk))
+
+    queryset = get_machine_reservations(*conditions, include_archive=past, **filters)
+    ordering = ('-start', '-id') if past else ('start', 'id')
+
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], make_reservations_cursor(rows[page_size - 1])
+    return rows, None
+
+
+def count_reservations(past, **kwargs):
+    """
+    Count the reservations of get_reservations_page, stopping at FABCAL_RESERVATIONS_COUNT_LIMIT.
+
+    Returns:
+        tuple: The count, and whether there are more reservations than the count.
+    """
+    limit = settings.FABCAL_RESERVATIONS_COUNT_LIMIT
+    filters = get_reservation_filters(past, **kwargs)
+
+    count = 0
+    for model in (MachineSlot, ArchivedMachineSlot) if past else (MachineSlot,):
+        if count <= limit:
+            count += model.objects.filter(user__isnull=False, **filters)[:limit + 1 - count].count()
+    return min(count, limit), count > limit
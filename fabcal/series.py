@@ -0,0 +1,264 @@
+"""
+Weekly opening series.
+
+A series stands for the occurrences of an opening on a weekday between two
+dates. The whole series is conflict checked with a single interval query and
+its opening and machine slots are written with bulk_create in one
+transaction, instead of one form submit per week and one query per machine.
+
+Edits and cancellations only apply to the occurrences that have not started
+yet, past occurrences stay as they were.
+"""
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy as _
+
+from machines.models import Machine
+
+from .models import EventSlot, MachineSlot, OpeningSlot, TrainingSlot
+from .signals import machine_slots_saved, opening_slots_saved
+from .validators import OPENING_SLOT_MAX_DURATION, validate_time_range
+
+# About a year of weekly occurrences
+OPENING_SERIES_MAX_OCCURRENCES = 53
+
+
+def get_series_dates(series):
+    """Return the dates of the series weekday from its start date to its until date, both included."""
+    first = series.start_date + datetime.timedelta(days=(series.weekday - series.start_date.weekday()) % 7)
+    weeks = (series.until - first).days // 7 + 1
+    return [first + datetime.timedelta(weeks=week) for week in range(weeks)]
+
+
+def get_interval(series, date):
+    return (
+        datetime.datetime.combine(date, series.start_time),
+        datetime.datetime.combine(date, series.end_time)
+    )
+
+
+def get_future_occurrences(series, now=None):
+    """Return the opening slots of the series that have not started yet."""
+    return series.openingslot_set.filter(start__gt=now or datetime.datetime.now()).order_by('start')
+
+
+def validate_series_conflicts(intervals, exclude=None):
+    """
+    Raise a ValidationError if any of the (start, end) `intervals` overlaps an existing opening, see validate_conflicting_openings.
+
+    All the intervals are checked with a single query, `exclude` holds the pks of the opening slots being moved.
+    """
+    if not intervals:
+        return
+
+    conditions = Q()
+    for start, end in intervals:
+        conditions |= Q(start__gt=start - OPENING_SLOT_MAX_DURATION, start__lt=end, end__gt=start)
+
+    conflicting_openings = OpeningSlot.objects.filter(conditions).select_related('user').order_by('start')
+    if exclude:
+        conflicting_openings = conflicting_openings.exclude(pk__in=exclude)
+
+    conflicting_openings = list(conflicting_openings)
+    if conflicting_openings:
+        conflicting_times = [
+            f"{opening.start.strftime('%d.%m.%Y %H:%M')} - {opening.end.strftime('%H:%M')}: {opening.user.first_name if opening.user else ''}"
+            for opening in conflicting_openings
+        ]
+        raise ValidationError(
+            mark_safe(_('The series conflicts with the following openings: <br> {openings}').format(
+                openings='<br>'.join(conflicting_times),
+            )),
+            code='conflicting_openings',
+            params={'conflicting_openings': conflicting_openings}
+        )
+
+
+def validate_opening_series(series):
+    """Raise a ValidationError if the occurrences of the new `series` cannot be created."""
+    validate_time_range(series.start_time, series.end_time)
+
+    dates = get_series_dates(series)
+    if not dates:
+        raise ValidationError(_('The series has no occurrence between these dates.'), code='empty_series')
+    if len(dates) > OPENING_SERIES_MAX_OCCURRENCES:
+        raise ValidationError(
+            _('A series cannot have more than %(count)s occurrences.'),
+            params={'count': OPENING_SERIES_MAX_OCCURRENCES},
+            code='series_too_long'
+        )
+
+    validate_series_conflicts([get_interval(series, date) for date in dates])
+
+
+def validate_opening_series_update(series, machines, now=None):
+    """
+    Raise a ValidationError if the future occurrences of `series` cannot be moved to its new times with `machines`.
+
+    Reservations must stay within their opening and on a machine of the
+    series, events and trainings within their opening.
+    """
+    validate_time_range(series.start_time, series.end_time)
+
+    occurrences = list(get_future_occurrences(series, now))
+    intervals = {occurrence.pk: get_interval(series, occurrence.start.date()) for occurrence in occurrences}
+    validate_series_conflicts(list(intervals.values()), exclude=list(intervals))
+
+    machine_ids = {machine.pk for machine in machines}
+    reservations = MachineSlot.objects.filter(
+        opening_slot__in=occurrences,
+        user__isnull=False
+    ).select_related('machine', 'user').order_by('start')
+
+    for machine_slot in reservations:
+        start, end = intervals[machine_slot.opening_slot_id]
+        if machine_slot.machine_id not in machine_ids or machine_slot.start < start or machine_slot.end > end:
+            raise ValidationError(
+                mark_safe(_('You can not update the series because {user} has already reserved the {machine} on {date} from {start_time} to {end_time}.').format(
+                    date=machine_slot.start.strftime('%d.%m.%Y'),
+                    start_time=machine_slot.start.strftime('%H:%M'),
+                    end_time=machine_slot.end.strftime('%H:%M'),
+                    user=machine_slot.user.first_name + ' ' + machine_slot.user.last_name,
+                    machine=machine_slot.machine.title
+                )),
+                code='conflicting_reservation',
+                params={'conflictive_reservation': machine_slot}
+            )
+
+    # Events and trainings keep their own times, they cannot end up outside their opening
+    for model, activity in ((EventSlot, 'event'), (TrainingSlot, 'training')):
+        for slot in model.objects.filter(opening_slot__in=occurrences).select_related(activity).order_by('start'):
+            start, end = intervals[slot.opening_slot_id]
+            if slot.start < start or slot.end > end:
+                raise ValidationError(
+                    mark_safe(_('You can not update the series because {title} takes place on {date} from {start_time} to {end_time}.').format(
+                        title=getattr(slot, activity).title,
+                        date=slot.start.strftime('%d.%m.%Y'),
+                        start_time=slot.start.strftime('%H:%M'),
+                        end_time=slot.end.strftime('%H:%M')
+                    )),
+                    code='conflicting_slot',
+                    params={'conflicting_slot': slot}
+                )
+
+
+def create_opening_series(series, machines):
+    """
+    Save the new `series` and create its occurrences, with a free machine slot for each of `machines`.
+
+    The series must have been checked with validate_opening_series.
+
+    Returns:
+        list: The created opening slots.
+    """
+    with transaction.atomic():
+        series.save()
+        series.machines.set(machines)
+
+        opening_slots = OpeningSlot.objects.bulk_create([
+            OpeningSlot(opening=series.opening, user=series.user, series=series, comment=series.comment, start=start, end=end)
+            for start, end in (get_interval(series, date) for date in get_series_dates(series))
+        ])
+        machine_slots = MachineSlot.objects.bulk_create([
+            MachineSlot(machine=machine, opening_slot=opening_slot, start=opening_slot.start, end=opening_slot.end)
+            for opening_slot in opening_slots
+            for machine in machines
+        ])
+
+        # bulk_create does not send post_save
+        opening_slots_saved.send(sender=OpeningSlot, instances=opening_slots, created=True)
+        machine_slots_saved.send(sender=MachineSlot, instances=machine_slots, created=True)
+
+    return opening_slots
+
+
+def update_opening_series(series, machines, now=None):
+    """
+    Save the edited `series` and move its future occurrences to its new times and `machines`.
+
+    The free machine slots of the occurrences are replaced by the gaps left
+    between the reservations, which keep their times. The machines are locked
+    like in the booking engine, so that no booking runs on the slots meanwhile.
+    The series must have been checked with validate_opening_series_update.
+
+    Returns:
+        list: The updated opening slots.
+    """
+    now = now or datetime.datetime.now()
+
+    with transaction.atomic():
+        machine_ids = set(series.machines.values_list('pk', flat=True)) | {machine.pk for machine in machines}
+        list(Machine.objects.select_for_update().filter(pk__in=machine_ids).order_by('pk').values_list('pk', flat=True))
+
+        opening_slots = list(get_future_occurrences(series, now))
+        for opening_slot in opening_slots:
+            opening_slot.start, opening_slot.end = get_interval(series, opening_slot.start.date())
+            opening_slot.comment = series.comment
+            opening_slot.updated_at = now
+        OpeningSlot.objects.bulk_update(opening_slots, ['start', 'end', 'comment', 'updated_at'])
+
+        reservations = defaultdict(list)
+        for machine_slot in MachineSlot.objects.filter(opening_slot__in=opening_slots, user__isnull=False).order_by('start'):
+            reservations[(machine_slot.opening_slot_id, machine_slot.machine_id)].append(machine_slot)
+        MachineSlot.objects.filter(opening_slot__in=opening_slots, user__isnull=True).delete()
+
+        machine_slots = []
+        for opening_slot in opening_slots:
+            for machine in machines:
+                start = opening_slot.start
+                for reservation in reservations[(opening_slot.pk, machine.pk)]:
+                    if reservation.start > start:
+                        machine_slots.append(MachineSlot(machine=machine, opening_slot=opening_slot, start=start, end=reservation.start))
+                    start = max(start, reservation.end)
+                if start < opening_slot.end:
+                    machine_slots.append(MachineSlot(machine=machine, opening_slot=opening_slot, start=start, end=opening_slot.end))
+        machine_slots = MachineSlot.objects.bulk_create(machine_slots)
+
+        series.save()
+        series.machines.set(machines)
+
+        opening_slots_saved.send(sender=OpeningSlot, instances=opening_slots, created=False)
+        machine_slots_saved.send(sender=MachineSlot, instances=machine_slots, created=True)
+
+    return opening_slots
+
+
+def cancel_opening_series(series, now=None):
+    """
+    Delete the future occurrences of `series`, with their free machine slots.
+
+    Occurrences with reservations, events or trainings are kept and have to be
+    cancelled one by one. The series ends with its last remaining occurrence,
+    or is deleted when none remains.
+
+    Returns:
+        dict: The number of occurrences cancelled and kept.
+    """
+    future = get_future_occurrences(series, now)
+
+    with transaction.atomic():
+        # No reservation can be made on the occurrences being deleted
+        list(Machine.objects.select_for_update().filter(pk__in=series.machines.values('pk')).order_by('pk').values_list('pk', flat=True))
+
+        cancelled = future.exclude(
+            Exists(MachineSlot.objects.filter(opening_slot=OuterRef('pk'), user__isnull=False))
+        ).exclude(
+            Exists(EventSlot.objects.filter(opening_slot=OuterRef('pk')))
+        ).exclude(
+            Exists(TrainingSlot.objects.filter(opening_slot=OuterRef('pk')))
+        ).delete()[1].get(OpeningSlot._meta.label, 0)
+        kept = future.count()
+
+        last = series.openingslot_set.order_by('-start').values_list('start', flat=True).first()
+        if last is None:
+            series.delete()
+        else:
+            series.until = last.date()
+            series.save(update_fields=['until'])
+
+    return {'cancelled': cancelled, 'kept': kept}
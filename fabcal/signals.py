@@ -0,0 +1,93 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db.models import F, Count, Sum, Subquery, OuterRef, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import Signal, receiver
+
+from openings.models import Opening, Event
+from machines.models import Training, Machine
+
+from .feeds import bump_calendar_generation
+from .models import OpeningSlot, EventSlot, TrainingSlot, MachineSlot, RegistrationEventSlot
+from .usage import forget_machine_usage
+
+# Sent by the booking engine with the machine slots written by bulk_create
+# (created=True) or bulk_update (created=False), which do not send post_save
+machine_slots_saved = Signal()
+
+# Sent by fabcal.series with the opening slots of a series written by bulk_create
+# (created=True) or bulk_update (created=False)
+opening_slots_saved = Signal()
+
+# Models whose rows (or titles and colors) appear in the calendar feed
+CALENDAR_MODELS = (OpeningSlot, EventSlot, TrainingSlot, MachineSlot, Opening, Event, Training, Machine)
+
+def invalidate_calendar(sender, **kwargs):
+    bump_calendar_generation()
+
+for model in CALENDAR_MODELS:
+    post_save.connect(invalidate_calendar, sender=model, dispatch_uid=f'fabcal-calendar-save-{model.__name__}')
+    post_delete.connect(invalidate_calendar, sender=model, dispatch_uid=f'fabcal-calendar-delete-{model.__name__}')
+
+opening_slots_saved.connect(invalidate_calendar, dispatch_uid='fabcal-calendar-bulk-save-OpeningSlot')
+
+# Usage rollups of the past days, see fabcal.usage. Archived slots are deleted
+# without signals and stay in the rollups.
+
+@receiver(post_delete, sender=MachineSlot, dispatch_uid='fabcal-forget-machine-usage')
+def forget_deleted_machine_slot_usage(sender, instance, **kwargs):
+    if instance.machine_id is not None and instance.start.date() < datetime.date.today():
+        forget_machine_usage(instance.machine_id, instance.start.date())
+
+# Attendee counters of the event and training slots, see fabcal.registrations
+
+@receiver(post_save, sender=RegistrationEventSlot, dispatch_uid='fabcal-count-event-registration')
+def count_event_registration(sender, instance, created, **kwargs):
+    if created:
+        EventSlot.objects.filter(pk=instance.event_slot_id).update(
+            attendee_count=F('attendee_count') + instance.number_of_attendees
+        )
+    else:
+        # Edited in the admin, the previous number of attendees is unknown
+        attendees = RegistrationEventSlot.objects.filter(event_slot=OuterRef('pk')).values('event_slot').annotate(total=Sum('number_of_attendees')).values('total')
+        EventSlot.objects.filter(pk=instance.event_slot_id).update(
+            attendee_count=Coalesce(Subquery(attendees), Value(0))
+        )
+
+@receiver(post_delete, sender=RegistrationEventSlot, dispatch_uid='fabcal-uncount-event-registration')
+def uncount_event_registration(sender, instance, **kwargs):
+    EventSlot.objects.filter(pk=instance.event_slot_id).update(
+        attendee_count=F('attendee_count') - instance.number_of_attendees
+    )
+
+def recount_training_slots(pks):
+    attendees = TrainingSlot.registrations.through.objects.filter(trainingslot=OuterRef('pk')).values('trainingslot').annotate(total=Count('pk')).values('total')
+    TrainingSlot.objects.filter(pk__in=pks).update(attendee_count=Coalesce(Subquery(attendees), Value(0)))
+
+@receiver(m2m_changed, sender=TrainingSlot.registrations.through, dispatch_uid='fabcal-count-training-registrations')
+def count_training_registrations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action == 'post_add' and pk_set:
+            # pk_set only holds the users actually added
+            TrainingSlot.objects.filter(pk=instance.pk).update(attendee_count=F('attendee_count') + len(pk_set))
+        elif action in ('post_remove', 'post_clear'):
+            recount_training_slots([instance.pk])
+    elif action == 'post_add' and pk_set:
+        TrainingSlot.objects.filter(pk__in=pk_set).update(attendee_count=F('attendee_count') + 1)
+    elif action == 'pre_clear':
+        instance._cleared_training_slots = list(instance.training_registration_users.values_list('pk', flat=True))
+    elif action == 'post_remove':
+        recount_training_slots(pk_set)
+    elif action == 'post_clear':
+        recount_training_slots(instance.__dict__.pop('_cleared_training_slots', []))
+
+# The registrations of a deleted user are removed in cascade, without m2m_changed
+@receiver(pre_delete, sender=get_user_model(), dispatch_uid='fabcal-user-training-registrations')
+def remember_user_training_slots(sender, instance, **kwargs):
+    instance._training_slots = list(instance.training_registration_users.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='fabcal-uncount-user-training-registrations')
+def uncount_user_training_registrations(sender, instance, **kwargs):
+    recount_training_slots(instance.__dict__.pop('_training_slots', []))
@@ -1,12 +1,18 @@
 from datetime import datetime, timedelta
 
 from django.contrib.sites.models import Site
-from django.core.mail import send_mail
+from django.db import transaction
 from django.db.models import Count, OuterRef, Subquery
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 
+from machines.models import Machine
+from outbox.mail import send_mail
+
+from .archive import archive_all_slots
 from .models import OpeningSlot, MachineSlot
+from .signals import machine_slots_saved
+from .usage import rollup_machine_usage
 
 def get_context_base():
     return(
@@ -47,4 +53,76 @@ def remove_openingslot_if_on_reservation():
                 html_message = html_message
             )
     
-    return(list(openings_slots))
\ No newline at end of file
+    return(list(openings_slots))
+
+def compact_machine_slots(now=None):
+    """
+    Merge the contiguous free slots of each machine and opening slot that has not ended yet.
+
+    Bookings and cancellations leave free slots split in adjacent fragments. The
+    first slot of each run of free slots is extended to the end of the run and
+    the others are deleted, in a single transaction. The machines are locked
+    like in the booking engine, so that no booking runs on the slots meanwhile.
+
+    Returns:
+        dict: The number of slots extended and of rows reclaimed.
+    """
+    now = now or datetime.now()
+    result = {'merged': 0, 'reclaimed': 0}
+
+    with transaction.atomic():
+        # Only the machines with several free slots can have fragments
+        machine_ids = list(
+            Machine.objects.filter(machineslot__user__isnull=True, machineslot__end__gt=now)
+            .annotate(free_slots=Count('machineslot'))
+            .filter(free_slots__gt=1)
+            .values_list('pk', flat=True)
+        )
+        list(Machine.objects.select_for_update().filter(pk__in=machine_ids).order_by('pk').values_list('pk', flat=True))
+
+        slots = MachineSlot.objects.select_for_update().filter(
+            machine__in=machine_ids,
+            opening_slot__isnull=False,
+            user__isnull=True,
+            end__gt=now
+        ).order_by('machine', 'opening_slot', 'start')
+
+        merged = []
+        deleted = []
+        previous = None
+        for slot in slots:
+            if (
+                previous is not None
+                and (previous.machine_id, previous.opening_slot_id) == (slot.machine_id, slot.opening_slot_id)
+                and previous.end == slot.start
+            ):
+                previous.end = slot.end
+                if not merged or merged[-1] is not previous:
+                    merged.append(previous)
+                deleted.append(slot.pk)
+            else:
+                previous = slot
+
+        if deleted:
+            MachineSlot.objects.filter(pk__in=deleted).delete()
+            for slot in merged:
+                slot.updated_at = now
+            MachineSlot.objects.bulk_update(merged, ['end', 'updated_at'])
+            machine_slots_saved.send(sender=MachineSlot, instances=merged, created=False)
+
+        result['merged'] = len(merged)
+        result['reclaimed'] = len(deleted)
+
+    return result
+
+def archive_old_slots():
+    """
+    Move the opening and machine slots ended for FABCAL_ARCHIVE_AFTER_DAYS to the archive tables, see fabcal.archive.
+    """
+    return archive_all_slots()
+
+def rollup_machine_usage_task():
+    """
+    Roll up the machine usage of the past days, see fabcal.usage.
+    """
+    return rollup_machine_usage()
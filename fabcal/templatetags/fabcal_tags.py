@@ -1,5 +1,7 @@
 from django import template
 
+from fabcal.registrations import get_registration_status
+
 register = template.Library() 
 
 @register.filter(name='get_item') 
@@ -8,15 +10,16 @@ def get_item(dictionary, key):
 
 @register.filter
 def can_unregister(object, user):
-    return user in object.get_reservation_list and object.is_editable
+    return get_registration_status(object, user).can_unregister
 
 @register.filter
 def cannot_unregister(object, user):
-    return user in object.get_reservation_list and not object.is_editable
+    status = get_registration_status(object, user)
+    return status.is_registered and not status.can_unregister
 
 @register.filter
 def is_registered(object, user):
-    return user in object.get_reservation_list
+    return get_registration_status(object, user).is_registered
 
 @register.filter
 def registration_disabled(object):
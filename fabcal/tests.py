@@ -1,14 +1,16 @@
 import datetime
 import re
+from urllib.parse import unquote
 
 from unittest.mock import patch
 
 from django.contrib.auth.mixins import LoginRequiredMixin 
 from django.contrib.auth.models import Group, AnonymousUser
 from django.contrib.messages import get_messages
-from django.core.exceptions import PermissionDenied
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.http import HttpResponse
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.views import View
 
@@ -20,7 +22,14 @@ from machines.models import TrainingValidation
 from machines.models import TrainingNotification
 from openings.models import Event
 from openings.models import Opening
-
+from outbox.mail import placeholder
+from outbox.models import OutboxBatch
+
+from .availability import get_machine_availability, search_free_machine_slots
+from .booking import book_machine_slot
+from .feeds import get_calendar_events
+from .feeds import get_initial_window
+from .feeds import get_weekly_schedule
 from .forms import OpeningSlotForm
 from .forms import OpeningSlotCreateForm
 from .forms import MachineSlotUpdateForm
@@ -32,10 +41,23 @@ from .forms import EventSlotCreateForm
 from .forms import EventSlotUpdateForm
 from .forms import EventSlotRegistrationCreateForm
 from .mixins import SuperuserRequiredMixin
+from .validators import validate_conflicting_openings
+from .models import OpeningSeries
 from .models import OpeningSlot
 from .models import MachineSlot
+from .models import ArchivedMachineSlot
+from .models import ArchivedOpeningSlot
 from .models import TrainingSlot
 from .models import EventSlot
+from .models import RegistrationEventSlot
+from .archive import archive_slots, get_machine_reservations
+from .events import render_events_archive_page
+from .tasks import compact_machine_slots
+from .usage import get_machine_usage, rollup_machine_usage
+from .registrations import register_event_slot, get_registration_statuses
+from .reservations import count_reservations, get_reservations_page
+from .series import cancel_opening_series
+from .templatetags.fabcal_tags import is_registered
 from .views import OpeningSlotCreateView
 from .views import OpeningSlotUpdateView
 from .views import OpeningSlotDeleteView
@@ -268,6 +290,23 @@ class OpeningSlotCreateViewTestCase(SlotViewTestCase):
         self.assertEqual(response.status_code, 302)
 
 
+    def test_overlap_lookup_single_query(self):
+        self.create_opening_slot()
+        start = datetime.datetime(2023, 5, 1, 11)
+
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError) as error:
+                validate_conflicting_openings(start, start + datetime.timedelta(hours=2))
+        self.assertEqual(error.exception.code, 'conflicting_openings')
+
+    def test_opening_over_several_days(self):
+        start = datetime.datetime(2023, 5, 1, 10)
+        opening_slot = OpeningSlot(opening=self.openlab, start=start, end=start + datetime.timedelta(days=1, hours=1))
+
+        with self.assertRaises(ValidationError) as error:
+            opening_slot.clean()
+        self.assertEqual(error.exception.code, 'opening_over_several_days')
+
     def test_view_valid(self):
         response = self.create_opening_slot()
         
@@ -950,6 +989,49 @@ class MachineSlotUpdateViewTestCase(SlotViewTestCase):
         self.assertEqual(form.errors.as_data()['__all__'][0].message, "La machine est déjà réservée jusqu'à %(time)s")
         self.assertEqual(form.errors.as_data()['__all__'][0].code, 'machine_slot_already_booked')
 
+    @patch('fabcal.forms.send_mail', autospec=True)
+    def test_slot_booked_meanwhile(self, mock_send_mail):
+        """
+        Test that a free slot booked by someone else between the validation and the save is not overwritten.
+        """
+        form_data = {
+            'start_time': '10:30',
+            'end_time': '11:30'
+        }
+        form = MachineSlotUpdateForm(data=form_data, instance=MachineSlot.objects.first(), user=self.user)
+        self.assertTrue(form.is_valid())
+
+        other_form = MachineSlotUpdateForm(data=form_data, instance=MachineSlot.objects.first(), user=self.superuser)
+        self.assertTrue(other_form.is_valid())
+
+        form.save()
+
+        with self.assertRaises(ValidationError) as error:
+            other_form.save()
+        self.assertEqual(error.exception.code, 'machine_slot_not_available')
+        self.assertEqual(MachineSlot.objects.get(pk=1).user, self.user)
+        self.assertEqual(MachineSlot.objects.count(), 3)
+
+    @patch('fabcal.forms.send_mail', autospec=True)
+    def test_book_machine_slot_diff(self, mock_send_mail):
+        """
+        Test the diff returned by the booking engine when a reservation is moved between free slots.
+        """
+        machine_slot = book_machine_slot(MachineSlot.objects.first(), self.user, datetime.datetime(2023, 5, 1, 10, 30), datetime.datetime(2023, 5, 1, 11)).slot
+        
+        diff = book_machine_slot(machine_slot, self.user, datetime.datetime(2023, 5, 1, 11, 30), datetime.datetime(2023, 5, 1, 12))
+
+        self.assertEqual(diff.created, [])
+        self.assertEqual(diff.deleted, [MachineSlot(pk=3)])
+        self.assertEqual(diff.updated, [MachineSlot(pk=2)])
+
+        # The free time before the reservation is merged in a single slot
+        self.assertEqual(MachineSlot.objects.count(), 2)
+        free_slot = MachineSlot.objects.get(pk=2)
+        self.assertIsNone(free_slot.user)
+        self.assertEqual(free_slot.start.time(), datetime.time(10))
+        self.assertEqual(free_slot.end.time(), datetime.time(11, 30))
+
     @patch('fabcal.forms.send_mail', autospec=True)
     def test_update_machine_slot_invalid_duration(self, mock_send_mail):
         """
@@ -1198,6 +1280,24 @@ class TrainingSlotCreateViewTestCase(TrainingSlotTestCase):
         self.assertEqual(email_content['recipient_list'], ['user@fake.django'])
         self.assertEqual(email_content['subject'], 'Une nouvelle formation a été planifiée')
 
+    @patch('fabcal.forms.send_mail', autospec=True)
+    def test_create_training_slot_announcement(self, mock_send_mail):
+        """
+        Test that the announcement is queued once per waiting member, with its first name.
+        """
+        self.user.first_name = 'Ada'
+        self.user.save()
+
+        form = TrainingSlotCreateForm(data=self.form_data, user=self.superuser)
+        self.assertTrue(form.is_valid())
+        form.save()
+
+        batch = OutboxBatch.objects.get()
+        message = batch.messages.get()
+        self.assertEqual(message.recipient_list, ['user@fake.django'])
+        self.assertIn('Ada', message.html_message)
+        self.assertNotIn(placeholder('first_name'), message.html_message)
+
     @patch('fabcal.forms.send_mail', autospec=True)
     def test_create_training_slot_form_on_an_existing_opening_slot(self, mock_send_mail):
 
@@ -1393,6 +1493,43 @@ class TrainingSlotRegistrationCreateViewTestCase(TrainingSlotRegistrationViewTes
         expected_message = "Vous êtes déjà inscrit à cette formation !"
         self.assertEqual(message, expected_message)
 
+    @patch('fabcal.forms.send_mail', autospec=True)
+    def test_attendee_count(self, mock_send_mail):
+        """
+        Test that the attendee counter follows the registrations and that a full training refuses new ones.
+        """
+        TrainingSlotRegistrationCreateForm(instance=self.training_slot, user=self.user).save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.training_slot.available_registration, 0)
+
+        # The only place was taken by the first registration
+        with self.assertRaises(ValidationError) as e:
+            TrainingSlotRegistrationCreateForm(instance=TrainingSlot.objects.get(pk=self.training_slot.pk), user=self.superuser).save()
+        self.assertEqual(e.exception.code, 'training_slot_full')
+        self.assertEqual(list(self.training_slot.registrations.all()), [self.user])
+
+        TrainingSlotRegistrationDeleteForm(instance=self.training_slot, user=self.user).save()
+        self.assertEqual(self.training_slot.get_number_of_attendees, 0)
+
+        # Memberships changed from the user side or deleted in cascade are counted too
+        self.superuser.training_registration_users.add(self.training_slot)
+        self.assertEqual(TrainingSlot.objects.get(pk=self.training_slot.pk).attendee_count, 1)
+        self.superuser.delete()
+        self.assertEqual(TrainingSlot.objects.get(pk=self.training_slot.pk).attendee_count, 0)
+
+    @patch('fabcal.forms.send_mail', autospec=True)
+    def test_save_keeps_attendee_count(self, mock_send_mail):
+        """
+        Test that saving a slot loaded before a registration does not undo its count.
+        """
+        stale = TrainingSlot.objects.get(pk=self.training_slot.pk)
+        TrainingSlotRegistrationCreateForm(instance=self.training_slot, user=self.user).save()
+
+        stale.registration_limit = 2
+        stale.save()
+        self.assertEqual(TrainingSlot.objects.get(pk=self.training_slot.pk).attendee_count, 1)
+
 class TrainingSlotRegistrationDeleteViewTestCase(TrainingSlotRegistrationViewTestCase):
 
     @patch('fabcal.forms.send_mail', autospec=True)
@@ -1805,3 +1942,580 @@ class EventSlotRegistrationDeleteViewTestCase(EventSlotRegistrationViewTestCase)
 
         expected_message = "Vous vous êtes desinscrit avec succès à l'évènement my event title durant 120 minutes le lundi 1 mai 2023 de 10:00 à 12:00"
         self.assertEqual(message, expected_message)
+
+
+class EventSlotAttendeeCountTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.event_slot = EventSlot.objects.create(
+            event=self.event,
+            start=datetime.datetime(2023, 5, 1, 10),
+            end=datetime.datetime(2023, 5, 1, 12),
+            registration_required=True,
+            registration_type='onsite',
+            registration_limit=3
+        )
+
+    def test_attendee_count(self):
+        """
+        Test that the attendee counter sums the registrations and that an event without enough places refuses them.
+        """
+        register_event_slot(RegistrationEventSlot(event_slot=self.event_slot, user=self.user, number_of_attendees=2))
+        self.assertEqual(self.event_slot.get_number_of_attendees, 2)
+
+        with self.assertRaises(ValidationError) as e:
+            register_event_slot(RegistrationEventSlot(event_slot=self.event_slot, user=self.superuser, number_of_attendees=2))
+        self.assertEqual(e.exception.code, 'attendees_not_within_available_slots')
+
+        registration = register_event_slot(RegistrationEventSlot(event_slot=self.event_slot, user=self.superuser, number_of_attendees=1))
+        self.assertEqual(self.event_slot.available_registration, 0)
+
+        registration.delete()
+        self.event_slot.refresh_from_db()
+        self.assertEqual(self.event_slot.attendee_count, self.event_slot.count_attendees())
+        self.assertEqual(self.event_slot.attendee_count, 2)
+
+    def test_registration_statuses(self):
+        """
+        Test that the registration status of a user for a list of event and training slots is read in two queries.
+        """
+        registration = register_event_slot(RegistrationEventSlot(event_slot=self.event_slot, user=self.user, number_of_attendees=2))
+        other_event_slot = EventSlot.objects.create(
+            event=self.event,
+            start=datetime.datetime(2023, 5, 2, 10),
+            end=datetime.datetime(2023, 5, 2, 12),
+            registration_required=True,
+            registration_type='onsite',
+            registration_limit=0
+        )
+        training_slot = TrainingSlot.objects.create(
+            training=self.laser_training,
+            start=datetime.datetime(2023, 5, 3, 10),
+            end=datetime.datetime(2023, 5, 3, 12),
+            registration_limit=4
+        )
+        training_slot.registrations.add(self.user, self.superuser)
+        training_slot.refresh_from_db()
+
+        slots = [self.event_slot, other_event_slot, training_slot]
+        with self.assertNumQueries(2):
+            statuses = get_registration_statuses(slots, self.user)
+
+        self.assertEqual(statuses[self.event_slot].registration_id, registration.pk)
+        self.assertEqual(statuses[self.event_slot].number_of_attendees, 2)
+        self.assertFalse(statuses[other_event_slot].is_registered)
+        self.assertTrue(statuses[training_slot].is_registered)
+        self.assertEqual(statuses[training_slot].available_registration, 2)
+
+        # The template filters reuse the statuses
+        with self.assertNumQueries(0):
+            self.assertTrue(is_registered(training_slot, self.user))
+            self.assertFalse(is_registered(other_event_slot, self.user))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_registration_statuses(slots, AnonymousUser())[training_slot].is_registered, False)
+
+class MachineAvailabilityTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        start = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time(10))
+        self.opening_slot = OpeningSlot.objects.create(opening=self.openlab, user=self.superuser, start=start, end=start + datetime.timedelta(hours=6))
+        self.full_opening_slot = OpeningSlot.objects.create(opening=self.openlab, start=start + datetime.timedelta(days=1), end=start + datetime.timedelta(days=1, hours=2))
+
+        # Too short to be booked
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=self.opening_slot, start=start, end=start + datetime.timedelta(minutes=15))
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=self.opening_slot, user=self.user, start=start + datetime.timedelta(minutes=15), end=start + datetime.timedelta(hours=2))
+        self.free_slot = MachineSlot.objects.create(machine=self.trotec, opening_slot=self.opening_slot, start=start + datetime.timedelta(hours=2), end=start + datetime.timedelta(hours=6))
+        MachineSlot.objects.create(machine=self.prusa, opening_slot=self.opening_slot, start=start, end=start + datetime.timedelta(hours=6))
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=self.full_opening_slot, user=self.user, start=start + datetime.timedelta(days=1), end=start + datetime.timedelta(days=1, hours=2))
+
+    def test_machine_availability(self):
+        """
+        Test that the free bookable slots of a machine are grouped by opening slot in a single query.
+        """
+        with self.assertNumQueries(1):
+            opening_slots = get_machine_availability(self.trotec)
+            titles = [opening_slot.opening.title for opening_slot in opening_slots]
+
+        self.assertEqual(opening_slots, [self.opening_slot, self.full_opening_slot])
+        self.assertEqual(titles, ['OpenLab', 'OpenLab'])
+        self.assertEqual(opening_slots[0].free_machine_slots, [self.free_slot])
+        self.assertEqual(opening_slots[1].free_machine_slots, [])
+
+    def test_machine_show_view(self):
+        response = self.client.get(reverse('machines:machines-show', kwargs={'pk': self.trotec.pk}))
+        self.assertContains(response, reverse('fabcal:machineslot-update', kwargs={'pk': self.free_slot.pk}))
+
+    def test_search_free_machine_slots(self):
+        """
+        Test that the free slots of all machines of a category are ranked by start, in a single query.
+        """
+        speedy = Machine.objects.create(title='Speedy', category=self.laser_category)
+        speedy_slot = MachineSlot.objects.create(machine=speedy, opening_slot=self.opening_slot, start=self.opening_slot.start, end=self.opening_slot.start + datetime.timedelta(minutes=90))
+        day = self.opening_slot.start.replace(hour=0)
+        lasers = Machine.objects.filter(category=self.laser_category)
+
+        with self.assertNumQueries(1):
+            machine_slots = search_free_machine_slots(lasers, datetime.timedelta(minutes=90), day, day + datetime.timedelta(days=1))
+        self.assertEqual(machine_slots, [speedy_slot, self.free_slot])
+        self.assertEqual(machine_slots[1].bookable_start, self.free_slot.start)
+
+        machine_slots = search_free_machine_slots(lasers, datetime.timedelta(hours=3), day, day + datetime.timedelta(days=1))
+        self.assertEqual(machine_slots, [self.free_slot])
+
+        # The search starts on the increment following the start of the period
+        machine_slots = search_free_machine_slots(lasers, datetime.timedelta(hours=1), self.free_slot.start + datetime.timedelta(minutes=10), day + datetime.timedelta(days=1))
+        self.assertEqual(machine_slots[0].bookable_start, self.free_slot.start + datetime.timedelta(minutes=30))
+
+    def test_machine_slot_search_results_view(self):
+        day = self.opening_slot.start.date()
+        response = self.client.get(reverse('fabcal:machineslot-search-results'), {
+            'category': self.laser_category.pk,
+            'duration': 60,
+            'start_date': day.isoformat(),
+            'end_date': day.isoformat()
+        })
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.free_slot.pk])
+
+        response = self.client.get(reverse('fabcal:machineslot-search-results'), {'duration': 45, 'start_date': day.isoformat(), 'end_date': day.isoformat()})
+        self.assertEqual(response.status_code, 400)
+
+class CompactMachineSlotsTestCase(SlotViewTestCase):
+    def test_compact_machine_slots(self):
+        """
+        Test that contiguous free slots are merged per opening slot, and not across reservations.
+        """
+        start = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time(10))
+        hour = datetime.timedelta(hours=1)
+        opening_slot = OpeningSlot.objects.create(opening=self.openlab, start=start, end=start + 5 * hour)
+        first = MachineSlot.objects.create(machine=self.trotec, opening_slot=opening_slot, start=start, end=start + hour)
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=opening_slot, start=start + hour, end=start + 2 * hour)
+        booked = MachineSlot.objects.create(machine=self.trotec, opening_slot=opening_slot, user=self.user, start=start + 2 * hour, end=start + 3 * hour)
+        last = MachineSlot.objects.create(machine=self.trotec, opening_slot=opening_slot, start=start + 3 * hour, end=start + 4 * hour)
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=opening_slot, start=start + 4 * hour, end=start + 5 * hour)
+        prusa = MachineSlot.objects.create(machine=self.prusa, opening_slot=opening_slot, start=start, end=start + 5 * hour)
+
+        self.assertEqual(compact_machine_slots(), {'merged': 2, 'reclaimed': 2})
+
+        self.assertEqual(
+            list(MachineSlot.objects.order_by('machine', 'start').values_list('pk', 'start', 'end')),
+            [
+                (first.pk, start, start + 2 * hour),
+                (booked.pk, start + 2 * hour, start + 3 * hour),
+                (last.pk, start + 3 * hour, start + 5 * hour),
+                (prusa.pk, start, start + 5 * hour),
+            ]
+        )
+        self.assertEqual(compact_machine_slots(), {'merged': 0, 'reclaimed': 0})
+
+class ArchiveSlotsTestCase(SlotViewTestCase):
+    @override_settings(FABCAL_ARCHIVE_AFTER_DAYS=30)
+    def test_archive_slots(self):
+        """
+        Test that old opening slots move to the archive with their machine slots, and stay readable in the history.
+        """
+        start = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(days=60)
+        hour = datetime.timedelta(hours=1)
+        old = OpeningSlot.objects.create(opening=self.openlab, user=self.superuser, start=start, end=start + 2 * hour)
+        reservation = MachineSlot.objects.create(machine=self.trotec, opening_slot=old, user=self.user, start=start, end=start + hour)
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=old, start=start + hour, end=start + 2 * hour)
+        with_event = OpeningSlot.objects.create(opening=self.openlab, start=start, end=start + 2 * hour)
+        EventSlot.objects.create(event=self.event, opening_slot=with_event, start=start, end=start + hour, registration_required=False)
+        recent = OpeningSlot.objects.create(opening=self.openlab, start=start + datetime.timedelta(days=50), end=start + datetime.timedelta(days=50) + hour)
+
+        self.assertEqual(archive_slots(), {'opening_slots': 1, 'machine_slots': 2})
+
+        self.assertEqual(set(OpeningSlot.objects.values_list('pk', flat=True)), {with_event.pk, recent.pk})
+        self.assertFalse(MachineSlot.objects.exists())
+        self.assertEqual(ArchivedOpeningSlot.objects.get().pk, old.pk)
+        self.assertEqual(ArchivedMachineSlot.objects.get(user=self.user).start, reservation.start)
+
+        reservations = list(get_machine_reservations(end__lt=datetime.datetime.now()))
+        self.assertEqual([(row['id'], row['machine_title']) for row in reservations], [(reservation.pk, 'Trotec')])
+        self.assertEqual(archive_slots(), {'opening_slots': 0, 'machine_slots': 0})
+
+    def test_machine_past_reservation_list_view(self):
+        start = datetime.datetime(2023, 5, 1, 10)
+        ArchivedMachineSlot.objects.create(id=1000, machine=self.trotec, user=self.user, start=start, end=start + datetime.timedelta(hours=1))
+        self.client.login(username='testsuperuser', password='testpass')
+        response = self.client.get(reverse('fabcal:machine-reservation-past'))
+        self.assertContains(response, 'Trotec')
+
+class MachineReservationHistoryTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        start = datetime.datetime(2023, 5, 1, 10)
+        self.reservations = [
+            MachineSlot.objects.create(machine=self.trotec, user=self.user, start=start + datetime.timedelta(days=day), end=start + datetime.timedelta(days=day, hours=1))
+            for day in (0, 1, 1, 2)
+        ]
+        self.archived = ArchivedMachineSlot.objects.create(id=1000, machine=self.prusa, user=self.superuser, start=start - datetime.timedelta(days=1), end=start - datetime.timedelta(hours=23))
+
+    @override_settings(FABCAL_RESERVATIONS_PAGE_SIZE=2)
+    def test_reservations_pages(self):
+        """
+        Test that the past reservations, archived ones included, are walked from the most recent without gaps.
+        """
+        pks = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                rows, cursor = get_reservations_page(True, cursor)
+            pks.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+
+        self.assertEqual(pks, [self.reservations[3].pk, self.reservations[2].pk, self.reservations[1].pk, self.reservations[0].pk, self.archived.pk])
+
+        rows, cursor = get_reservations_page(True, machine=self.prusa)
+        self.assertEqual([row['machine_title'] for row in rows], ['Prusa'])
+        rows, cursor = get_reservations_page(True, start_date=datetime.date(2023, 5, 2), end_date=datetime.date(2023, 5, 2))
+        self.assertEqual({row['id'] for row in rows}, {self.reservations[1].pk, self.reservations[2].pk})
+
+    @override_settings(FABCAL_RESERVATIONS_COUNT_LIMIT=3)
+    def test_count_reservations(self):
+        self.assertEqual(count_reservations(True), (3, True))
+        self.assertEqual(count_reservations(True, user=self.superuser), (1, False))
+        self.assertEqual(count_reservations(False), (0, False))
+
+    def test_machine_past_reservation_list_view(self):
+        self.client.login(username='testsuperuser', password='testpass')
+        response = self.client.get(reverse('fabcal:machine-reservation-past'), {'member': 'testsuperuser'})
+        self.assertEqual([row['id'] for row in response.context['object_list']], [self.archived.pk])
+
+    def test_machine_reservation_list_view_filters(self):
+        """
+        Test that machines no longer reservable can be filtered and that invalid filters list no reservation.
+        """
+        Machine.objects.filter(pk=self.prusa.pk).update(reservable=False)
+        self.client.login(username='testsuperuser', password='testpass')
+
+        response = self.client.get(reverse('fabcal:machine-reservation-past'), {'machine': self.prusa.pk})
+        self.assertEqual([row['id'] for row in response.context['object_list']], [self.archived.pk])
+
+        response = self.client.get(reverse('fabcal:machine-reservation-past'), {'member': 'unknown'})
+        self.assertEqual(response.context['object_list'], [])
+        self.assertIn('member', response.context['form'].errors)
+
+class MachineUsageTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = datetime.datetime(2023, 5, 1, 10)
+        hour = datetime.timedelta(hours=1)
+        self.reservation = MachineSlot.objects.create(machine=self.trotec, user=self.user, start=self.start, end=self.start + hour)
+        MachineSlot.objects.create(machine=self.trotec, start=self.start + hour, end=self.start + 4 * hour)
+        MachineSlot.objects.create(machine=self.trotec, user=self.user, start=self.start + datetime.timedelta(days=1), end=self.start + datetime.timedelta(days=1, hours=2))
+        ArchivedMachineSlot.objects.create(id=1000, machine=self.trotec, user=self.superuser, start=self.start + datetime.timedelta(days=2), end=self.start + datetime.timedelta(days=2, hours=1))
+
+    def test_machine_usage(self):
+        """
+        Test that the daily rollups add up to weekly reports, with distinct members, current and archived slots.
+        """
+        self.assertEqual(rollup_machine_usage(today=datetime.date(2023, 5, 10)), 3)
+
+        with self.assertNumQueries(1):
+            report = get_machine_usage('week', datetime.date(2023, 5, 1), datetime.date(2023, 5, 7))
+
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]['period'], datetime.date(2023, 5, 1))
+        self.assertEqual(report[0]['booked_minutes'], 4 * 60)
+        self.assertEqual(report[0]['free_minutes'], 3 * 60)
+        self.assertEqual(report[0]['reservations'], 3)
+        self.assertEqual(report[0]['members'], 2)
+
+    def test_incremental_rollup(self):
+        """
+        Test that a run only rolls up new days and past days with updated slots.
+        """
+        rollup_machine_usage(today=datetime.date(2023, 5, 10))
+        self.assertEqual(rollup_machine_usage(today=datetime.date(2023, 5, 10)), 0)
+
+        self.reservation.user = self.superuser
+        self.reservation.save()
+        self.assertEqual(rollup_machine_usage(today=datetime.date(2023, 5, 10)), 1)
+        self.assertEqual(get_machine_usage('day', datetime.date(2023, 5, 1), datetime.date(2023, 5, 1))[0]['members'], 1)
+
+    def test_rollup_deleted_slot(self):
+        """
+        Test that a run rolls up again the past days whose slots were deleted.
+        """
+        rollup_machine_usage(today=datetime.date(2023, 5, 10))
+        self.reservation.delete()
+
+        self.assertEqual(rollup_machine_usage(today=datetime.date(2023, 5, 10)), 1)
+        usage = get_machine_usage('day', datetime.date(2023, 5, 1), datetime.date(2023, 5, 1))[0]
+        self.assertEqual(usage['reservations'], 0)
+        self.assertEqual(usage['members'], 0)
+        self.assertEqual(rollup_machine_usage(today=datetime.date(2023, 5, 10)), 0)
+
+class OpeningSeriesTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.series_url = reverse('fabcal:openingseries-create')
+        self.series_data = {
+            'opening': self.openlab.id,
+            'machines': [self.trotec.id, self.prusa.id],
+            'weekday': 1,
+            'start_time': '18:00',
+            'end_time': '22:00',
+            'start_date': '2030-01-01',
+            'until': '2030-01-29',
+            'comment': 'Open lab'
+        }
+
+    def create_series(self):
+        self.client.login(username='testsuperuser', password='testpass')
+        self.client.post(self.series_url, self.series_data)
+        return OpeningSeries.objects.get()
+
+    def test_create_series(self):
+        """
+        Test that every tuesday of the series gets an opening with a free slot per machine.
+        """
+        series = self.create_series()
+
+        self.assertEqual(
+            list(series.openingslot_set.order_by('start').values_list('start', flat=True)),
+            [datetime.datetime(2030, 1, day, 18) for day in (1, 8, 15, 22, 29)]
+        )
+        self.assertEqual(MachineSlot.objects.filter(opening_slot__series=series, user__isnull=True).count(), 10)
+        self.assertEqual(OpeningSlot.objects.filter(user=self.superuser, comment='Open lab').count(), 5)
+
+    def test_create_series_conflict(self):
+        """
+        Test that no opening of the series is created when one of them conflicts with an existing opening.
+        """
+        OpeningSlot.objects.create(opening=self.openlab, start=datetime.datetime(2030, 1, 15, 20), end=datetime.datetime(2030, 1, 15, 23))
+
+        self.client.login(username='testsuperuser', password='testpass')
+        response = self.client.post(self.series_url, self.series_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(OpeningSeries.objects.exists())
+        self.assertEqual(OpeningSlot.objects.count(), 1)
+
+    def test_update_series(self):
+        """
+        Test that the future openings move to the new times around the reservations, and the removed machines go away.
+        """
+        series = self.create_series()
+        occurrence = series.openingslot_set.get(start__date=datetime.date(2030, 1, 8))
+        MachineSlot.objects.filter(opening_slot=occurrence, machine=self.trotec).update(user=self.user, start=datetime.datetime(2030, 1, 8, 19), end=datetime.datetime(2030, 1, 8, 20))
+
+        response = self.client.post(
+            reverse('fabcal:openingseries-update', kwargs={'pk': series.pk}),
+            {'machines': [self.trotec.id], 'start_time': '17:00', 'end_time': '21:00', 'comment': ''}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        occurrence.refresh_from_db()
+        self.assertEqual((occurrence.start, occurrence.end), (datetime.datetime(2030, 1, 8, 17), datetime.datetime(2030, 1, 8, 21)))
+        self.assertEqual(
+            list(occurrence.machineslot_set.order_by('start').values_list('start__hour', 'end__hour', 'user')),
+            [(17, 19, None), (19, 20, self.user.pk), (20, 21, None)]
+        )
+        self.assertFalse(MachineSlot.objects.filter(machine=self.prusa).exists())
+
+    def test_update_series_outside_reservation(self):
+        """
+        Test that the series cannot be shortened over a reservation.
+        """
+        series = self.create_series()
+        MachineSlot.objects.filter(opening_slot__series=series, machine=self.trotec).update(user=self.user)
+
+        response = self.client.post(
+            reverse('fabcal:openingseries-update', kwargs={'pk': series.pk}),
+            {'machines': [self.trotec.id, self.prusa.id], 'start_time': '19:00', 'end_time': '22:00', 'comment': ''}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(OpeningSlot.objects.filter(start__hour=19).exists())
+
+    def test_update_series_outside_event(self):
+        """
+        Test that the series cannot be moved away from the events of its openings.
+        """
+        series = self.create_series()
+        occurrence = series.openingslot_set.get(start__date=datetime.date(2030, 1, 8))
+        EventSlot.objects.create(event=self.event, opening_slot=occurrence, start=occurrence.start, end=occurrence.start + datetime.timedelta(hours=1), registration_required=False)
+
+        response = self.client.post(
+            reverse('fabcal:openingseries-update', kwargs={'pk': series.pk}),
+            {'machines': [self.trotec.id, self.prusa.id], 'start_time': '19:00', 'end_time': '22:00', 'comment': ''}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        occurrence.refresh_from_db()
+        self.assertEqual(occurrence.start, datetime.datetime(2030, 1, 8, 18))
+
+    def test_cancel_series(self):
+        """
+        Test that the future openings without reservations are cancelled, and the series ends with the kept ones.
+        """
+        series = self.create_series()
+        kept = series.openingslot_set.get(start__date=datetime.date(2030, 1, 15))
+        MachineSlot.objects.filter(opening_slot=kept, machine=self.trotec).update(user=self.user)
+
+        result = cancel_opening_series(series, now=datetime.datetime(2030, 1, 2))
+
+        self.assertEqual(result, {'cancelled': 3, 'kept': 1})
+        self.assertEqual(set(series.openingslot_set.values_list('start__day', flat=True)), {1, 15})
+        series.refresh_from_db()
+        self.assertEqual(series.until, datetime.date(2030, 1, 15))
+
+class EventsArchiveTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.event_slots = [
+            EventSlot.objects.create(
+                event=self.event,
+                start=datetime.datetime(2023, 5, day, 10),
+                end=datetime.datetime(2023, 5, day, 12),
+                registration_required=False
+            )
+            for day in (1, 2, 2, 3, 4)
+        ]
+
+    @override_settings(FABCAL_EVENTS_ARCHIVE_PAGE_SIZE=2)
+    def test_past_event_slots_pages(self):
+        """
+        Test that the archive is walked from the most recent event without gaps, through the load more endpoint.
+        """
+        html, cursor = render_events_archive_page()
+        pks = [int(pk) for pk in re.findall(r'/eventslot/(\d+)/', html)]
+
+        while cursor:
+            response = self.client.get(reverse('fabcal:events-archive'), {'before': cursor})
+            content = response.content.decode()
+            pks += [int(pk) for pk in re.findall(r'/eventslot/(\d+)/', content)]
+            cursor = re.search(r'before=([^"]+)"', content)
+            cursor = unquote(cursor.group(1)) if cursor else None
+            self.assertIn('hx-swap-oob="true"', content)
+
+        self.assertEqual(pks, [slot.pk for slot in sorted(self.event_slots, key=lambda slot: (slot.start, slot.pk), reverse=True)])
+
+    def test_archive_is_cached(self):
+        """
+        Test that a page of the archive is read from the cache until an event slot changes.
+        """
+        html, cursor = render_events_archive_page()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(render_events_archive_page(), (html, cursor))
+
+        self.event_slots[0].delete()
+        self.assertNotEqual(render_events_archive_page()[0], html)
+
+class CalendarFeedTestCase(SlotViewTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+        self.today = datetime.date.today()
+        start = datetime.datetime.combine(self.today, datetime.time(10))
+        self.opening_slot = OpeningSlot.objects.create(
+            opening=self.openlab,
+            user=self.superuser,
+            start=start,
+            end=start + datetime.timedelta(hours=2)
+        )
+        # Split machine slots of the same machine must only be listed once
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=self.opening_slot, start=start, end=start + datetime.timedelta(hours=1))
+        MachineSlot.objects.create(machine=self.trotec, opening_slot=self.opening_slot, start=start + datetime.timedelta(hours=1), end=start + datetime.timedelta(hours=2))
+
+        self.events_url = reverse('fabcal:calendar-events')
+
+    def test_opening_machines(self):
+        events = get_calendar_events(self.today, self.today)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['type'], 'opening')
+        self.assertEqual(events[0]['title'], 'OpenLab')
+        self.assertEqual(events[0]['machines'], [{'pk': self.trotec.pk, 'title': 'Trotec', 'category': 'laser'}])
+
+    def test_window(self):
+        tomorrow = self.today + datetime.timedelta(days=1)
+        self.assertEqual(get_calendar_events(tomorrow, tomorrow + datetime.timedelta(days=6)), [])
+
+    def test_initial_window(self):
+        start, end = get_initial_window(datetime.date(2024, 2, 29))
+        self.assertEqual(start, datetime.date(2024, 1, 29))
+        self.assertEqual(end, datetime.date(2024, 3, 3))
+
+    def test_weekly_schedule(self):
+        """
+        Test that the openings of the week are grouped by day, private ones only for the superusers, in a single query.
+        """
+        private = Opening.objects.create(
+            title='Private',
+            is_open_to_reservation=False,
+            is_open_to_questions=False,
+            is_reservation_mandatory=False,
+            is_public=False
+        )
+        start = datetime.datetime.combine(self.today + datetime.timedelta(days=2), datetime.time(14))
+        OpeningSlot.objects.create(opening=private, start=start, end=start + datetime.timedelta(hours=2))
+        OpeningSlot.objects.create(opening=self.openlab, start=start + datetime.timedelta(days=7), end=start + datetime.timedelta(days=7, hours=2))
+        now = datetime.datetime.combine(self.today, datetime.time(8))
+
+        with self.assertNumQueries(1):
+            schedule = get_weekly_schedule(now=now)
+        self.assertEqual([day for day, slots in schedule], [self.today + datetime.timedelta(days=x) for x in range(7)])
+        self.assertEqual([[slot['title'] for slot in slots] for day, slots in schedule], [['OpenLab'], [], [], [], [], [], []])
+
+        schedule = get_weekly_schedule(include_private=True, now=now)
+        self.assertEqual(schedule[2][1][0]['title'], 'Private')
+
+        # Cached for the day, without the openings already over
+        with self.assertNumQueries(0):
+            schedule = get_weekly_schedule(now=now + datetime.timedelta(hours=5))
+        self.assertEqual(schedule[0][1], [])
+
+    def test_events_are_cached(self):
+        get_calendar_events(self.today, self.today)
+        with self.assertNumQueries(0):
+            get_calendar_events(self.today, self.today)
+
+    def test_slot_change_invalidates_cache(self):
+        get_calendar_events(self.today, self.today)
+
+        self.opening_slot.comment = 'updated'
+        self.opening_slot.save()
+        self.assertEqual(get_calendar_events(self.today, self.today)[0]['comment'], 'updated')
+
+        MachineSlot.objects.all().delete()
+        self.opening_slot.delete()
+        self.assertEqual(get_calendar_events(self.today, self.today), [])
+
+    def test_events_view(self):
+        response = self.client.get(self.events_url, {'start': self.today.isoformat(), 'end': self.today.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['events'][0]['pk'], self.opening_slot.pk)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    @patch('fabcal.views.get_calendar_last_modified', return_value=datetime.datetime(2024, 1, 15, 12, 0))
+    def test_events_view_last_modified(self, get_calendar_last_modified):
+        """
+        Test that Last-Modified converts the local time of the last change to GMT.
+        """
+        response = self.client.get(self.events_url, {'start': self.today.isoformat(), 'end': self.today.isoformat()})
+        self.assertEqual(response['Last-Modified'], 'Mon, 15 Jan 2024 11:00:00 GMT')
+
+    def test_events_view_not_modified(self):
+        params = {'start': self.today.isoformat(), 'end': self.today.isoformat()}
+        etag = self.client.get(self.events_url, params)['ETag']
+
+        response = self.client.get(self.events_url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.opening_slot.save()
+        response = self.client.get(self.events_url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_events_view_invalid_window(self):
+        response = self.client.get(self.events_url, {'start': 'today'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.events_url, {'start': '2024-01-01', 'end': '2024-12-31'})
+        self.assertEqual(response.status_code, 400)
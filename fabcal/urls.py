@@ -7,8 +7,13 @@ urlpatterns = [
     path('openingslot/create/<str:start>/<str:end>/', views.OpeningSlotCreateView.as_view(), name='openingslot-create'),
     path('openingslot/update/<int:pk>/', views.OpeningSlotUpdateView.as_view(), name='openingslot-update'),
     path('openingslot/delete/<int:pk>/', views.OpeningSlotDeleteView.as_view(), name='openingslot-delete'),
+    path('openingseries/create/', views.OpeningSeriesCreateView.as_view(), name='openingseries-create'),
+    path('openingseries/update/<int:pk>/', views.OpeningSeriesUpdateView.as_view(), name='openingseries-update'),
+    path('openingseries/delete/<int:pk>/', views.OpeningSeriesDeleteView.as_view(), name='openingseries-delete'),
     path('machineslot/update/<int:pk>/', views.MachineSlotUpdateView.as_view(), name='machineslot-update'),
     path('machineslot/delete/<int:pk>/', views.MachineSlotDeleteView.as_view(), name='machineslot-delete'),
+    path('machineslot/search/', views.MachineSlotSearchView.as_view(), name='machineslot-search'),
+    path('machineslot/search/results/', views.MachineSlotSearchResultsView.as_view(), name='machineslot-search-results'),
     path('trainingslot/create/<str:start>/<str:end>/', views.TrainingSlotCreateView.as_view(), name='trainingslot-create'),
     path('trainingslot/update/<int:pk>/', views.TrainingSlotUpdateView.as_view(), name='trainingslot-update'),
     path('trainingslot/delete/<int:pk>/', views.TrainingSlotDeleteView.as_view(), name='trainingslot-delete'),
@@ -22,5 +27,8 @@ urlpatterns = [
     path('eventslot/register/delete/<int:pk>/', views.EventSlotRegistrationDeleteView.as_view(), name='eventslot-unregister'),
     path('download-ics-file/<str:summary>/<str:start>/<str:end>/', views.downloadIcsFileView.as_view(), name='download-ics-file'),
     path('machine/reservation/future/', views.MachineFutureReservationListView.as_view(), name='machine-reservation-future'),
-    path('machine/reservation/past/', views.MachinePastReservationListView.as_view(), name='machine-reservation-past')
+    path('machine/reservation/past/', views.MachinePastReservationListView.as_view(), name='machine-reservation-past'),
+    path('machine/usage/', views.MachineUsageReportView.as_view(), name='machine-usage'),
+    path('calendar/events/', views.CalendarEventsView.as_view(), name='calendar-events'),
+    path('events/archive/', views.EventsArchiveView.as_view(), name='events-archive')
 ]
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Daily machine usage rollups.
+
+rollup_machine_usage() aggregates the machine slots of past days into one
+MachineUsageDay row per machine and day: booked and free minutes, number of
+reservations and members. The reports then read these rows only, so their
+cost depends on the reported period and not on the size of the history.
+
+Each run rolls up the days not rolled up yet, the past days whose slots
+were updated since the previous run, and the past days whose slots were
+deleted, marked as stale by forget_machine_usage().
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Max, Q
+
+from .models import ArchivedMachineSlot, MachineSlot, MachineUsageDay
+
+USAGE_PERIODS = ('day', 'week', 'month')
+
+# computed_at of the usage rows to roll up again, older than any run
+USAGE_STALE = datetime.datetime(1970, 1, 1)
+
+
+def get_minutes(start, end):
+    return int((end - start).total_seconds() // 60)
+
+
+def get_day_ranges(days):
+    """Return the [start, end[ datetimes of the runs of consecutive dates of `days`."""
+    ranges = []
+    for day in sorted(days):
+        start = datetime.datetime.combine(day, datetime.time.min)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = start + datetime.timedelta(days=1)
+        else:
+            ranges.append([start, start + datetime.timedelta(days=1)])
+    return ranges
+
+
+def rollup_machine_usage_days(days, now=None):
+    """
+    Rebuild the usage rows of `days` from the current and archived machine slots starting on them.
+
+    Returns:
+        int: The number of usage rows written.
+    """
+    days = set(days)
+    if not days:
+        return 0
+
+    now = now or datetime.datetime.now()
+    query = Q()
+    for start, end in get_day_ranges(days):
+        query |= Q(start__gte=start, start__lt=end)
+
+    usage = {}
+    for model in (MachineSlot, ArchivedMachineSlot):
+        slots = model.objects.filter(query, machine__isnull=False).values_list('machine_id', 'user_id', 'start', 'end')
+        for machine_id, user_id, slot_start, slot_end in slots:
+            key = (machine_id, slot_start.date())
+            if key not in usage:
+                usage[key] = MachineUsageDay(machine_id=machine_id, date=slot_start.date(), members=[], computed_at=now)
+
+            day = usage[key]
+            if user_id is None:
+                day.free_minutes += get_minutes(slot_start, slot_end)
+            else:
+                day.booked_minutes += get_minutes(slot_start, slot_end)
+                day.reservations += 1
+                if user_id not in day.members:
+                    day.members.append(user_id)
+
+    with transaction.atomic():
+        MachineUsageDay.objects.filter(date__in=days).delete()
+        MachineUsageDay.objects.bulk_create(usage.values(), batch_size=500)
+
+    return len(usage)
+
+
+def forget_machine_usage(machine_id, day):
+    """Mark the usage row of the machine on `day` as stale, the next run rolls the day up again."""
+    MachineUsageDay.objects.filter(machine=machine_id, date=day).update(computed_at=USAGE_STALE)
+
+
+def rollup_machine_usage(today=None):
+    """
+    Roll up the past days not rolled up yet, the stale days and the past days with slots updated since the previous run.
+
+    Returns:
+        int: The number of usage rows written.
+    """
+    now = datetime.datetime.now()
+    today = today or now.date()
+    last = MachineUsageDay.objects.aggregate(date=Max('date'), computed_at=Max('computed_at'))
+
+    if last['date'] is None:
+        first_start = MachineSlot.objects.filter(machine__isnull=False).order_by('start').values_list('start', flat=True).first()
+        first_archived = ArchivedMachineSlot.objects.filter(machine__isnull=False).order_by('start').values_list('start', flat=True).first()
+        starts = [start for start in (first_start, first_archived) if start is not None]
+        if not starts:
+            return 0
+        first_day = min(starts).date()
+    else:
+        first_day = last['date'] + datetime.timedelta(days=1)
+
+    days = set()
+    day = first_day
+    while day < today:
+        days.add(day)
+        day += datetime.timedelta(days=1)
+
+    if last['computed_at'] is not None:
+        updated = MachineSlot.objects.filter(
+            updated_at__gte=last['computed_at'],
+            start__lt=datetime.datetime.combine(today, datetime.time.min)
+        ).values_list('start', flat=True)
+        days.update(start.date() for start in updated)
+
+    days.update(MachineUsageDay.objects.filter(computed_at=USAGE_STALE).values_list('date', flat=True))
+
+    return rollup_machine_usage_days(days, now)
+
+
+def get_period_start(day, period):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_machine_usage(period, start_date, end_date, machine=None):
+    """
+    Return the usage of each machine per day, week (from monday) or month, from `start_date` to `end_date` included.
+
+    Returns:
+        list: Dicts with the machine pk and title, the start of the period,
+        the booked and free minutes, the occupancy ratio, the number of
+        reservations and of distinct members, by period and machine title.
+    """
+    days = MachineUsageDay.objects.filter(date__gte=start_date, date__lte=end_date).select_related('machine')
+    if machine is not None:
+        days = days.filter(machine=machine)
+
+    rows = {}
+    for day in days:
+        key = (get_period_start(day.date, period), day.machine_id)
+        row = rows.setdefault(key, {
+            'machine': day.machine_id,
+            'machine_title': day.machine.title,
+            'period': key[0],
+            'booked_minutes': 0,
+            'free_minutes': 0,
+            'reservations': 0,
+            'members': set()
+        })
+        row['booked_minutes'] += day.booked_minutes
+        row['free_minutes'] += day.free_minutes
+        row['reservations'] += day.reservations
+        row['members'].update(day.members)
+
+    report = sorted(rows.values(), key=lambda row: (row['period'], row['machine_title']))
+    for row in report:
+        opened = row['booked_minutes'] + row['free_minutes']
+        row['occupancy'] = row['booked_minutes'] / opened if opened else 0
+        row['members'] = len(row['members'])
+    return report
@@ -6,19 +6,26 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 
+# Openings never span several days, which bounds how far back an overlapping opening can start
+OPENING_SLOT_MAX_DURATION = datetime.timedelta(days=1)
+
 def validate_conflicting_openings(start, end, instance=None):
     from .models import OpeningSlot # import here to avoid circular imports
     
+    # The lower bound on start keeps the lookup on the (start, end) index range
+    # instead of scanning every past opening
     conflicting_openings = OpeningSlot.objects.filter(
+        start__gt=start - OPENING_SLOT_MAX_DURATION,
         start__lt=end,
         end__gt=start
-    )
-    if instance:
+    ).select_related('user').order_by('start')
+    if instance and instance.pk:
         conflicting_openings = conflicting_openings.exclude(pk=instance.pk)
     
-    if conflicting_openings.exists():
+    conflicting_openings = list(conflicting_openings)
+    if conflicting_openings:
         conflicting_times = [
-            f"{opening.start.strftime('%H:%M')} - {opening.end.strftime('%H:%M')}: {opening.user.first_name}"
+            f"{opening.start.strftime('%H:%M')} - {opening.end.strftime('%H:%M')}: {opening.user.first_name if opening.user else ''}"
             for opening in conflicting_openings
         ]
         raise forms.ValidationError(
@@ -35,6 +42,10 @@ def validate_time_range(start, end):
     if start and end and start >= end:
         raise ValidationError(_("Start time after end time."), code='invalid_time_range')
 
+def validate_opening_slot_duration(start, end):
+    if start and end and end - start > OPENING_SLOT_MAX_DURATION:
+        raise ValidationError(_('You cannot create an opening over several days'), code='opening_over_several_days')
+
 def validate_update_opening_slot_on_machine_slot(opening_slot):
     from .models import MachineSlot
 
@@ -1,4 +1,7 @@
-from datetime import datetime, timedelta
+import json
+from calendar import timegm
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
 from babel.dates import format_datetime
 
 from django import forms
@@ -7,21 +10,35 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin 
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import ValidationError, PermissionDenied
-from django.http import HttpResponse, QueryDict, HttpResponseForbidden
+from django.http import HttpResponse, QueryDict, HttpResponseForbidden, HttpResponseBadRequest
 from django.shortcuts import redirect
 from django.template import loader
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 from django.urls import reverse, reverse_lazy
-from django.views.generic import TemplateView, ListView
+from django.views import View
+from django.views.generic import TemplateView
 from django.views.generic.edit import DeleteView, CreateView, UpdateView
 from django.views.generic.detail import DetailView
 
 from interlab.views import CustomFormView
 from machines.models import Machine
-
+from machines.permissions import can_use_machine
+
+from .booking import release_machine_slot
+from .registrations import get_registration_status
+from .reservations import count_reservations, get_reservations_page
+from .series import cancel_opening_series
+from .events import render_events_archive_page
+from .feeds import CALENDAR_MAX_WINDOW_DAYS
+from .feeds import get_calendar_events, get_calendar_generation, get_calendar_last_modified
 from .forms import OpeningSlotCreateForm
 from .forms import OpeningSlotUpdateForm
+from .forms import OpeningSeriesCreateForm
+from .forms import OpeningSeriesUpdateForm
 from .forms import MachineSlotUpdateForm
 from .forms import TrainingSlotCreateForm
 from .forms import TrainingSlotUpdateForm
@@ -30,8 +47,11 @@ from .forms import TrainingSlotRegistrationDeleteForm
 from .forms import EventSlotCreateForm
 from .forms import EventSlotUpdateForm
 from .forms import EventSlotRegistrationCreateForm
+from .forms import MachineSlotSearchForm
+from .forms import MachineReservationFilterForm
+from .forms import MachineUsageReportForm
 
-from .models import OpeningSlot, EventSlot, TrainingSlot, MachineSlot, RegistrationEventSlot
+from .models import OpeningSeries, OpeningSlot, EventSlot, TrainingSlot, MachineSlot, RegistrationEventSlot
 from .mixins import SuperuserRequiredMixin
 
 
@@ -213,6 +233,55 @@ class OpeningSlotDeleteView(SuperuserRequiredMixin, DeleteSlotView):
     success_url = '/schedule'
     sucess_message = _("Your opening on %(date)s from %(start)s to %(end)s has been successfully deleted")
 
+class OpeningSeriesView(SuperuserRequiredMixin):
+    model = OpeningSeries
+    success_url = '/schedule'
+
+    def form_valid(self, form):
+        # The saved opening slots are only known by the form
+        self.form = form
+        return super().form_valid(form)
+
+    def get_success_message(self, cleaned_data):
+        return self.success_message % dict(
+                    count=len(self.form.opening_slots),
+                    opening_title=self.object.opening.title
+                )
+
+class OpeningSeriesCreateView(OpeningSeriesView, UserView, CreateView):
+    form_class = OpeningSeriesCreateForm
+    success_message = _("%(count)s openings %(opening_title)s have been successfully created")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['submit_btn'] = _('Create series')
+        return context
+
+class OpeningSeriesUpdateView(OpeningSeriesView, UserView, UpdateView):
+    form_class = OpeningSeriesUpdateForm
+    success_message = _("%(count)s future openings %(opening_title)s have been successfully updated")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['submit_btn'] = _('Update series')
+        return context
+
+    def get_initial(self):
+        initial = super().get_initial()
+        initial['machines'] = list(self.object.machines.values_list('pk', flat=True))
+        return initial
+
+class OpeningSeriesDeleteView(SuperuserRequiredMixin, DeleteView):
+    model = OpeningSeries
+    success_url = '/schedule'
+
+    def form_valid(self, form):
+        result = cancel_opening_series(self.object)
+        messages.success(self.request, _("%(cancelled)s future openings have been successfully cancelled") % result)
+        if result['kept']:
+            messages.warning(self.request, _("%(kept)s openings with reservations, events or trainings have been kept") % result)
+        return redirect(self.get_success_url())
+
 class MachineSlotUpdateView(UpdateSlotView):
     model = MachineSlot
     form_class = MachineSlotUpdateForm
@@ -233,7 +302,7 @@ class MachineSlotUpdateView(UpdateSlotView):
 
     def dispatch(self, request, *args, **kwargs):
         """
-        Check if the user's profile is in the trained profile list of a specific machine. 
+        Check if the user has validated a training for the machine. 
         If not, display an error message and redirect the user to the training page for that machine category.
         """
 
@@ -242,9 +311,7 @@ class MachineSlotUpdateView(UpdateSlotView):
 
         machine_slot = self.get_object()
 
-        if (
-            self.request.user.profile.pk not in machine_slot.machine.trained_profile_list
-        ):
+        if not can_use_machine(self.request.user, machine_slot.machine):
             messages.error(
                 request,
                 _(
@@ -253,34 +320,33 @@ class MachineSlotUpdateView(UpdateSlotView):
             )
             return redirect(
                 "/trainings/?machine_category="
-                + str(machine_slot.machine.category.pk)
+                + str(machine_slot.machine.category_id)
             )
 
         return super().dispatch(request, *args, **kwargs)
 
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ValidationError as e:
+            # The machine was booked by someone else in the meantime
+            form.add_error(None, e)
+            return self.form_invalid(form)
+
 class MachineSlotDeleteView(DeleteSlotView):
     model = MachineSlot
 
-    def delete(self, request, pk):
+    def form_valid(self, form):
         """
-        Deletes a machine slot, adjusts adjacent slots if they are unoccupied, and cancels the user's reservation.
+        Cancels the user's reservation and merges the slot with the free slots around it.
         """
-        machine_slot = self.get_object()
-        next_machine_slot = machine_slot.next_slots(machine_slot.end + timedelta(minutes=1)).first()
-        previous_machine_slot = machine_slot.previous_slots(machine_slot.start - timedelta(minutes=1)).first()
-
-        if next_machine_slot and next_machine_slot.user is None:
-            machine_slot.end = next_machine_slot.end
-            next_machine_slot.delete()
-        
-        if previous_machine_slot and previous_machine_slot.user is None:
-            machine_slot.start = previous_machine_slot.start
-            previous_machine_slot.delete()
+        try:
+            release_machine_slot(self.object)
+        except ValidationError as e:
+            messages.error(self.request, e.message)
+            return redirect('accounts:profile')
 
-        machine_slot.user = None
-        machine_slot.save()
-        
-        messages.success(request, _("You reservation has been deleted !"))
+        messages.success(self.request, _("You reservation has been deleted !"))
         return redirect('accounts:profile') 
 
 class TrainingSlotView():
@@ -341,18 +407,26 @@ class TrainingSlotRegistrationCreateView(TrainingSlotRegistrationView, UpdateVie
 
     def dispatch(self, request, *args, **kwargs):
         self.object = self.get_object()
-        if request.user in self.object.registrations.all():
+        if get_registration_status(self.object, request.user).is_registered:
             messages.success(request, _('You are already registered for this training slot'))
             return redirect('machines:training-detail', pk=self.object.pk)
         return super().dispatch(request, *args, **kwargs)
 
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ValidationError as e:
+            # The last place was taken in the meantime
+            form.add_error(None, e)
+            return self.form_invalid(form)
+
 class TrainingSlotRegistrationDeleteView(TrainingSlotRegistrationView, UpdateView):
     form_class = TrainingSlotRegistrationDeleteForm
     success_message = _('You successfully unregistered the training %(training)s during %(duration)s minutes on %(start_date)s from %(start_time)s to %(end_time)s')
 
     def dispatch(self, request, *args, **kwargs):
         self.object = self.get_object()
-        if request.user not in self.object.registrations.all():
+        if not get_registration_status(self.object, request.user).is_registered:
             return HttpResponseForbidden("You are not allowed to access this page.")
         return super().dispatch(request, *args, **kwargs)
 
@@ -389,12 +463,11 @@ class EventSlotDetailView(EventSlotView, DetailView):
         if (
             context["object"].registration_required
             and context["object"].registration_type == "onsite"
-            and self.request.user in context["object"].get_reservation_list
-            and context["object"].is_editable
         ):
-            context["registration_id"] = RegistrationEventSlot.objects.get(
-                event_slot=context["object"], user=self.request.user
-            ).pk
+            # Also used by the registration button filters of the template
+            status = get_registration_status(context["object"], self.request.user)
+            if status.can_unregister:
+                context["registration_id"] = status.registration_id
         return context
 
 class EventSlotCreateView(SuperuserRequiredMixin, EventSlotView, CreateSlotView):
@@ -462,6 +535,14 @@ class EventSlotRegistrationCreateView(EventSlotView, RegisterSlotView, CreateVie
         context['event_slot'] = EventSlot.objects.get(pk=self.kwargs['pk'])
         return context
 
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ValidationError as e:
+            # The last places were taken in the meantime
+            form.add_error(None, e)
+            return self.form_invalid(form)
+
 class EventSlotRegistrationDeleteView(EventSlotView, SuccessMessageMixin, DeleteView):
     model = RegistrationEventSlot
     success_message = _('You successfully unregistered the event %(event)s minutes on %(start_date)s from %(start_time)s to %(end_time)s')
@@ -484,20 +565,96 @@ class EventSlotRegistrationDeleteView(EventSlotView, SuccessMessageMixin, Delete
         context = super(EventSlotRegistrationDeleteView, self).get_success_message_context(object=self.object.event_slot)
         return context
 
-class MachineReservationListView(SuperuserRequiredMixin, ListView):
-    Model = MachineSlot
-    paginate_by = 100
+class MachineReservationListView(SuperuserRequiredMixin, TemplateView):
+    """
+    List the machine reservations, filtered by machine, member and dates, and paginated by keyset with the `after` cursor.
+    """
+    template_name = 'fabcal/machineslot_list.html'
+    past = False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = MachineReservationFilterForm(self.request.GET or None)
+        context['form'] = form
+
+        # Invalid filters show their errors and no reservation, rather than all of them
+        if form.is_bound and not form.is_valid():
+            context['object_list'] = []
+            context['reservations_count'], context['has_more_reservations'] = 0, False
+            return context
+
+        filters = form.get_filters() if form.is_bound else {}
+        object_list, next_cursor = get_reservations_page(self.past, self.request.GET.get('after'), **filters)
+        context['object_list'] = object_list
+        context['reservations_count'], context['has_more_reservations'] = count_reservations(self.past, **filters)
+
+        if next_cursor:
+            query = self.request.GET.copy()
+            query['after'] = next_cursor
+            context['next_page_query'] = query.urlencode()
+
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        context['first_page_query'] = query.urlencode()
+        return context
 
 class MachinePastReservationListView(MachineReservationListView):
-    def get_queryset(self):
-        now = datetime.now().date()
-        return MachineSlot.objects.filter(user__isnull=False, end__lt=now).order_by('-start')
+    past = True
 
 class MachineFutureReservationListView(MachineReservationListView):
+    past = False
+
+class MachineSlotSearchView(TemplateView):
+    """
+    Search the free slots of every machine of a category or group for a duration and a period of days.
+    """
+    template_name = 'fabcal/machineslot_search.html'
+
+    def get_form(self):
+        return MachineSlotSearchForm(self.request.GET or None)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = form = self.get_form()
+        context['machine_slots'] = form.search() if form.is_valid() else None
+        context['FABCAL_MINIMUM_RESERVATION_TIME'] = settings.FABCAL_MINIMUM_RESERVATION_TIME
+        context['FABCAL_RESERVATION_INCREMENT_TIME'] = settings.FABCAL_RESERVATION_INCREMENT_TIME
+        return context
 
-    def get_queryset(self):
-        now = datetime.now().date()
-        return MachineSlot.objects.filter(user__isnull=False, end__gte=now).order_by('start')
+class MachineSlotSearchResultsView(MachineSlotSearchView):
+    """
+    Return the free machine slots of the search as JSON, ranked the same way as the search page.
+    """
+
+    def get(self, request, *args, **kwargs):
+        form = self.get_form()
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_json(), content_type='application/json')
+
+        results = [
+            {
+                'id': machine_slot.pk,
+                'machine': {'id': machine_slot.machine_id, 'title': machine_slot.machine.title},
+                'opening': machine_slot.opening_slot.opening.title,
+                'start': machine_slot.bookable_start,
+                'end': machine_slot.bookable_end,
+                'url': reverse('fabcal:machineslot-update', kwargs={'pk': machine_slot.pk})
+            }
+            for machine_slot in form.search()
+        ]
+        return HttpResponse(json.dumps({'results': results}, default=str), content_type='application/json')
+
+class MachineUsageReportView(SuperuserRequiredMixin, TemplateView):
+    """
+    Report the usage of the machines per day, week or month, read from the daily rollups of fabcal.usage.
+    """
+    template_name = 'fabcal/machine_usage.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = form = MachineUsageReportForm(self.request.GET or None)
+        context['report'] = form.get_report() if form.is_valid() else None
+        return context
 
 class downloadIcsFileView(TemplateView):
     template_name = 'fabcal/fablab.ics'
@@ -514,3 +671,52 @@ class downloadIcsFileView(TemplateView):
         )
         response['Content-Disposition'] = 'attachment; filename="fablab.ics"'
         return response
+
+class CalendarEventsView(View):
+    """
+    Return the calendar events between the `start` and `end` query dates (YYYY-MM-DD, both included) as JSON.
+
+    Responses carry an ETag and a Last-Modified header tied to the calendar generation,
+    so the browser can revalidate a week or month view with a 304.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            start = date.fromisoformat(request.GET['start'])
+            end = date.fromisoformat(request.GET['end'])
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest("start and end must be dates formatted as YYYY-MM-DD")
+
+        if end < start or (end - start).days > CALENDAR_MAX_WINDOW_DAYS:
+            return HttpResponseBadRequest(f"The requested window must be between 0 and {CALENDAR_MAX_WINDOW_DAYS} days")
+
+        etag = f'"{get_calendar_generation()}-{start.isoformat()}-{end.isoformat()}"'
+        # The calendar times are naive local times
+        last_modified = timegm(timezone.make_aware(get_calendar_last_modified(), ZoneInfo(settings.TIME_ZONE)).utctimetuple())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                json.dumps({'events': get_calendar_events(start, end)}, default=str),
+                content_type='application/json'
+            )
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+class EventsArchiveView(View):
+    """
+    Return the cards of the next page of past events (`before` is the cursor
+    of the previous page), with the "show more" button swapped out of band.
+    """
+
+    def get(self, request, *args, **kwargs):
+        past_events, past_events_cursor = render_events_archive_page(request.GET.get('before'))
+        more = loader.render_to_string(
+            'fabcal/events_archive_more.html',
+            {'past_events_cursor': past_events_cursor, 'swap_oob': True},
+            request
+        )
+        return HttpResponse(past_events + more)
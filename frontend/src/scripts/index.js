@@ -35,3 +35,13 @@ $grid.imagesLoaded(function () {
     });
  });
 
+// Lay out the cards appended by htmx, e.g. the next page of past events
+document.body.addEventListener('htmx:afterSwap', e => {
+    let $target = $(e.detail.target);
+    if ($target.hasClass('grid')) {
+        $target.imagesLoaded(function () {
+            $target.masonry('reloadItems').masonry('layout');
+        });
+    }
+});
+
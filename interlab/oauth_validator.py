@@ -1,5 +1,7 @@
 from oauth2_provider.oauth2_validators import OAuth2Validator
 
+from accounts.groups import get_group_names
+
 class CustomOAuth2Validator(OAuth2Validator):
 
     def get_additional_claims(self, request):
@@ -9,6 +11,6 @@ class CustomOAuth2Validator(OAuth2Validator):
             'name': ' '.join([request.user.first_name, request.user.last_name]),
             'given_name': request.user.first_name,
             'last_name': request.user.last_name,
-            'groups': [g.name for g in request.user.groups.all()],
+            'groups': sorted(get_group_names(request.user)),
             'is_admin': request.user.is_staff
         }
@@ -223,7 +223,7 @@ INSTALLED_APPS = [
     'debug_toolbar',
     'organizations',
     'newsletter.apps.NewsletterConfig',
-    'machines',
+    'machines.apps.MachinesConfig',
     'mathfilters',
     'openings',
     'colorfield',
@@ -232,6 +232,7 @@ INSTALLED_APPS = [
     'django_q',
     'django_db_logger',
     'share',
+    'outbox',
     'django_htmx',
     'analytical',
     'phonenumber_field',
@@ -314,6 +315,18 @@ else:
         }
     }
 
+# The cache must be shared by every uWSGI worker and the django-q cluster: the
+# calendar generation bumped by one process invalidates the feeds cached by all.
+# The database cache needs no extra service, its table is created by the
+# migration fabcal 0016. Tests run in a single process and keep LocMemCache.
+if not TEST_MODE:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'interlab_cache'),
+        }
+    }
+
 DEFAULT_FROM_EMAIL=os.environ.get('DEFAULT_FROM_EMAIL')
 EMAIL_HOST=os.environ.get('EMAIL_HOST')
 EMAIL_PORT=os.environ.get('EMAIL_PORT')
@@ -412,6 +425,30 @@ USERREPORT_TOKEN = os.environ.get('USERREPORT_TOKEN')
 # FabCal
 FABCAL_MINIMUM_RESERVATION_TIME = 30
 FABCAL_RESERVATION_INCREMENT_TIME = 30
+FABCAL_EVENTS_ARCHIVE_PAGE_SIZE = 12
+# Opening and machine slots ended for that many days are moved to the archive tables, see fabcal.archive
+FABCAL_ARCHIVE_AFTER_DAYS = 365
+FABCAL_ARCHIVE_BATCH_SIZE = 500
+# Machine reservations per page of the reservation lists, and count shown before "more than"
+FABCAL_RESERVATIONS_PAGE_SIZE = 100
+FABCAL_RESERVATIONS_COUNT_LIMIT = 1000
+
+# Invoice lines inserted per query by the machine billing run, see payments.billing
+PAYMENTS_BILLING_BATCH_SIZE = 1000
+
+# Outbox
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 5 # minutes, doubled after each failed attempt
+OUTBOX_RETENTION_DAYS = 30
+OUTBOX_LEASE = 10 # minutes a claimed message is skipped by other runs, longer than a batch takes to send
+
+# Activities per page of the member agenda on the profile page
+ACCOUNTS_AGENDA_PAGE_SIZE = 20
+
+# Seconds the trained profiles of a machine category are cached, None to check each booking with a query.
+# Only set it with a cache shared by all the workers, or a revoked training stays valid in the others.
+MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT = None
 
 # Logging
 LOGGING = {
@@ -457,4 +494,10 @@ STRIPE_CURRENCY = os.environ.get('STRIPE_CURRENCY')
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': 'rest_framework.authentication.TokenAuthentication',
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.URLPathVersioning'
-}
\ No newline at end of file
+}
+
+# API delta sync
+API_CHANGES_PAGE_SIZE = 500
+API_CHANGES_RETENTION_DAYS = 90
+# Seconds a change waits before it is returned, longer than any transaction writing changes
+API_CHANGES_SAFETY_LAG = 60 * 5
\ No newline at end of file
@@ -185,13 +185,6 @@ class Machine(ItemForRent):
     def next_slots(self):
         return self.machineslot_set.filter(end__gt=datetime.datetime.now())
 
-    @property
-    def trained_profile_list(self):
-        trainings = self.category.training_set.all()
-        profile = []
-        for training in trainings:
-            profile.extend(training.trainingvalidation_set.values_list('profile', flat = True))
-        return profile
     class Meta:
         verbose_name = _("Machine")
         verbose_name_plural = _("Machines")
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import TrainingValidation
+
+TRAINED_PROFILES_CACHE_KEY = 'machines:trained-profiles:{version}:{category_id}'
+TRAINED_PROFILES_VERSION_KEY = 'machines:trained-profiles-version'
+
+
+def get_trained_profiles_version():
+    version = cache.get(TRAINED_PROFILES_VERSION_KEY)
+    if version is None:
+        cache.add(TRAINED_PROFILES_VERSION_KEY, 1, timeout=None)
+        version = cache.get(TRAINED_PROFILES_VERSION_KEY, 1)
+    return version
+
+
+def get_trained_profiles_cache_key(category_id):
+    return TRAINED_PROFILES_CACHE_KEY.format(version=get_trained_profiles_version(), category_id=category_id)
+
+
+def get_trained_profile_ids(category_id):
+    """
+    Return the pks of the profiles validated for a training of the machine category `category_id`, as a frozenset.
+
+    The set is read in one query and kept in the cache backend for
+    MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT seconds. It is invalidated by the
+    signals in machines.signals when validations or trainings change, which
+    only reaches every worker with a shared cache backend.
+    """
+    key = get_trained_profiles_cache_key(category_id)
+
+    profile_ids = cache.get(key)
+    if profile_ids is None:
+        profile_ids = frozenset(
+            TrainingValidation.objects.filter(training__machine_category_id=category_id)
+            .values_list('profile_id', flat=True)
+        )
+        cache.set(key, profile_ids, timeout=settings.MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT)
+
+    return profile_ids
+
+
+def can_use_machine(user, machine):
+    """
+    Return whether `user` has validated a training of the category of `machine`.
+
+    Reads the cached set of trained profiles of the category, or runs a
+    single EXISTS query when MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT is None.
+    """
+    if user is None or not user.is_authenticated or machine.category_id is None:
+        return False
+
+    if not settings.MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT:
+        return TrainingValidation.objects.filter(
+            profile__user=user,
+            training__machine_category_id=machine.category_id
+        ).exists()
+
+    return user.profile.pk in get_trained_profile_ids(machine.category_id)
+
+
+def forget_trained_profiles(category_ids):
+    """Invalidate the cached trained profiles of the machine categories `category_ids`."""
+    cache.delete_many([get_trained_profiles_cache_key(category_id) for category_id in category_ids])
+
+
+def forget_all_trained_profiles():
+    """Invalidate the cached trained profiles of every category, after a training changed category or was deleted."""
+    try:
+        cache.incr(TRAINED_PROFILES_VERSION_KEY)
+    except ValueError:
+        cache.set(TRAINED_PROFILES_VERSION_KEY, 1, timeout=None)
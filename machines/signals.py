@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Training, TrainingValidation
+from .permissions import forget_trained_profiles, forget_all_trained_profiles
+
+@receiver(post_save, sender=TrainingValidation)
+@receiver(post_delete, sender=TrainingValidation)
+def invalidate_trained_profiles(sender, instance, **kwargs):
+    category_id = Training.objects.filter(pk=instance.training_id).values_list('machine_category_id', flat=True).first()
+    if category_id is not None:
+        forget_trained_profiles([category_id])
+
+@receiver(post_save, sender=Training)
+@receiver(post_delete, sender=Training)
+def invalidate_all_trained_profiles(sender, **kwargs):
+    forget_all_trained_profiles()
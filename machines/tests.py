@@ -1,4 +1,12 @@
+import datetime
 from unittest import TestCase
+
+from django.core.cache import cache
+from django.test import TestCase as DjangoTestCase, override_settings
+
+from accounts.models import CustomUser
+from machines.models import Machine, MachineCategory, Training, TrainingValidation
+from machines.permissions import can_use_machine
 from machines.templatetags.training_extras import price_format
 
 class PriceTests(TestCase):
@@ -7,4 +15,36 @@ class PriceTests(TestCase):
         self.assertEqual(price_format(12.3), "12.30 CHF")
         self.assertEqual(price_format(12.34), "12.34 CHF")
         self.assertEqual(price_format(12.345), "12.35 CHF")
-        self.assertEqual(price_format(4.321), "4.32 CHF")
\ No newline at end of file
+        self.assertEqual(price_format(4.321), "4.32 CHF")
+
+class CanUseMachineTests(DjangoTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(username='member', email='member@fake.django')
+        self.category = MachineCategory.objects.create(name='laser')
+        self.machine = Machine.objects.create(title='Trotec', category=self.category)
+        self.training = Training.objects.create(title='laser', machine_category=self.category, duration=datetime.timedelta(hours=1), full_price=40)
+
+    @override_settings(MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT=60 * 60)
+    def test_can_use_machine(self):
+        """
+        Test that the trained profiles of a category are cached and invalidated when validations change.
+        """
+        self.assertFalse(can_use_machine(self.user, self.machine))
+
+        validation = TrainingValidation.objects.create(training=self.training, profile=self.user.profile)
+        self.assertTrue(can_use_machine(self.user, self.machine))
+
+        with self.assertNumQueries(1):
+            # Only the profile of the user is read, the trained profiles come from the cache
+            self.assertTrue(can_use_machine(CustomUser.objects.get(pk=self.user.pk), self.machine))
+
+        validation.delete()
+        self.assertFalse(can_use_machine(self.user, self.machine))
+        self.assertFalse(can_use_machine(self.user, Machine(title='Uncategorized')))
+
+    @override_settings(MACHINES_TRAINED_PROFILES_CACHE_TIMEOUT=None)
+    def test_can_use_machine_without_cache(self):
+        TrainingValidation.objects.create(training=self.training, profile=self.user.profile)
+        with self.assertNumQueries(1):
+            self.assertTrue(can_use_machine(self.user, self.machine))
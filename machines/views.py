@@ -14,7 +14,9 @@ from django.views.generic.list import ListView
 from .models import Training, ToolTraining, TrainingValidation, TrainingNotification, Machine
 from .forms import TrainingValidationForm
 
-from fabcal.models import TrainingSlot, MachineSlot
+from fabcal.availability import get_machine_availability
+from fabcal.models import TrainingSlot
+from fabcal.registrations import get_registration_statuses
 
 # TODO change to DetailView
 def training_show(request, pk):
@@ -37,9 +39,12 @@ def training_show(request, pk):
     else: 
         notification = False
 
+    training_slots = list(TrainingSlot.objects.filter(training__pk = pk, start__gte=datetime.datetime.now()).order_by('start'))
+    get_registration_statuses(training_slots, request.user)
+
     context = {
         'training': training,
-        'training_slots': TrainingSlot.objects.filter(training__pk = pk, start__gte=datetime.datetime.now()).order_by('start'),
+        'training_slots': training_slots,
         'machines': training.machines_list,
         'tools': ToolTraining.objects.filter(training__pk=pk).order_by('sort'),
         'notification': notification,
@@ -99,13 +104,7 @@ class MachineShowView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(MachineShowView, self).get_context_data(**kwargs)
-        
-        next_opening_slots = []
-        for i in MachineSlot.objects.filter(machine=context['machine'], end__gt=datetime.datetime.now()).order_by('start'):
-            if i.opening_slot not in next_opening_slots:
-                next_opening_slots.append(i.opening_slot)
-
-        context['next_opening_slots'] = next_opening_slots
+        context['next_opening_slots'] = get_machine_availability(context['machine'])
         context['FABCAL_MINIMUM_RESERVATION_TIME'] = settings.FABCAL_MINIMUM_RESERVATION_TIME
         context['FABCAL_RESERVATION_INCREMENT_TIME'] = settings.FABCAL_RESERVATION_INCREMENT_TIME
         return context
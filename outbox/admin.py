@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from django.contrib import admin
+from django.db.models import Count, Q
+from django.utils.translation import gettext_lazy as _
+
+from .models import OutboxBatch, OutboxMessage
+
+
+@admin.register(OutboxBatch)
+class OutboxBatchAdmin(admin.ModelAdmin):
+    list_display = ['name', 'created_at', 'total', 'queued', 'sent', 'failed']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            total_count=Count('messages'),
+            queued_count=Count('messages', filter=Q(messages__status=OutboxMessage.QUEUED)),
+            sent_count=Count('messages', filter=Q(messages__status=OutboxMessage.SENT)),
+            failed_count=Count('messages', filter=Q(messages__status=OutboxMessage.FAILED)),
+        )
+
+    @admin.display(description=_('Total'), ordering='total_count')
+    def total(self, obj):
+        return obj.total_count
+
+    @admin.display(description=_('Queued'), ordering='queued_count')
+    def queued(self, obj):
+        return obj.queued_count
+
+    @admin.display(description=_('Sent'), ordering='sent_count')
+    def sent(self, obj):
+        return obj.sent_count
+
+    @admin.display(description=_('Failed'), ordering='failed_count')
+    def failed(self, obj):
+        return obj.failed_count
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipient_list', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'batch']
+    search_fields = ['subject', 'recipient_list']
+    readonly_fields = ['attempts', 'last_error', 'sent_at', 'batch', 'created_at']
+    actions = ['requeue']
+
+    @admin.action(description=_('Send again'))
+    def requeue(self, request, queryset):
+        queryset.exclude(status=OutboxMessage.SENT).update(
+            status=OutboxMessage.QUEUED,
+            attempts=0,
+            next_attempt_at=datetime.now()
+        )
@@ -0,0 +1,71 @@
+from django.utils.html import escape
+
+from .models import OutboxBatch, OutboxMessage
+
+
+def placeholder(name):
+    """
+    Return the marker standing for the recipient's `name` value in a mass mail body.
+
+    Render the template once with the markers as context values, each recipient
+    gets a copy where they are replaced by its own values.
+    """
+    return '%%{0}%%'.format(name)
+
+
+def send_mail(subject, message, from_email, recipient_list, fail_silently=False, auth_user=None,
+              auth_password=None, connection=None, html_message=None):
+    """
+    Queue an email in the outbox, with the same signature as `django.core.mail.send_mail`.
+
+    Only one row is written: the message is sent later by the `send_queued_mail`
+    worker task, so SMTP latency stays out of the request. The SMTP related
+    arguments are accepted for compatibility and ignored.
+
+    Returns:
+        OutboxMessage: The queued message.
+    """
+    return OutboxMessage.objects.create(
+        subject=str(subject),
+        message=str(message),
+        html_message=html_message,
+        from_email=from_email,
+        recipient_list=[str(recipient) for recipient in recipient_list],
+    )
+
+
+def send_personalized_mass_mail(subject, message, from_email, recipient_list, html_message, substitutions, name=None):
+    """
+    Queue one email per recipient, personalizing a body rendered once.
+
+    Args:
+        recipient_list: The email addresses of the recipients.
+        html_message: The html body, rendered with `placeholder()` markers.
+        substitutions: For each recipient, a dict mapping placeholder names to its values.
+        name: The name of the batch shown in the admin, the subject by default.
+
+    Returns:
+        OutboxBatch: The batch grouping the queued messages, None without recipients.
+    """
+    if not recipient_list:
+        return None
+
+    batch = OutboxBatch.objects.create(name=str(name or subject))
+
+    messages = []
+    for recipient, values in zip(recipient_list, substitutions):
+        personalized_html_message = html_message
+        for key, value in values.items():
+            personalized_html_message = personalized_html_message.replace(placeholder(key), escape(value or ''))
+
+        messages.append(OutboxMessage(
+            subject=str(subject),
+            message=str(message),
+            html_message=personalized_html_message,
+            from_email=from_email,
+            recipient_list=[str(recipient)],
+            batch=batch
+        ))
+
+    OutboxMessage.objects.bulk_create(messages)
+    return batch
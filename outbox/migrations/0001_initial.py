@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:05
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Subject')),
+                ('message', models.TextField(verbose_name='Message')),
+                ('html_message', models.TextField(blank=True, null=True, verbose_name='HTML message')),
+                ('from_email', models.CharField(blank=True, max_length=255, null=True, verbose_name='From')),
+                ('recipient_list', models.JSONField(default=list, verbose_name='Recipients')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=16, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last error')),
+                ('next_attempt_at', models.DateTimeField(default=datetime.datetime.now, verbose_name='Next attempt')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent at')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Outbox message',
+                'verbose_name_plural': 'Outbox messages',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_message_due')],
+            },
+        ),
+    ]
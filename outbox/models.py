@@ -0,0 +1,59 @@
+import datetime
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class OutboxBatch(models.Model):
+    """
+    A group of messages queued together, such as a training announcement, to follow its sending in the admin.
+    """
+
+    name = models.CharField(max_length=255, verbose_name=_('Name'))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Outbox batch")
+        verbose_name_plural = _("Outbox batches")
+
+    def __str__(self):
+        return self.name
+
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting to be sent by the `outbox.tasks.send_queued_mail` worker task.
+    """
+
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (QUEUED, _('Queued')),
+        (SENT, _('Sent')),
+        (FAILED, _('Failed')),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name=_('Subject'))
+    message = models.TextField(verbose_name=_('Message'))
+    html_message = models.TextField(blank=True, null=True, verbose_name=_('HTML message'))
+    from_email = models.CharField(max_length=255, blank=True, null=True, verbose_name=_('From'))
+    recipient_list = models.JSONField(default=list, verbose_name=_('Recipients'))
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, verbose_name=_('Status'))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('Attempts'))
+    last_error = models.TextField(blank=True, null=True, verbose_name=_('Last error'))
+    next_attempt_at = models.DateTimeField(default=datetime.datetime.now, verbose_name=_('Next attempt'))
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name=_('Sent at'))
+    batch = models.ForeignKey(OutboxBatch, on_delete=models.SET_NULL, blank=True, null=True, related_name='messages')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Outbox message")
+        verbose_name_plural = _("Outbox messages")
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_message_due'),
+        ]
+
+    def __str__(self):
+        return '{0} - {1}'.format(', '.join(self.recipient_list), self.subject)
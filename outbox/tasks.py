@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+
+from .models import OutboxMessage
+
+
+def _record_failure(message, error, now):
+    message.attempts += 1
+    message.last_error = repr(error)
+
+    if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        # Dead letter: kept for inspection in the admin, never retried automatically
+        message.status = OutboxMessage.FAILED
+    else:
+        # Exponential backoff between attempts
+        message.next_attempt_at = now + timedelta(minutes=settings.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1))
+
+
+def _record_result(message):
+    message.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at'])
+
+
+def send_queued_mail(batch_size=None):
+    """
+    Send the due messages of the outbox over a single SMTP connection.
+
+    The batch is claimed in a short transaction that pushes the messages'
+    next attempt by `OUTBOX_LEASE` minutes, so overlapping runs skip them. The
+    emails are sent outside of any transaction and the result of each one is
+    saved right after its send. A crash only leaves the unrecorded messages,
+    which are due again when the lease expires.
+
+    Failed messages are retried later with an exponential backoff, and marked as
+    failed once `OUTBOX_MAX_ATTEMPTS` is reached. Messages sent more than
+    `OUTBOX_RETENTION_DAYS` ago are removed.
+
+    Returns:
+        dict: The number of messages sent and failed during this run.
+    """
+    now = datetime.now()
+    result = {'sent': 0, 'failed': 0}
+
+    with transaction.atomic():
+        # skip_locked lets overlapping runs share the queue instead of sending twice
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.QUEUED, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size or settings.OUTBOX_BATCH_SIZE]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            next_attempt_at=now + timedelta(minutes=settings.OUTBOX_LEASE)
+        )
+
+    if messages:
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for message in messages:
+                _record_failure(message, e, now)
+                _record_result(message)
+                result['failed'] += 1
+        else:
+            for message in messages:
+                email = EmailMultiAlternatives(
+                    subject=message.subject,
+                    body=message.message,
+                    from_email=message.from_email,
+                    to=message.recipient_list,
+                    connection=connection
+                )
+                if message.html_message:
+                    email.attach_alternative(message.html_message, 'text/html')
+
+                try:
+                    email.send()
+                except Exception as e:
+                    _record_failure(message, e, now)
+                    result['failed'] += 1
+                else:
+                    message.status = OutboxMessage.SENT
+                    message.sent_at = datetime.now()
+                    result['sent'] += 1
+                _record_result(message)
+        finally:
+            connection.close()
+
+    OutboxMessage.objects.filter(
+        status=OutboxMessage.SENT,
+        sent_at__lt=now - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    ).delete()
+
+    return result
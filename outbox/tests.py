@@ -0,0 +1,124 @@
+import datetime
+from smtplib import SMTPException
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from .mail import send_mail, send_personalized_mass_mail, placeholder
+from .models import OutboxBatch, OutboxMessage
+from .tasks import send_queued_mail
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTestCase(TestCase):
+    def queue(self, recipient='member@example.test'):
+        return send_mail(
+            from_email=None,
+            subject='Subject',
+            message='Message',
+            recipient_list=[recipient],
+            html_message='<p>Message</p>'
+        )
+
+    def test_send_mail_only_queues(self):
+        """
+        Test that sending a mail writes a single row and nothing is sent in the request.
+        """
+        with self.assertNumQueries(1):
+            message = self.queue()
+
+        self.assertEqual(message.status, OutboxMessage.QUEUED)
+        self.assertEqual(message.recipient_list, ['member@example.test'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_send_queued_mail(self):
+        """
+        Test that due messages are sent with their html alternative and marked as sent.
+        """
+        self.queue('a@example.test')
+        self.queue('b@example.test')
+
+        self.assertEqual(send_queued_mail(), {'sent': 2, 'failed': 0})
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['a@example.test'])
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Message</p>', 'text/html')])
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.SENT).exists())
+
+        # Nothing is sent twice
+        self.assertEqual(send_queued_mail(), {'sent': 0, 'failed': 0})
+
+    def test_send_personalized_mass_mail(self):
+        """
+        Test that a mass mail is queued in a batch with the placeholders replaced for each recipient.
+        """
+        with self.assertNumQueries(2):
+            batch = send_personalized_mass_mail(
+                subject='Announcement',
+                message='Announcement',
+                from_email=None,
+                recipient_list=['a@example.test', 'b@example.test'],
+                html_message='<p>Hello {0},</p>'.format(placeholder('first_name')),
+                substitutions=[{'first_name': 'Ada'}, {'first_name': '<b>Bob</b>'}]
+            )
+
+        messages = batch.messages.order_by('pk')
+        self.assertEqual([message.recipient_list for message in messages], [['a@example.test'], ['b@example.test']])
+        self.assertEqual(messages[0].html_message, '<p>Hello Ada,</p>')
+        self.assertEqual(messages[1].html_message, '<p>Hello &lt;b&gt;Bob&lt;/b&gt;,</p>')
+
+        send_queued_mail()
+        self.assertEqual(len(mail.outbox), 2)
+
+        # Nothing is queued without recipients
+        self.assertIsNone(send_personalized_mass_mail('Announcement', 'Announcement', None, [], '', []))
+        self.assertEqual(OutboxBatch.objects.count(), 1)
+
+    def test_crash_keeps_sent_messages(self):
+        """
+        Test that a crash during a batch keeps the messages already sent, and leases the others.
+        """
+        first = self.queue('a@example.test')
+        second = self.queue('b@example.test')
+
+        with patch('outbox.tasks.EmailMultiAlternatives.send', side_effect=[1, SystemExit()]):
+            with self.assertRaises(SystemExit):
+                send_queued_mail()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, OutboxMessage.SENT)
+        self.assertEqual(second.status, OutboxMessage.QUEUED)
+        self.assertGreater(second.next_attempt_at, datetime.datetime.now())
+
+        # Sent again once the lease expired, the first message is not
+        OutboxMessage.objects.filter(pk=second.pk).update(next_attempt_at=datetime.datetime.now())
+        self.assertEqual(send_queued_mail(), {'sent': 1, 'failed': 0})
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_DELAY=5)
+    def test_retry_and_dead_letter(self):
+        """
+        Test that a failing message is retried later, then kept as failed.
+        """
+        message = self.queue()
+
+        with patch('outbox.tasks.EmailMultiAlternatives.send', side_effect=SMTPException('refused')):
+            self.assertEqual(send_queued_mail(), {'sent': 0, 'failed': 1})
+
+            message.refresh_from_db()
+            self.assertEqual(message.status, OutboxMessage.QUEUED)
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.next_attempt_at, datetime.datetime.now() + datetime.timedelta(minutes=4))
+
+            # Not due yet
+            self.assertEqual(send_queued_mail(), {'sent': 0, 'failed': 0})
+
+            OutboxMessage.objects.update(next_attempt_at=datetime.datetime.now())
+            send_queued_mail()
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.FAILED)
+        self.assertEqual(message.attempts, 2)
+        self.assertIn('refused', message.last_error)
+        self.assertEqual(send_queued_mail(), {'sent': 0, 'failed': 0})
@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import BillingRun, InvoiceLine
+
+
+class InvoiceLineInline(admin.TabularInline):
+    model = InvoiceLine
+    fields = ['user', 'machine', 'start', 'minutes', 'premium', 'rate', 'amount']
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = ['start', 'end', 'created_at', 'line_count', 'total']
+    ordering = ['-start']
+    inlines = [InvoiceLineInline]
+
+
+@admin.register(InvoiceLine)
+class InvoiceLineAdmin(admin.ModelAdmin):
+    list_display = ['user', 'machine', 'start', 'minutes', 'premium', 'rate', 'amount', 'run']
+    list_filter = ['run', 'premium', 'machine']
+    search_fields = ['user__first_name', 'user__last_name', 'user__email']
+    ordering = ['-start']
@@ -0,0 +1,104 @@
+"""
+Billing of the machine reservations.
+
+Machines are priced per 30 minutes: `premium_price` for members with a
+subscription valid on the day of the reservation, `full_price` otherwise.
+A billing run reads every reservation of the period not billed yet in one
+query, with the rate already chosen by the database, and writes the invoice
+lines by batches of bulk inserts. A reservation is billed once only.
+"""
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Case, Exists, OuterRef, Q, Value, When
+from django.db.models.functions import TruncDate
+
+from fabcal.models import MachineSlot
+
+from .models import BillingRun, InvoiceLine
+
+CENT = Decimal('0.01')
+RATE_MINUTES = 30
+
+
+def get_billable_slots(start_date, end_date):
+    """
+    Return the (pk, user_id, machine_id, start, end, premium, full_price, premium_price)
+    of the reservations from `start_date` to `end_date` included, not billed yet.
+
+    The subscription is the one of the member's profile, valid on the day of the reservation.
+    """
+    day = TruncDate('start')
+    return MachineSlot.objects.filter(
+        ~Exists(InvoiceLine.objects.filter(machine_slot_id=OuterRef('pk'))),
+        user__isnull=False,
+        machine__isnull=False,
+        start__gte=datetime.datetime.combine(start_date, datetime.time.min),
+        start__lt=datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+    ).annotate(
+        premium=Case(
+            When(Q(user__profile__subscription__start__lte=day, user__profile__subscription__end__gte=day), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        )
+    ).values_list(
+        'pk', 'user_id', 'machine_id', 'start', 'end', 'premium', 'machine__full_price', 'machine__premium_price'
+    ).order_by('pk')
+
+
+def make_invoice_line(run, row):
+    pk, user_id, machine_id, start, end, premium, full_price, premium_price = row
+    rate = premium_price if premium and premium_price is not None else full_price
+    rate = rate or Decimal(0)
+    minutes = int((end - start).total_seconds() // 60)
+
+    return InvoiceLine(
+        run=run,
+        user_id=user_id,
+        machine_id=machine_id,
+        machine_slot_id=pk,
+        start=start,
+        end=end,
+        minutes=minutes,
+        premium=premium and premium_price is not None,
+        rate=rate,
+        amount=(rate * minutes / RATE_MINUTES).quantize(CENT, rounding=ROUND_HALF_UP)
+    )
+
+
+def run_machine_billing(start_date, end_date, batch_size=None):
+    """
+    Bill the machine reservations from `start_date` to `end_date` included that are not billed yet.
+
+    Returns:
+        BillingRun: The run, with its number of lines and total.
+    """
+    batch_size = batch_size or settings.PAYMENTS_BILLING_BATCH_SIZE
+
+    with transaction.atomic():
+        run = BillingRun.objects.create(start=start_date, end=end_date)
+
+        batch = []
+        for row in get_billable_slots(start_date, end_date).iterator(chunk_size=batch_size):
+            line = make_invoice_line(run, row)
+            run.line_count += 1
+            run.total += line.amount
+            batch.append(line)
+
+            if len(batch) >= batch_size:
+                InvoiceLine.objects.bulk_create(batch)
+                batch = []
+
+        InvoiceLine.objects.bulk_create(batch)
+        run.save(update_fields=['line_count', 'total'])
+
+    return run
+
+
+def bill_previous_month(today=None):
+    """Bill the machine reservations of the month before `today`."""
+    today = today or datetime.date.today()
+    end_date = today.replace(day=1) - datetime.timedelta(days=1)
+    return run_machine_billing(end_date.replace(day=1), end_date)
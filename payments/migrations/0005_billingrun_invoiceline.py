@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('machines', '0011_alter_machine_material_alter_machine_workshop_and_more'),
+        ('payments', '0004_alter_checkoutbuttonpluginmodel_cmsplugin_ptr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+            options={
+                'verbose_name': 'Billing run',
+                'verbose_name_plural': 'Billing runs',
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('machine_slot_id', models.BigIntegerField(unique=True)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('minutes', models.PositiveIntegerField()),
+                ('premium', models.BooleanField()),
+                ('rate', models.DecimalField(decimal_places=2, help_text='for 30 min', max_digits=6)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('machine', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='machines.machine')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payments.billingrun')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Invoice line',
+                'verbose_name_plural': 'Invoice lines',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invoiceline',
+            index=models.Index(fields=['user', 'start'], name='payments_invoiceline_user'),
+        ),
+    ]
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext as _
 from cms.plugin_base import CMSPlugin
 from accounts.models import SubscriptionCategory
+from machines.models import Machine
 
 class CheckoutButtonPluginModel(CMSPlugin):
     subscription_category = models.ForeignKey(SubscriptionCategory, on_delete=models.CASCADE, null=True)
@@ -19,3 +21,38 @@ class CheckoutButtonPluginModel(CMSPlugin):
         else:
             return _('Checkout')
     
+
+class BillingRun(models.Model):
+    """Machine reservations billed by payments.billing for a period."""
+    start = models.DateField()
+    end = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    line_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _("Billing run")
+        verbose_name_plural = _("Billing runs")
+
+    def __str__(self):
+        return f"{self.start} - {self.end}"
+
+class InvoiceLine(models.Model):
+    run = models.ForeignKey(BillingRun, on_delete=models.CASCADE, related_name='lines')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    machine = models.ForeignKey(Machine, on_delete=models.SET_NULL, null=True)
+    # Not a foreign key: machine slots are moved to the archive tables after a while
+    machine_slot_id = models.BigIntegerField(unique=True)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    minutes = models.PositiveIntegerField()
+    premium = models.BooleanField()
+    rate = models.DecimalField(max_digits=6, decimal_places=2, help_text='for 30 min')
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        verbose_name = _("Invoice line")
+        verbose_name_plural = _("Invoice lines")
+        indexes = [
+            models.Index(fields=['user', 'start'], name='payments_invoiceline_user'),
+        ]
@@ -0,0 +1,8 @@
+from .billing import bill_previous_month
+
+def bill_machine_usage():
+    """
+    Bill the machine reservations of the previous month, see payments.billing.
+    """
+    run = bill_previous_month()
+    return {'lines': run.line_count, 'total': str(run.total)}
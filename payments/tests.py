@@ -1,9 +1,15 @@
+from decimal import Decimal
+
 from django.test import Client
 from django.utils import timezone
-from datetime import timedelta, date
+from datetime import timedelta, date, datetime
 from django.test import TestCase
 from accounts.models import Profile, CustomUser, Subscription, SubscriptionCategory
 from payments.views import fulfill_order
+from payments.billing import run_machine_billing
+from payments.models import InvoiceLine
+from fabcal.models import MachineSlot
+from machines.models import Machine
 
 class SubscriptionRenewBase(TestCase):
     def __init__(self, methodName, start: date, end: date, with_subscription: bool):
@@ -175,4 +181,36 @@ class TestCreateSession(TestViewBase):
         client = self._login(enforce_csrf_checks=False)
         response = client.post('/payments/create-checkout-session/', { })
         self.assertRedirects(response, '/payments/subscription-update/')
-        
\ No newline at end of file
+        
+
+class MachineBillingTestCase(TestCase):
+    def setUp(self):
+        self.member = CustomUser.objects.create(username='member', email='member@fake.django')
+        self.subscriber = CustomUser.objects.create(username='subscriber', email='subscriber@fake.django')
+        category = SubscriptionCategory.objects.create(duration=30, price=1500, star_flag=False, sort=0, default_access_number=1)
+        self.subscriber.profile.subscription = Subscription.objects.create(access_number=1, start=date(2023, 5, 10), end=date(2023, 6, 10), subscription_category=category)
+        self.subscriber.profile.save()
+
+        self.machine = Machine.objects.create(title='Trotec', full_price=20, premium_price=10)
+        for user, day in [(self.member, 2), (self.subscriber, 2), (self.subscriber, 15)]:
+            start = datetime(2023, 5, day, 10)
+            MachineSlot.objects.create(machine=self.machine, user=user, start=start, end=start + timedelta(minutes=90))
+        MachineSlot.objects.create(machine=self.machine, start=datetime(2023, 5, 3, 10), end=datetime(2023, 5, 3, 12))
+
+    def test_run_machine_billing(self):
+        """
+        Test that reservations are priced with the subscription valid on their day, and billed once.
+        """
+        # Savepoint, run insert, reservations select, two line inserts for 3 lines
+        # by batches of 2, run update and savepoint release
+        with self.assertNumQueries(7):
+            run = run_machine_billing(date(2023, 5, 1), date(2023, 5, 31), batch_size=2)
+
+        self.assertEqual(run.line_count, 3)
+        self.assertEqual(run.total, Decimal('150.00'))
+        self.assertEqual(
+            list(InvoiceLine.objects.order_by('start', 'user__username').values_list('user__username', 'premium', 'amount')),
+            [('member', False, Decimal('60.00')), ('subscriber', False, Decimal('60.00')), ('subscriber', True, Decimal('30.00'))]
+        )
+
+        self.assertEqual(run_machine_billing(date(2023, 5, 1), date(2023, 5, 31)).line_count, 0)
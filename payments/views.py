@@ -7,7 +7,6 @@ from django.urls import reverse
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.sites.models import Site
-from django.core.mail import send_mail
 from django.http.response import JsonResponse
 from django.http import HttpResponse, HttpRequest
 from django.shortcuts import redirect
@@ -24,6 +23,7 @@ from .forms import CreateCheckoutSessionForm
 from .helpers import SubscriptionDurationHelper
 from accounts.mixins import ProfileRequiredMixin
 from accounts.models import Profile, Subscription, SubscriptionCategory
+from outbox.mail import send_mail
 
 class SubscriptionUpdateView(LoginRequiredMixin, TemplateView):
     template_name = "payments/subscription_update.html"